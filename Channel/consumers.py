@@ -2,13 +2,46 @@ import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from Trueliftmovers.db_router import replica_reads
 import asyncio
+from urllib.parse import parse_qs
+from django.conf import settings
 # from truck.models import Truck
 # from booking.models import Booking
 
 
+logger = logging.getLogger(__name__)
+
+
+def ack_id(value):
+    # Notification ids arrive as numbers or numeric strings, None for anything else
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
 class NotificationConsumer(AsyncWebsocketConsumer):
+    @database_sync_to_async
+    def get_unread_count(self, user):
+        from notifications.unread import get_count
+
+        return get_count(user)
+
+    @database_sync_to_async
+    def mark_read(self, user, ids, up_to_id):
+        from notifications.unread import mark_notifications_read
+
+        return mark_notifications_read(user, ids=ids, up_to_id=up_to_id)
+
     async def connect(self):
+        self.pending_ack_ids = set()
+        self.pending_ack_up_to_id = None
+        self.ack_flush = None
+
         user = self.scope.get("user")
         if not user or user.is_anonymous:
             await self.close()
@@ -22,7 +55,35 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
         await self.accept()
 
+        # Starting badge value, later changes arrive as unread_count events
+        await self.send(text_data=json.dumps({
+            "event_type": "unread_count",
+            "unread_count": await self.get_unread_count(user),
+        }))
+
+        # ws/notifications/?last_id=<stream_id> replays what was sent while the client was away
+        last_id = parse_qs(self.scope.get("query_string", b"").decode()).get("last_id", [None])[0]
+        if last_id:
+            await self.replay_missed(user, last_id)
+
+    async def replay_missed(self, user, last_id):
+        from notifications.stream import replay
+
+        try:
+            events, truncated = await replay(user, last_id)
+        except Exception:
+            logger.exception("Could not replay missed notifications")
+            events, truncated = [], True
+
+        if truncated:
+            # Part of the gap is no longer in the stream, the client has to reload the list
+            await self.send(text_data=json.dumps({"event_type": "replay_truncated"}))
+        for event in events:
+            await self.send(text_data=json.dumps(event))
+
     async def disconnect(self, close_code):
+        await self.flush_acks()
+
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
@@ -30,12 +91,65 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         if user and getattr(user, "role", None) == "admin":
             await self.channel_layer.group_discard("admin_notifications", self.channel_name)
 
+    async def receive(self, text_data=None, bytes_data=None):
+        # {"event_type": "ack", "ids": [...]} or {"event_type": "ack", "up_to_id": n}
+        try:
+            message = json.loads(text_data or "")
+        except ValueError:
+            return
+        if not isinstance(message, dict) or message.get("event_type") != "ack":
+            return
+
+        ids = message.get("ids") or ([message["id"]] if "id" in message else [])
+        if not isinstance(ids, list):
+            return
+        ids = [ack_id(value) for value in ids]
+        up_to_id = message.get("up_to_id")
+        if up_to_id is not None:
+            up_to_id = ack_id(up_to_id)
+            if up_to_id is None:
+                return
+        # A frame with any id that is not one is ignored as a whole
+        if None in ids or not (ids or up_to_id):
+            return
+
+        self.pending_ack_ids.update(ids)
+        if up_to_id:
+            self.pending_ack_up_to_id = max(self.pending_ack_up_to_id or 0, up_to_id)
+
+        # Acks are written in batches, a full batch right away and the rest after a short delay
+        if len(self.pending_ack_ids) >= settings.NOTIFICATION_ACK_BATCH_SIZE:
+            await self.flush_acks()
+        elif self.ack_flush is None:
+            self.ack_flush = asyncio.create_task(self.flush_acks_later())
+
+    async def flush_acks_later(self):
+        await asyncio.sleep(settings.NOTIFICATION_ACK_FLUSH_SECONDS)
+        self.ack_flush = None
+        await self.flush_acks()
+
+    async def flush_acks(self):
+        if getattr(self, "ack_flush", None) is not None:
+            self.ack_flush.cancel()
+            self.ack_flush = None
+
+        ids, up_to_id = getattr(self, "pending_ack_ids", None), getattr(self, "pending_ack_up_to_id", None)
+        if not ids and not up_to_id:
+            return
+        self.pending_ack_ids, self.pending_ack_up_to_id = set(), None
+
+        try:
+            await self.mark_read(self.scope["user"], list(ids), up_to_id)
+        except Exception:
+            logger.exception("Could not mark acknowledged notifications read")
+
     async def send_notification(self, event):
         await self.send(text_data=json.dumps(event["data"]))
 
 
 class TruckLocationConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
+    @replica_reads
     def get_user_trucks(self, user):
         from truck.models import Truck
         from booking.models import Booking
@@ -0,0 +1,46 @@
+import time
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand
+from Channel.publisher import publisher
+
+
+
+BENCHMARK_GROUP = "benchmark_publisher"
+
+
+class Command(BaseCommand):
+    help = "Measure per-call overhead of async_to_sync(group_send) against Channel.publisher.publish"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=1000)
+
+    def report(self, label, seconds, calls):
+        self.stdout.write(f"{label:<32} {seconds / calls * 1_000_000:>10.1f} us/call   {calls / seconds:>10.0f} calls/s")
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        message = {"type": "benchmark.message", "data": {"value": 1}}
+        channel_layer = get_channel_layer()
+
+        # Warm up both paths so connection setup is not counted
+        async_to_sync(channel_layer.group_send)(BENCHMARK_GROUP, message)
+        publisher.publish(BENCHMARK_GROUP, message).result()
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            async_to_sync(channel_layer.group_send)(BENCHMARK_GROUP, message)
+        self.report("async_to_sync(group_send)", time.perf_counter() - started, calls)
+
+        started = time.perf_counter()
+        futures = [publisher.publish(BENCHMARK_GROUP, message) for _ in range(calls)]
+        enqueued = time.perf_counter() - started
+        for future in futures:
+            future.result()
+        self.report("publish (caller time)", enqueued, calls)
+        self.report("publish (until delivered)", time.perf_counter() - started, calls)
+
+        started = time.perf_counter()
+        for _ in range(calls):
+            publisher.publish(BENCHMARK_GROUP, message).result()
+        self.report("publish + wait each", time.perf_counter() - started, calls)
@@ -0,0 +1,81 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import wait
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+
+
+logger = logging.getLogger(__name__)
+
+
+
+class Publisher:
+    # Sends channel-layer messages from sync code through one event loop per process that
+    # stays up, so its channel-layer connections are reused instead of opening a loop per call
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._channel_layer = None
+        self._in_flight = None
+        self._pending = set()
+
+    def _ensure_loop(self):
+        # A forked worker inherits these attributes but not the thread, so the pid is checked
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="channel-publisher", daemon=True).start()
+                self._channel_layer = get_channel_layer()
+                # Bounded below the channel layer's connection pool so bursts queue up instead of failing
+                self._in_flight = asyncio.Semaphore(settings.CHANNEL_PUBLISHER_MAX_IN_FLIGHT)
+                self._pending = set()
+                self._loop, self._pid = loop, os.getpid()
+        return self._loop
+
+    async def _group_send(self, group, message):
+        async with self._in_flight:
+            await self._channel_layer.group_send(group, message)
+
+    async def _send(self, messages):
+        await asyncio.gather(*(self._group_send(group, message) for group, message in messages))
+
+    def _done(self, future):
+        self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Could not publish channel messages", exc_info=future.exception())
+
+    def publish_many(self, messages):
+        # Returns straight away, the returned future can be waited on when delivery matters
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._send(messages), loop)
+        self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def publish(self, group, message):
+        return self.publish_many([(group, message)])
+
+    def drain(self, timeout=None):
+        if self._pid == os.getpid() and self._pending:
+            wait(list(self._pending), timeout=timeout)
+
+
+
+publisher = Publisher()
+
+publish = publisher.publish
+publish_many = publisher.publish_many
+
+
+@atexit.register
+def _drain_on_exit():
+    publisher.drain(timeout=5)
@@ -1,3 +1,159 @@
-from django.test import TestCase
+import asyncio
+import subprocess
+import sys
+import textwrap
+import threading
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from accounts.models import User
+from notifications.models import Notification
+from .consumers import NotificationConsumer
+from .publisher import Publisher
 
 # Create your tests here.
+
+
+
+# database_sync_to_async closes the connection TestCase keeps its transaction on
+@override_settings(NOTIFICATION_ACK_BATCH_SIZE=1)
+class NotificationAckTests(TransactionTestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.notifications = [
+            Notification.objects.create(user=self.customer, title=f"Notification {i}", body="x", user_notification=True)
+            for i in range(3)
+        ]
+
+    def ack(self, *frames):
+        async def run():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+            communicator.scope["user"] = self.customer
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()
+
+            for frame in frames:
+                await communicator.send_json_to(frame)
+            # A consumer that raised re-raises here, one that closed the socket sends a close
+            while not await communicator.receive_nothing():
+                self.assertNotEqual((await communicator.receive_output())["type"], "websocket.close")
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        return sorted(Notification.objects.filter(read=True).values_list("id", flat=True))
+
+    def test_bad_frames_are_ignored(self):
+        first = self.notifications[0].id
+        read = self.ack(
+            {"event_type": "ack", "ids": 5},
+            {"event_type": "ack", "ids": "5"},
+            {"event_type": "ack", "ids": {"id": first}},
+            {"event_type": "ack", "ids": [first, "abc"]},
+            {"event_type": "ack", "ids": [1.5, None, True]},
+            {"event_type": "ack", "up_to_id": "latest"},
+            {"event_type": "ack", "ids": [[first]]},
+        )
+
+        self.assertEqual(read, [])
+
+    def test_ids_are_coerced_to_integers(self):
+        first, second, third = [notification.id for notification in self.notifications]
+
+        read = self.ack({"event_type": "ack", "ids": [str(first)]}, {"event_type": "ack", "id": second})
+
+        self.assertEqual(read, [first, second])
+
+    def test_up_to_id_marks_everything_before_it(self):
+        read = self.ack({"event_type": "ack", "up_to_id": str(self.notifications[1].id)})
+
+        self.assertEqual(read, [notification.id for notification in self.notifications[:2]])
+
+
+
+class SlowChannelLayer:
+    def __init__(self, delay=0.05, fail_groups=()):
+        self.delay = delay
+        self.fail_groups = fail_groups
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    async def group_send(self, group, message):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if group in self.fail_groups:
+            raise RuntimeError(group)
+        self.sent.append((group, message))
+
+
+
+class PublisherTests(TestCase):
+    def publisher(self, layer):
+        patcher = mock.patch("Channel.publisher.get_channel_layer", return_value=layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return Publisher()
+
+    def test_publish_many_returns_before_delivery_and_drain_waits(self):
+        layer = SlowChannelLayer()
+        publisher = self.publisher(layer)
+
+        future = publisher.publish_many([(f"user_{i}", {"type": "send_notification"}) for i in range(3)])
+        self.assertFalse(future.done())
+
+        publisher.drain(timeout=5)
+        self.assertTrue(future.done())
+        self.assertEqual(sorted(group for group, _ in layer.sent), ["user_0", "user_1", "user_2"])
+        self.assertEqual(publisher._pending, set())
+
+    @override_settings(CHANNEL_PUBLISHER_MAX_IN_FLIGHT=2)
+    def test_sends_are_bounded_in_flight(self):
+        layer = SlowChannelLayer()
+        publisher = self.publisher(layer)
+
+        publisher.publish_many([(f"user_{i}", {}) for i in range(6)])
+        publisher.drain(timeout=5)
+
+        self.assertEqual(len(layer.sent), 6)
+        self.assertEqual(layer.max_in_flight, 2)
+
+    def test_failed_sends_are_logged_and_drained(self):
+        layer = SlowChannelLayer(fail_groups={"user_1"})
+        publisher = self.publisher(layer)
+
+        with self.assertLogs("Channel.publisher", level="ERROR"):
+            publisher.publish_many([("user_1", {})])
+            publisher.drain(timeout=5)
+
+        self.assertEqual(publisher._pending, set())
+
+    def test_pending_sends_are_drained_at_exit(self):
+        # The publisher loop runs on a daemon thread, so only the exit hook keeps the sends alive
+        script = textwrap.dedent("""
+            import asyncio
+            from django.conf import settings
+            settings.configure(CHANNEL_PUBLISHER_MAX_IN_FLIGHT=1)
+            from Channel import publisher
+
+            class Layer:
+                async def group_send(self, group, message):
+                    await asyncio.sleep(0.1)
+                    print(group, flush=True)
+
+            publisher.get_channel_layer = Layer
+            publisher.publish_many([("user_1", {}), ("user_2", {})])
+        """)
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=30,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["user_1", "user_2"])
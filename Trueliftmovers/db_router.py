@@ -0,0 +1,77 @@
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+
+
+REPLICA_DB_ALIAS = "replica"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+
+def read_db_alias():
+    if replica_configured() and _replica_reads.get() and not _pinned_to_primary.get():
+        return REPLICA_DB_ALIAS
+    return "default"
+
+
+
+def replica_reads(func):
+    # Reads inside func go to the replica until something is written
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+
+def reset_routing():
+    _replica_reads.set(False)
+    _pinned_to_primary.set(False)
+
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned_to_primary.get():
+            return "default"
+        # Related objects are read from the database their instance came from
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return read_db_alias()
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes: the rest of the request reads from the primary
+        _pinned_to_primary.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_routing()
+        try:
+            return self.get_response(request)
+        finally:
+            reset_routing()
@@ -0,0 +1,108 @@
+import logging
+import time
+from contextvars import ContextVar
+from celery import current_app
+from django.db import transaction
+from . import metrics
+
+
+
+logger = logging.getLogger(__name__)
+
+# Tasks committed during the current request, None outside a request
+_buffer = ContextVar("dispatch_buffer", default=None)
+_deferred = ContextVar("dispatch_deferred", default=0)
+
+
+
+def _publish(calls):
+    # One producer, so one broker connection, for the whole batch. Calls that could not be sent
+    # have their failure hooks run and are returned with the error
+    failures = []
+    remaining = list(calls)
+    try:
+        with current_app.producer_or_acquire() as producer:
+            while remaining:
+                (task, args, kwargs, options), on_failure = remaining.pop(0)
+                try:
+                    task.apply_async(args, kwargs, producer=producer, **options)
+                except Exception as error:
+                    logger.exception("Could not dispatch task %s", task.name)
+                    failures.append((on_failure, error))
+    except Exception as error:
+        logger.exception("Could not dispatch %s tasks", len(remaining))
+        failures.extend((on_failure, error) for _, on_failure in remaining)
+
+    for on_failure, error in failures:
+        if on_failure is None:
+            continue
+        try:
+            on_failure(error)
+        except Exception:
+            logger.exception("Dispatch failure hook %r failed", on_failure)
+    return failures
+
+
+
+def _committed(call, once, on_failure):
+    buffer = _buffer.get()
+    if buffer is None:
+        failures = _publish([(call, on_failure)])
+        if failures:
+            # Outside a request the caller, a task or a command, fails instead of losing the call
+            raise failures[0][1]
+    elif not (once and any(queued == call for queued, _ in buffer)):
+        buffer.append((call, on_failure))
+
+
+
+def defer_apply(task, args=(), kwargs=None, once=False, on_failure=None, **options):
+    # Queued after the surrounding transaction commits and dropped if it rolls back;
+    # inside a request the tasks go to the broker together once the response is ready.
+    # once=True skips a call identical to one already waiting in this request, on_failure
+    # is called with the error if the task never reaches the broker
+    call = (task, tuple(args), kwargs or {}, options)
+    if _buffer.get() is not None:
+        _deferred.set(_deferred.get() + 1)
+    transaction.on_commit(lambda: _committed(call, once, on_failure))
+
+
+
+def defer(task, *args, **kwargs):
+    defer_apply(task, args, kwargs)
+
+
+
+def flush():
+    # Anything deferred while publishing (eager tasks) is sent straight away
+    buffer, deferred = _buffer.get(), _deferred.get()
+    _buffer.set(None)
+    _deferred.set(0)
+    if not buffer and not deferred:
+        return 0
+
+    started = time.perf_counter()
+    if buffer:
+        _publish(buffer)
+    metrics.observe("dispatch.flush", time.perf_counter() - started)
+    metrics.incr("dispatch.deferred", deferred)
+    metrics.incr("dispatch.sent", len(buffer or ()))
+    return len(buffer or ())
+
+
+
+class DeferredDispatchMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        buffer_token = _buffer.set([])
+        deferred_token = _deferred.set(0)
+        try:
+            return self.get_response(request)
+        finally:
+            try:
+                flush()
+            finally:
+                _buffer.reset(buffer_token)
+                _deferred.reset(deferred_token)
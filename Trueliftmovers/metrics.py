@@ -0,0 +1,73 @@
+import logging
+import time
+from contextlib import contextmanager
+import redis
+from .redis_client import get_redis
+
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "metrics:"
+
+
+
+def incr(name, amount=1):
+    try:
+        get_redis().hincrby(f"{METRICS_PREFIX}{name}", "count", amount)
+    except redis.RedisError:
+        logger.warning("Could not record metric %s", name)
+
+
+
+def observe(name, seconds, count=1):
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.hincrby(f"{METRICS_PREFIX}{name}", "count", count)
+        pipeline.hincrbyfloat(f"{METRICS_PREFIX}{name}", "total_seconds", seconds)
+        pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not record metric %s", name)
+
+
+
+def gauge(name, value):
+    try:
+        get_redis().hset(f"{METRICS_PREFIX}{name}", "value", value)
+    except redis.RedisError:
+        logger.warning("Could not record metric %s", name)
+
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+
+
+def snapshot():
+    client = get_redis()
+    keys = sorted(client.scan_iter(match=f"{METRICS_PREFIX}*"))
+
+    pipeline = client.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hgetall(key)
+
+    result = {}
+    for key, values in zip(keys, pipeline.execute()):
+        count = int(values.get("count", 0))
+        metric = {"count": count}
+        if "total_seconds" in values:
+            total_seconds = float(values["total_seconds"])
+            metric["total_seconds"] = round(total_seconds, 6)
+            metric["avg_ms"] = round(total_seconds / count * 1000, 3) if count else 0
+            metric["per_second"] = round(count / total_seconds, 3) if total_seconds else 0
+        if "value" in values:
+            metric["value"] = float(values["value"])
+        result[key[len(METRICS_PREFIX):]] = metric
+
+    return result
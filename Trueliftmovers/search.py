@@ -0,0 +1,32 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Q
+from django.db.models.functions import Greatest, Upper
+
+
+
+# Postgres compiles icontains to UPPER(column) LIKE UPPER(pattern), so the trigram
+# indexes are built on UPPER(column) for the substring filter to use them.
+
+def trigram_index(field, name):
+    return GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=name)
+
+
+
+def search_q(fields, query):
+    q_filter = Q()
+    for field in fields:
+        q_filter |= Q(**{f"{field}__icontains": query})
+    return q_filter
+
+
+
+def ranked_search(queryset, fields, query, *ordering):
+    # Matches keep the icontains semantics, closer word matches are returned first
+    similarities = [TrigramWordSimilarity(query, field) for field in fields]
+    rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return (
+        queryset.filter(search_q(fields, query))
+        .annotate(search_rank=rank)
+        .order_by("-search_rank", *ordering)
+    )
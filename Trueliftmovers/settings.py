@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -69,6 +70,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Trueliftmovers.db_router.ReplicaRoutingMiddleware',
+    'Trueliftmovers.dispatch.DeferredDispatchMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -114,6 +117,21 @@ DATABASES = {
     }
 }
 
+# Optional read replica, used by views decorated with Trueliftmovers.db_router.replica_reads.
+# Tests mirror it to default so both aliases see the same test database.
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_REPLICA_NAME', os.getenv('DB_NAME')),
+        'USER': os.getenv('DB_REPLICA_USER', os.getenv('DB_USER')),
+        'PASSWORD': os.getenv('DB_REPLICA_PASSWORD', os.getenv('DB_PASSWORD')),
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', os.getenv('DB_PORT')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['Trueliftmovers.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -254,12 +272,19 @@ SIMPLE_JWT = {
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_USE_TLS = True
-EMAIL_PORT = 587
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.gmail.com")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", 587))
 EMAIL_HOST_USER = os.getenv("EMAIL")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+EMAIL_OUTBOX_MAX_BATCHES = int(os.getenv("EMAIL_OUTBOX_MAX_BATCHES", 20))
+EMAIL_OUTBOX_RATE_PER_SECOND = float(os.getenv("EMAIL_OUTBOX_RATE_PER_SECOND", 5))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 5))
+EMAIL_OUTBOX_RETRY_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_SECONDS", 60))
+EMAIL_OUTBOX_LOCK_SECONDS = int(os.getenv("EMAIL_OUTBOX_LOCK_SECONDS", 300))
+
 
 
 
@@ -276,6 +301,30 @@ CELERY_BEAT_SCHEDULE = {
         "task": "accounts.tasks.cleanup_expired_otps",
         "schedule": crontab(minute="*/5"),
     },
+    "archive-finished-bookings-nightly": {
+        "task": "booking.tasks.archive_finished_bookings",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "reconcile-rollups-nightly": {
+        "task": "adminapi.tasks.reconcile_recent_rollups",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "recount-dashboard-counters": {
+        "task": "adminapi.tasks.recount_dashboard_counters",
+        "schedule": crontab(minute="*/15"),
+    },
+    "reconcile-unread-notification-counters": {
+        "task": "notifications.tasks.reconcile_unread_counters",
+        "schedule": crontab(minute="*/15"),
+    },
+    "send-outbox-emails": {
+        "task": "notifications.tasks.send_outbox_emails",
+        "schedule": crontab(minute="*"),
+    },
+    "purge-old-notifications-nightly": {
+        "task": "notifications.tasks.purge_old_notifications",
+        "schedule": crontab(hour=3, minute=30),
+    },
 }
 
 
@@ -288,6 +337,8 @@ CHANNEL_LAYERS = {
     },
 }
 
+CHANNEL_PUBLISHER_MAX_IN_FLIGHT = int(os.getenv("CHANNEL_PUBLISHER_MAX_IN_FLIGHT", 50))
+
 
 GOOGLEMAP = os.getenv("GOOGLEMAP")
 
@@ -297,3 +348,54 @@ STRIPE_SECRET_KEY=os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET=os.getenv("STRIPE_WEBHOOK_SECRET")
 
 BOUNCIE_WEBHOOK_KEY=os.getenv("BOUNCIE_WEBHOOK_KEY")
+
+
+BOOKING_EXPORT_CHUNK_SIZE = int(os.getenv("BOOKING_EXPORT_CHUNK_SIZE", 2000))
+
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "trueliftmovers",
+    }
+}
+
+UTILISATION_CACHE_TIMEOUT = int(os.getenv("UTILISATION_CACHE_TIMEOUT", 7 * 24 * 3600))
+
+
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", 500))
+NOTIFICATION_FLUSH_MAX_BATCHES = int(os.getenv("NOTIFICATION_FLUSH_MAX_BATCHES", 20))
+NOTIFICATION_FLUSH_DELAY = float(os.getenv("NOTIFICATION_FLUSH_DELAY", 0.5))
+NOTIFICATION_FLUSH_LOCK_SECONDS = int(os.getenv("NOTIFICATION_FLUSH_LOCK_SECONDS", 60))
+# Delay before a flush whose delivery failed runs again
+NOTIFICATION_FLUSH_RETRY_SECONDS = int(os.getenv("NOTIFICATION_FLUSH_RETRY_SECONDS", 30))
+# Booking events for the same recipient within this many seconds of the first one, which is sent
+# right away, are merged into one notification sent when the window closes, 0 disables
+NOTIFICATION_COALESCE_SECONDS = float(os.getenv("NOTIFICATION_COALESCE_SECONDS", 10))
+NOTIFICATION_COALESCE_TYPES = ["booking", "payment"]
+NOTIFICATION_UNREAD_TTL = int(os.getenv("NOTIFICATION_UNREAD_TTL", 86400))
+NOTIFICATION_ACK_BATCH_SIZE = int(os.getenv("NOTIFICATION_ACK_BATCH_SIZE", 100))
+NOTIFICATION_ACK_FLUSH_SECONDS = float(os.getenv("NOTIFICATION_ACK_FLUSH_SECONDS", 2))
+NOTIFICATION_STREAM_MAXLEN = int(os.getenv("NOTIFICATION_STREAM_MAXLEN", 200))
+NOTIFICATION_STREAM_TTL = int(os.getenv("NOTIFICATION_STREAM_TTL", 7 * 24 * 3600))
+
+# Days read notifications of each type are kept, types left out are never purged
+NOTIFICATION_RETENTION_DAYS = {
+    "general": int(os.getenv("NOTIFICATION_RETENTION_GENERAL_DAYS", 30)),
+    "booking": int(os.getenv("NOTIFICATION_RETENTION_BOOKING_DAYS", 180)),
+    "payment": int(os.getenv("NOTIFICATION_RETENTION_PAYMENT_DAYS", 365)),
+    "support": int(os.getenv("NOTIFICATION_RETENTION_SUPPORT_DAYS", 90)),
+}
+NOTIFICATION_PURGE_BATCH_SIZE = int(os.getenv("NOTIFICATION_PURGE_BATCH_SIZE", 1000))
+NOTIFICATION_PURGE_MAX_BATCHES = int(os.getenv("NOTIFICATION_PURGE_MAX_BATCHES", 100))
+
+
+BOOKING_ARCHIVE_AFTER_DAYS = int(os.getenv("BOOKING_ARCHIVE_AFTER_DAYS", 90))
+BOOKING_ARCHIVE_BATCH_SIZE = int(os.getenv("BOOKING_ARCHIVE_BATCH_SIZE", 500))
+BOOKING_ARCHIVE_MAX_BATCHES = int(os.getenv("BOOKING_ARCHIVE_MAX_BATCHES", 100))
+
+# Pending or running report jobs not touched for this long are failed and regenerated on the next request
+REPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("REPORT_JOB_TIMEOUT_SECONDS", 15 * 60))
@@ -0,0 +1,202 @@
+from unittest import mock
+import fakeredis
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import Profile, User
+from adminapi.models import DailyRollup
+from truck.models import Truck
+from .db_router import REPLICA_DB_ALIAS, ReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from .dispatch import DeferredDispatchMiddleware, defer_apply
+from .search import ranked_search
+
+
+
+def use_fake_redis(test):
+    # Points get_redis and the stream's async client at one in-memory server for the test
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    for patcher in [
+        mock.patch("Trueliftmovers.redis_client._client", client),
+        mock.patch("notifications.stream.get_async_redis", lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True)),
+    ]:
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return client
+
+
+
+class RecordingRouter(ReplicaRouter):
+    # Records the alias ReplicaRouter picks for every query, then runs it on the one test database
+    decisions = []
+
+    def db_for_read(self, model, **hints):
+        alias = super().db_for_read(model, **hints)
+        self.decisions.append(("read", model._meta.label, alias))
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        alias = super().db_for_write(model, **hints)
+        self.decisions.append(("write", model._meta.label, alias))
+        return "default"
+
+
+
+@override_settings(DATABASE_ROUTERS=["Trueliftmovers.tests.RecordingRouter"])
+@mock.patch("Trueliftmovers.db_router.replica_configured", return_value=True)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        RecordingRouter.decisions.clear()
+
+    def aliases(self, kind):
+        return {alias for recorded, _, alias in RecordingRouter.decisions if recorded == kind}
+
+    def test_replica_reads_view_reads_from_the_replica(self, replica_configured):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get(reverse("admin-yearly-dashboard"), {"year": 2024})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aliases("read"), {REPLICA_DB_ALIAS})
+
+    def test_undecorated_view_reads_from_the_primary(self, replica_configured):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        truck = Truck.objects.create(truck_number_plate="TL-0001")
+        RecordingRouter.decisions.clear()
+
+        response = client.get(f"/adminapi/trucks/{truck.id}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aliases("read"), {"default"})
+
+    def test_notification_list_reads_from_the_primary(self, replica_configured):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get(reverse("notifications-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.aliases("read"), {"default"})
+
+    def test_reads_after_a_write_stay_on_the_primary_until_the_request_ends(self, replica_configured):
+        @replica_reads
+        def view(request):
+            DailyRollup.objects.count()
+            DailyRollup.objects.create(date="2024-01-01")
+            DailyRollup.objects.count()
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        middleware(RequestFactory().get("/"))
+        self.assertEqual(
+            [(kind, alias) for kind, label, alias in RecordingRouter.decisions if label == "adminapi.DailyRollup"],
+            [("read", REPLICA_DB_ALIAS), ("write", "default"), ("read", "default")],
+        )
+
+        # The next request starts on the replica again
+        RecordingRouter.decisions.clear()
+        ReplicaRoutingMiddleware(replica_reads(lambda request: HttpResponse(str(DailyRollup.objects.count()))))(
+            RequestFactory().get("/")
+        )
+        self.assertEqual(self.aliases("read"), {REPLICA_DB_ALIAS})
+
+
+
+@mock.patch("Trueliftmovers.dispatch.metrics", mock.Mock())
+class DeferredDispatchTests(TestCase):
+    def task(self, name, error=None):
+        task = mock.Mock()
+        task.name = name
+        task.apply_async.side_effect = error
+        return task
+
+    @mock.patch("Trueliftmovers.dispatch.current_app")
+    def test_failure_outside_a_request_runs_the_hook_and_raises(self, current_app):
+        error = ConnectionError("Broker unavailable")
+        current_app.producer_or_acquire.side_effect = error
+        on_failure = mock.Mock()
+
+        with self.assertRaises(ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                defer_apply(self.task("report"), (1,), on_failure=on_failure)
+
+        on_failure.assert_called_once_with(error)
+
+    @mock.patch("Trueliftmovers.dispatch.current_app")
+    def test_failure_inside_a_request_runs_the_hook(self, current_app):
+        error = ConnectionError("Broker unavailable")
+        current_app.producer_or_acquire.side_effect = error
+        on_failure = mock.Mock()
+
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                defer_apply(self.task("report"), (1,), on_failure=on_failure)
+            return HttpResponse()
+
+        response = DeferredDispatchMiddleware(view)(RequestFactory().post("/"))
+
+        self.assertEqual(response.status_code, 200)
+        on_failure.assert_called_once_with(error)
+
+    @mock.patch("Trueliftmovers.dispatch.current_app")
+    def test_only_the_failed_call_runs_its_hook(self, current_app):
+        failed, sent = mock.Mock(), mock.Mock()
+
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                defer_apply(self.task("broken", ConnectionError("Broker unavailable")), on_failure=failed)
+                defer_apply(self.task("working"), on_failure=sent)
+            return HttpResponse()
+
+        DeferredDispatchMiddleware(view)(RequestFactory().post("/"))
+
+        failed.assert_called_once()
+        sent.assert_not_called()
+
+
+
+class RankedSearchTests(TestCase):
+    def setUp(self):
+        for plate, driver in [
+            ("TL-0001", "Goldsmithing Ltd"),
+            ("TL-0002", "Smithson Haulage"),
+            ("TL-0003", "Bob Jones"),
+            ("TL-0004", "Ann Smith"),
+            ("SMITH-01", "Kay Lee"),
+        ]:
+            Truck.objects.create(truck_number_plate=plate, driver_name=driver)
+
+    def test_closer_word_matches_come_first(self):
+        trucks = ranked_search(Truck.objects.all(), ["truck_number_plate", "driver_name"], "smith", "id")
+
+        # The rank is the best field, whole word matches tie and fall back to the given ordering
+        self.assertEqual(
+            [(truck.truck_number_plate, round(truck.search_rank, 2)) for truck in trucks],
+            [("TL-0004", 1.0), ("SMITH-01", 1.0), ("TL-0002", 0.83), ("TL-0001", 0.5)],
+        )
+
+    def test_admin_user_search_is_ranked(self):
+        admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        for email, full_name in [
+            ("gold@example.com", "Goldsmithing Ltd"),
+            ("ann@example.com", "Ann Smith"),
+            ("bob@example.com", "Bob Jones"),
+            ("son@example.com", "Smithson Haulage"),
+        ]:
+            user = User.objects.create_user(email=email, username=email, password="x")
+            Profile.objects.create(user=user, full_name=full_name)
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get(reverse("user-list"), {"search": "smith"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user["email"] for user in response.data["data"]["results"]],
+            ["ann@example.com", "son@example.com", "gold@example.com"],
+        )
@@ -0,0 +1,17 @@
+def set_changed_fields(instance, values):
+    # Assigns only the values that differ and returns their names for save(update_fields=...)
+    changed_fields = []
+    for name, value in values.items():
+        field = instance._meta.get_field(name)
+        if field.is_relation:
+            current = getattr(instance, field.attname)
+            new = value.pk if value is not None else None
+        else:
+            current = getattr(instance, name)
+            new = value
+
+        if current != new:
+            setattr(instance, name, value)
+            changed_fields.append(name)
+
+    return changed_fields
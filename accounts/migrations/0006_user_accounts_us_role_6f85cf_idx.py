@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_profile_image'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', '-date_joined', '-id'], name='accounts_us_role_6f85cf_idx'),
+        ),
+    ]
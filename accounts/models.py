@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from .constants import ROLE_CHOICES
+from Trueliftmovers.search import trigram_index
 import random
 from datetime import timedelta
 from django.utils import timezone
@@ -16,6 +17,12 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["role", "-date_joined", "-id"]),
+            trigram_index("email", "user_email_trgm"),
+        ]
+
 
 
 
@@ -30,6 +37,12 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            trigram_index("full_name", "profile_name_trgm"),
+            trigram_index("phone", "profile_phone_trgm"),
+        ]
+
 
 
 
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import User,Profile,PasswordReserOTP
-from .tasks import send_otp_email
+from .tasks import queue_otp_email
+from django.db import transaction
 from django.contrib.auth.models import update_last_login
 from django.contrib.auth import password_validation
 
@@ -181,8 +182,9 @@ class SendOTPSerializer(serializers.Serializer):
     def save(self):
         email = self.validated_data["email"]
         user = User.objects.get(email=email)
-        otp_obj = PasswordReserOTP.objects.create(user=user)
-        send_otp_email.delay(user.id, otp_obj.otp)
+        with transaction.atomic():
+            otp_obj = PasswordReserOTP.objects.create(user=user)
+            queue_otp_email(otp_obj)
         return otp_obj
 
 
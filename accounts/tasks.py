@@ -1,26 +1,34 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import PasswordReserOTP, User
+from notifications.outbox import queue_email
+from .models import PasswordReserOTP
 from datetime import timedelta
 from django.utils import timezone
 
 
 
+def queue_otp_email(otp_obj):
+    # Keyed on the OTP row, codes are only four digits and a user can get the same one again
+    user = otp_obj.user
+    return queue_email(
+        subject="Your OTP Code",
+        body=f"Hello {user.username}, your OTP is: {otp_obj.otp}",
+        recipients=[user.email],
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        dedupe_key=f"otp:{otp_obj.id}",
+    )
+
+
+
 @shared_task
 def send_otp_email(user_id, otp):
-    try:
-        user = User.objects.get(id=user_id)
-        send_mail(
-            subject="Your OTP Code",
-            message=f"Hello {user.username}, your OTP is: {otp}",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-        )
-        return f"OTP sent to {user.email}"
-    except User.DoesNotExist:
-        return "User not found"
-    
+    # Kept for messages already queued, producers call queue_otp_email
+    otp_obj = PasswordReserOTP.objects.select_related("user").filter(user_id=user_id, otp=otp).order_by("-created_at").first()
+    if otp_obj is None:
+        return "OTP not found"
+    queue_otp_email(otp_obj)
+    return f"OTP queued for {otp_obj.user.email}"
+
 
 
 
@@ -1,3 +1,28 @@
+from unittest import mock
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from notifications.models import EmailOutbox
+from .models import User, PasswordReserOTP
 
 # Create your tests here.
+
+
+
+class SendOTPTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+
+    @mock.patch("accounts.models.random.randint", return_value=1234)
+    def test_a_repeated_code_is_still_emailed(self, randint):
+        client = APIClient()
+        for _ in range(2):
+            response = client.post(reverse("forget-password-send-otp"), {"email": self.user.email}, format="json")
+            self.assertEqual(response.status_code, 201)
+
+        otps = PasswordReserOTP.objects.filter(user=self.user)
+        self.assertEqual([otp.otp for otp in otps], ["1234", "1234"])
+        self.assertEqual(
+            sorted(EmailOutbox.objects.values_list("dedupe_key", flat=True)),
+            sorted(f"otp:{otp.id}" for otp in otps),
+        )
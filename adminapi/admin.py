@@ -1,3 +1,35 @@
 from django.contrib import admin
+from .models import DailyRollup, DailyBookingStatusRollup, DailyTruckRollup, ReportJob, GeoBucket
 
-# Register your models here.
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'new_users', 'truck_revenue', 'mover_revenue')
+    ordering = ('-date',)
+
+
+@admin.register(DailyBookingStatusRollup)
+class DailyBookingStatusRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'status', 'count')
+    list_filter = ('status',)
+    ordering = ('-date',)
+
+
+@admin.register(DailyTruckRollup)
+class DailyTruckRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'truck', 'bookings', 'completed_moves')
+    ordering = ('-date',)
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report_type', 'export_format', 'status', 'row_count', 'requested_by', 'created_at', 'completed_at')
+    list_filter = ('report_type', 'status')
+    ordering = ('-created_at',)
+
+
+@admin.register(GeoBucket)
+class GeoBucketAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'precision', 'geohash', 'center_lat', 'center_lng', 'count')
+    list_filter = ('kind', 'precision')
+    search_fields = ('geohash',)
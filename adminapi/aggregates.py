@@ -0,0 +1,106 @@
+from decimal import Decimal
+from datetime import datetime
+from django.db.models import Sum, F
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from .models import DailyRollup, DailyTruckRollup
+
+
+
+MAX_REPORT_MONTHS = 36
+
+MIN_YEAR = 2000
+MAX_YEAR = 2100
+
+
+
+def parse_int(value, field, minimum, maximum=None):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({field: "Must be a whole number."})
+    if maximum is None and number < minimum:
+        raise ValidationError({field: f"Must be at least {minimum}."})
+    if maximum is not None and not minimum <= number <= maximum:
+        raise ValidationError({field: f"Must be between {minimum} and {maximum}."})
+    return number
+
+
+
+def parse_day(value, field):
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({field: "Date must be in YYYY-MM-DD format."})
+    return parsed
+
+
+
+def parse_month(value, field):
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise ValidationError({field: "Month must be in YYYY-MM format."})
+    parse_int(parsed.year, field, MIN_YEAR, MAX_YEAR)
+    return parsed.year, parsed.month
+
+
+
+def month_range(start, end, limit=MAX_REPORT_MONTHS):
+    # Stops one month past the limit so callers can tell the range was too long
+    months = []
+    year, month = start
+    while (year, month) <= end and len(months) <= limit:
+        months.append((year, month))
+        year, month = year + month // 12, month % 12 + 1
+    return months
+
+
+
+# Dashboards read the daily rollups maintained by adminapi.signals and
+# reconciled by adminapi.tasks instead of scanning bookings and users.
+
+def _monthly_rollups(year):
+    return (
+        DailyRollup.objects.filter(date__year=year)
+        .annotate(month=TruncMonth("date"))
+        .values("month")
+        .annotate(users=Sum("new_users"), revenue=Sum(F("truck_revenue") + F("mover_revenue")))
+        .values_list("month", "users", "revenue")
+    )
+
+
+
+def monthly_revenue(year):
+    revenue = {month: Decimal("0") for month in range(1, 13)}
+    for month, _, total in _monthly_rollups(year):
+        revenue[month.month] = total or Decimal("0")
+    return revenue
+
+
+
+def monthly_new_users(year):
+    users = {month: 0 for month in range(1, 13)}
+    for month, total, _ in _monthly_rollups(year):
+        users[month.month] = total or 0
+    return users
+
+
+
+def monthly_truck_bookings(start, end):
+    # {(truck_id, (year, month)): count} for bookings created in [start, end)
+    query = (
+        DailyTruckRollup.objects.filter(date__gte=start.date(), date__lt=end.date())
+        .annotate(month=TruncMonth("date"))
+        .values("truck_id", "month")
+        .annotate(total=Sum("bookings"))
+        .values_list("truck_id", "month", "total")
+    )
+    return {(truck_id, (month.year, month.month)): total for truck_id, month, total in query}
@@ -0,0 +1,70 @@
+import logging
+import redis
+from django.db import transaction
+from accounts.models import User
+from booking.models import Booking
+from truck.models import Truck
+from Trueliftmovers.redis_client import get_redis
+
+
+
+logger = logging.getLogger(__name__)
+
+COUNTER_PREFIX = "dashboard:"
+
+COUNTERS = {
+    "total_trucks": lambda: Truck.objects.count(),
+    "total_customers": lambda: User.objects.filter(role="user").count(),
+    "total_pending_booking": lambda: Booking.objects.filter(status="pending").count(),
+}
+
+# Only adjust counters that exist, a missing key is rebuilt by the next recount
+INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+
+def recount():
+    values = {name: count() for name, count in COUNTERS.items()}
+    try:
+        get_redis().mset({f"{COUNTER_PREFIX}{name}": value for name, value in values.items()})
+    except redis.RedisError:
+        logger.warning("Could not store dashboard counters")
+    return values
+
+
+
+def read():
+    try:
+        values = get_redis().mget([f"{COUNTER_PREFIX}{name}" for name in COUNTERS])
+    except redis.RedisError:
+        logger.warning("Could not read dashboard counters")
+        values = [None]
+
+    if any(value is None for value in values):
+        return recount()
+    return {name: int(value) for name, value in zip(COUNTERS, values)}
+
+
+
+def _apply(deltas):
+    try:
+        client = get_redis()
+        pipeline = client.pipeline(transaction=False)
+        for name, amount in deltas.items():
+            pipeline.eval(INCR_IF_EXISTS, 1, f"{COUNTER_PREFIX}{name}", amount)
+        pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not update dashboard counters %s", deltas)
+
+
+
+def adjust(**deltas):
+    # Applied after commit so rolled back writes never reach the counters
+    deltas = {name: amount for name, amount in deltas.items() if amount}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
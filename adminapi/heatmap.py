@@ -0,0 +1,95 @@
+from collections import Counter
+from django.db import router, transaction
+from django.db.models import Sum
+from booking.models import Booking, ArchivedBooking
+from .geohash import encode, center
+from .models import GeoBucket
+from .rollups import increment
+
+
+
+GEO_PRECISIONS = (3, 4, 5, 6, 7)
+
+# Highest map zoom level served by each precision (cells shrink ~8x per character)
+ZOOM_PRECISIONS = ((4, 3), (7, 4), (10, 5), (13, 6))
+
+LOCATION_FIELDS = {
+    "pickup": ("pickup_lat", "pickup_lng"),
+    "drop": ("drop_lat", "drop_lng"),
+}
+
+
+
+def zoom_precision(zoom):
+    for max_zoom, precision in ZOOM_PRECISIONS:
+        if zoom <= max_zoom:
+            return precision
+    return GEO_PRECISIONS[-1]
+
+
+
+def count_locations(locations):
+    # locations: iterable of (kind, lat, lng) -> Counter of (kind, precision, geohash)
+    counts = Counter()
+    for kind, lat, lng in locations:
+        if lat is None or lng is None:
+            continue
+        geohash = encode(lat, lng, GEO_PRECISIONS[-1])
+        for precision in GEO_PRECISIONS:
+            counts[(kind, precision, geohash[:precision])] += 1
+    return counts
+
+
+
+def bucket_rows(counts):
+    rows = []
+    for (kind, precision, geohash), total in counts.items():
+        center_lat, center_lng = center(geohash)
+        rows.append({
+            "kind": kind,
+            "precision": precision,
+            "geohash": geohash,
+            "center_lat": center_lat,
+            "center_lng": center_lng,
+            "count": total,
+        })
+    return rows
+
+
+
+def booking_locations(booking):
+    for kind, (lat_field, lng_field) in LOCATION_FIELDS.items():
+        yield kind, getattr(booking, lat_field), getattr(booking, lng_field)
+
+
+
+def record_booking_locations(bookings):
+    counts = count_locations(location for booking in bookings for location in booking_locations(booking))
+    increment(GeoBucket, ["kind", "precision", "geohash"], bucket_rows(counts), counter_fields=["count"])
+
+
+
+def rebuild_geo_buckets(chunk_size=2000):
+    counts = Counter()
+    for model in (Booking, ArchivedBooking):
+        for kind, (lat_field, lng_field) in LOCATION_FIELDS.items():
+            locations = model.objects.values_list(lat_field, lng_field).iterator(chunk_size=chunk_size)
+            counts.update(count_locations((kind, lat, lng) for lat, lng in locations))
+
+    with transaction.atomic(using=router.db_for_write(GeoBucket)):
+        GeoBucket.objects.all().delete()
+        GeoBucket.objects.bulk_create([GeoBucket(**row) for row in bucket_rows(counts)], batch_size=chunk_size)
+
+    return len(counts)
+
+
+
+def buckets_complete():
+    # Every booking adds one pickup location at each precision, so the coarsest pickup buckets
+    # add up to the number of bookings with a pickup location once the history is counted
+    counted = GeoBucket.objects.filter(kind="pickup", precision=GEO_PRECISIONS[0]).aggregate(total=Sum("count"))["total"] or 0
+    located = sum(
+        model.objects.filter(pickup_lat__isnull=False, pickup_lng__isnull=False).count()
+        for model in (Booking, ArchivedBooking)
+    )
+    return counted >= located
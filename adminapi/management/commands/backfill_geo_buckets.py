@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from adminapi.heatmap import buckets_complete, rebuild_geo_buckets
+
+
+
+class Command(BaseCommand):
+    help = "Rebuild the booking heatmap buckets from every active and archived booking"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--if-incomplete",
+            action="store_true",
+            help="Only rebuild when the buckets count fewer bookings than exist, safe to run on every deploy",
+        )
+
+    def handle(self, *args, **options):
+        if options["if_incomplete"] and buckets_complete():
+            self.stdout.write("Geo buckets already cover every booking, nothing to backfill")
+            return
+
+        total = rebuild_geo_buckets(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} geo buckets rebuilt"))
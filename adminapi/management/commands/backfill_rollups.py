@@ -0,0 +1,50 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from adminapi.models import DailyRollup, DailyBookingStatusRollup
+from adminapi.rollups import first_activity_date, rebuild_rollups_range
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily analytics rollups the dashboards read from the user and booking tables, "
+        "by default from the first user or booking to today"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD), defaults to today")
+        parser.add_argument("--batch-days", type=int, default=31)
+        parser.add_argument(
+            "--if-empty",
+            action="store_true",
+            help="Do nothing when the rollups already hold past days, safe to run on every deploy",
+        )
+
+    def handle(self, *args, **options):
+        # Rows for today are written by the signal handlers as soon as the app runs, so only
+        # earlier days tell whether the history was ever built
+        today = timezone.localdate()
+        if options["if_empty"] and (
+            DailyRollup.objects.filter(date__lt=today).exists()
+            or DailyBookingStatusRollup.objects.filter(date__lt=today).exists()
+        ):
+            self.stdout.write("Rollups already populated, nothing to backfill")
+            return
+
+        start = options["start"] or first_activity_date()
+        end = options["end"] or today
+        if start is None:
+            self.stdout.write("No users or bookings yet, nothing to backfill")
+            return
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        rebuild_rollups_range(
+            start,
+            end,
+            batch_days=options["batch_days"],
+            progress=lambda first, last: self.stdout.write(f"Rebuilt {first} to {last}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt from {start} to {end}"))
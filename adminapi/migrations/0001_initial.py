@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('truck', '0005_truck_imei_truck_last_location_update_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('new_users', models.IntegerField(default=0)),
+                ('truck_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('mover_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyBookingStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('accepted', 'Accepted'), ('start', 'Start'), ('end_request', 'End Request'), ('end', 'End'), ('complete', 'Complete'), ('reject', 'Reject')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'status'), name='unique_daily_booking_status')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTruckRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings', models.IntegerField(default=0)),
+                ('completed_moves', models.IntegerField(default=0)),
+                ('truck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='truck.truck')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'truck'), name='unique_daily_truck')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailybookingstatusrollup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='dailytruckrollup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminapi', '0003_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeoBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('pickup', 'Pickup'), ('drop', 'Drop-off')], max_length=10)),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('geohash', models.CharField(max_length=12)),
+                ('center_lat', models.FloatField()),
+                ('center_lng', models.FloatField()),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'precision', 'center_lat', 'center_lng'], name='adminapi_ge_kind_e10482_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'precision', 'geohash'), name='unique_geo_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:10
+
+import secrets
+from django.db import migrations, models
+
+
+
+def rename_report_files(apps, schema_editor):
+    # Snapshots used to be stored as reports/<type>-<id>.<format>, which anyone could guess
+    ReportJob = apps.get_model('adminapi', 'ReportJob')
+    for job in ReportJob.objects.exclude(file='').exclude(file__isnull=True).iterator():
+        storage = job.file.storage
+        if not storage.exists(job.file.name):
+            continue
+        old_name = job.file.name
+        with storage.open(old_name, 'rb') as content:
+            job.file.save(f"{job.report_type}-{secrets.token_urlsafe(24)}.{job.export_format}", content, save=False)
+        ReportJob.objects.filter(id=job.id).update(file=job.file.name)
+        storage.delete(old_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminapi', '0004_geobucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(rename_report_files, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,116 @@
 from django.db import models
+from truck.models import Truck
+from booking.constants import STATUS_CHOICES
+from accounts.models import User
 
 # Create your models here.
+
+
+# Daily rollups are keyed by the day the booking was created (or the user joined),
+# so they add up to the same numbers the dashboards used to scan for.
+
+class DailyRollup(models.Model):
+    date = models.DateField(unique=True)
+    new_users = models.IntegerField(default=0)
+    truck_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    mover_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rollup {self.date}"
+
+
+
+class DailyBookingStatusRollup(models.Model):
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "status"], name="unique_daily_booking_status"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.status}: {self.count}"
+
+
+
+class DailyTruckRollup(models.Model):
+    date = models.DateField()
+    truck = models.ForeignKey(Truck, on_delete=models.CASCADE, related_name='daily_rollups')
+    bookings = models.IntegerField(default=0)
+    completed_moves = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "truck"], name="unique_daily_truck"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} truck #{self.truck_id}"
+
+
+
+class ReportJob(models.Model):
+    REPORT_TYPE_CHOICES = (
+        ('revenue', 'Revenue'),
+        ('truck_bookings', 'Truck bookings'),
+        ('booking_status', 'Booking status'),
+    )
+    FORMAT_CHOICES = (
+        ('json', 'JSON'),
+        ('csv', 'CSV'),
+    )
+    REPORT_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    report_type = models.CharField(max_length=30, choices=REPORT_TYPE_CHOICES)
+    export_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='json')
+    params = models.JSONField(default=dict)
+    params_hash = models.CharField(max_length=64, db_index=True)
+    data_version = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=REPORT_STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='reports/', null=True, blank=True)
+    row_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Report #{self.id} {self.report_type} ({self.status})"
+
+
+
+class GeoBucket(models.Model):
+    KIND_CHOICES = (
+        ('pickup', 'Pickup'),
+        ('drop', 'Drop-off'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    precision = models.PositiveSmallIntegerField()
+    geohash = models.CharField(max_length=12)
+    center_lat = models.FloatField()
+    center_lng = models.FloatField()
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "precision", "geohash"], name="unique_geo_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["kind", "precision", "center_lat", "center_lng"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.geohash}: {self.count}"
@@ -0,0 +1,175 @@
+import csv
+import hashlib
+import io
+import json
+import secrets
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from truck.models import Truck
+from .models import DailyRollup, DailyBookingStatusRollup, DailyTruckRollup, ReportJob
+
+
+
+REPORT_MAX_MONTHS = 120
+
+# Months computed per query while a report is generated
+REPORT_CHUNK_MONTHS = 12
+
+
+
+def fail_stale_jobs(jobs):
+    # Pending or running jobs whose worker died or whose task was lost are failed, so the
+    # next identical request queues a fresh job instead of waiting on them forever
+    now = timezone.now()
+    return jobs.filter(
+        status__in=["pending", "running"],
+        updated_at__lt=now - timedelta(seconds=settings.REPORT_JOB_TIMEOUT_SECONDS),
+    ).update(status="failed", error="Report job timed out", completed_at=now, updated_at=now)
+
+
+
+def fail_undispatched_job(job_id, error):
+    # The generate_report task never reached the broker, fail the job instead of leaving it pending
+    now = timezone.now()
+    return ReportJob.objects.filter(id=job_id, status="pending").update(
+        status="failed", error=f"Report job could not be queued: {error}", completed_at=now, updated_at=now,
+    )
+
+
+
+def report_filename(job):
+    # Random so a snapshot cannot be found by guessing, downloads go through the authenticated view
+    return f"{job.report_type}-{secrets.token_urlsafe(24)}.{job.export_format}"
+
+
+
+def _month_bounds(months):
+    start = date(*months[0], 1)
+    year, month = months[-1]
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+
+def _month_key(value):
+    return f"{value.year}-{value.month:02d}"
+
+
+
+def revenue_rows(months):
+    start, end = _month_bounds(months)
+    totals = {
+        _month_key(month): (users, truck_revenue, mover_revenue)
+        for month, users, truck_revenue, mover_revenue in (
+            DailyRollup.objects.filter(date__gte=start, date__lt=end)
+            .annotate(month=TruncMonth("date")).values("month")
+            .annotate(users=Sum("new_users"), truck_revenue=Sum("truck_revenue"), mover_revenue=Sum("mover_revenue"))
+            .values_list("month", "users", "truck_revenue", "mover_revenue")
+        )
+    }
+    for year, month in months:
+        key = f"{year}-{month:02d}"
+        users, truck_revenue, mover_revenue = totals.get(key, (0, 0, 0))
+        yield {
+            "month": key,
+            "new_users": users,
+            "truck_revenue": truck_revenue,
+            "mover_revenue": mover_revenue,
+            "total_revenue": truck_revenue + mover_revenue,
+        }
+
+
+
+def truck_rows(months):
+    start, end = _month_bounds(months)
+    plates = dict(Truck.objects.values_list("id", "truck_number_plate"))
+    query = (
+        DailyTruckRollup.objects.filter(date__gte=start, date__lt=end)
+        .annotate(month=TruncMonth("date")).values("month", "truck_id")
+        .annotate(bookings=Sum("bookings"), completed_moves=Sum("completed_moves"))
+        .order_by("month", "truck_id")
+        .values_list("month", "truck_id", "bookings", "completed_moves")
+    )
+    for month, truck_id, bookings, completed_moves in query:
+        yield {
+            "month": _month_key(month),
+            "truck_id": truck_id,
+            "truck_number_plate": plates.get(truck_id),
+            "bookings": bookings,
+            "completed_moves": completed_moves,
+        }
+
+
+
+def booking_status_rows(months):
+    start, end = _month_bounds(months)
+    query = (
+        DailyBookingStatusRollup.objects.filter(date__gte=start, date__lt=end)
+        .annotate(month=TruncMonth("date")).values("month", "status")
+        .annotate(total=Sum("count"))
+        .order_by("month", "status")
+        .values_list("month", "status", "total")
+    )
+    for month, booking_status, total in query:
+        yield {"month": _month_key(month), "status": booking_status, "count": total}
+
+
+
+REPORTS = {
+    "revenue": {
+        "model": DailyRollup,
+        "rows": revenue_rows,
+        "headers": ["month", "new_users", "truck_revenue", "mover_revenue", "total_revenue"],
+    },
+    "truck_bookings": {
+        "model": DailyTruckRollup,
+        "rows": truck_rows,
+        "headers": ["month", "truck_id", "truck_number_plate", "bookings", "completed_moves"],
+    },
+    "booking_status": {
+        "model": DailyBookingStatusRollup,
+        "rows": booking_status_rows,
+        "headers": ["month", "status", "count"],
+    },
+}
+
+
+
+def params_hash(report_type, export_format, params):
+    payload = json.dumps([report_type, export_format, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+
+def data_version(report_type, months):
+    # Fingerprint of the rollup rows a report reads, unchanged until one of them is written
+    start, end = _month_bounds(months)
+    stats = REPORTS[report_type]["model"].objects.filter(date__gte=start, date__lt=end).aggregate(
+        rows=Count("id"), updated_at=Max("updated_at")
+    )
+    updated_at = stats["updated_at"].isoformat() if stats["updated_at"] else ""
+    return f"{stats['rows']}:{updated_at}"
+
+
+
+def build_report(report_type, export_format, months):
+    report = REPORTS[report_type]
+    rows = []
+    for index in range(0, len(months), REPORT_CHUNK_MONTHS):
+        rows.extend(report["rows"](months[index:index + REPORT_CHUNK_MONTHS]))
+
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=report["headers"])
+        writer.writeheader()
+        writer.writerows(rows)
+        content = buffer.getvalue()
+    else:
+        content = json.dumps({"report_type": report_type, "rows": rows}, cls=DjangoJSONEncoder)
+
+    return ContentFile(content.encode()), len(rows)
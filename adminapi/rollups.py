@@ -0,0 +1,208 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import connections, router, transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from accounts.models import User
+from booking.models import Booking, ArchivedBooking
+from .models import DailyRollup, DailyBookingStatusRollup, DailyTruckRollup
+
+
+
+def increment(model, key_fields, rows, counter_fields=None):
+    # INSERT ... ON CONFLICT DO UPDATE adding the deltas, one statement for all rows.
+    # Fields that are neither keys nor counters are only written on insert.
+    if not rows:
+        return
+    fields = list(rows[0].keys())
+    if counter_fields is None:
+        counter_fields = [name for name in fields if name not in key_fields]
+
+    rows = [row for row in rows if any(row[name] for name in counter_fields)]
+    if not rows:
+        return
+
+    table = model._meta.db_table
+    columns = [model._meta.get_field(name).column for name in fields]
+    key_columns = [model._meta.get_field(name).column for name in key_fields]
+    counter_columns = [model._meta.get_field(name).column for name in counter_fields]
+
+    # updated_at feeds the snapshot version used by adminapi.reports
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(fields)) + ", CURRENT_TIMESTAMP)"] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}, updated_at) VALUES {placeholders} "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET updated_at = EXCLUDED.updated_at, "
+        + ", ".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in counter_columns)
+    )
+    params = [row[name] for row in rows for name in fields]
+
+    with connections[router.db_for_write(model)].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+
+def counts_as_revenue(booking):
+    return booking.status == "complete" and booking.final_price is not None and booking.movers_total is not None
+
+
+
+def record_booking_changes(changes):
+    # changes: [(booking, previous_status)], previous_status is None for new bookings
+    statuses = defaultdict(int)
+    revenue = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    trucks = defaultdict(lambda: [0, 0])
+
+    for booking, previous_status in changes:
+        if previous_status == booking.status:
+            continue
+        day = timezone.localdate(booking.created_at)
+
+        if previous_status:
+            statuses[(day, previous_status)] -= 1
+        statuses[(day, booking.status)] += 1
+
+        if previous_status is None and booking.truck_id:
+            trucks[(day, booking.truck_id)][0] += 1
+
+        if previous_status != "complete" and counts_as_revenue(booking):
+            revenue[day][0] += booking.final_price
+            revenue[day][1] += booking.movers_total
+            if booking.truck_id:
+                trucks[(day, booking.truck_id)][1] += 1
+
+    increment(DailyBookingStatusRollup, ["date", "status"], [
+        {"date": day, "status": status, "count": delta}
+        for (day, status), delta in statuses.items()
+    ])
+    increment(DailyRollup, ["date"], [
+        {"date": day, "new_users": 0, "truck_revenue": truck_revenue, "mover_revenue": mover_revenue}
+        for day, (truck_revenue, mover_revenue) in revenue.items()
+    ])
+    increment(DailyTruckRollup, ["date", "truck"], [
+        {"date": day, "truck": truck_id, "bookings": bookings, "completed_moves": completed_moves}
+        for (day, truck_id), (bookings, completed_moves) in trucks.items()
+    ])
+
+
+
+def record_truck_changes(changes):
+    # changes: [(booking, previous_truck_id)]
+    trucks = defaultdict(int)
+    for booking, previous_truck_id in changes:
+        if previous_truck_id == booking.truck_id:
+            continue
+        day = timezone.localdate(booking.created_at)
+        if previous_truck_id:
+            trucks[(day, previous_truck_id)] -= 1
+        if booking.truck_id:
+            trucks[(day, booking.truck_id)] += 1
+
+    increment(DailyTruckRollup, ["date", "truck"], [
+        {"date": day, "truck": truck_id, "bookings": delta, "completed_moves": 0}
+        for (day, truck_id), delta in trucks.items()
+    ])
+
+
+
+def record_new_user(user):
+    increment(DailyRollup, ["date"], [
+        {"date": timezone.localdate(user.date_joined), "new_users": 1, "truck_revenue": 0, "mover_revenue": 0}
+    ])
+
+
+
+def _day_filter(field, dates):
+    q_filter = Q()
+    for day in dates:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        q_filter |= Q(**{f"{field}__gte": start, f"{field}__lt": start + timedelta(days=1)})
+    return q_filter
+
+
+
+def reconcile_rollups(dates):
+    # Recomputes the rollups of the given days from the source tables
+    dates = sorted(set(dates))
+    if not dates:
+        return
+
+    daily = defaultdict(lambda: {"new_users": 0, "truck_revenue": Decimal("0"), "mover_revenue": Decimal("0")})
+    statuses = defaultdict(int)
+    trucks = defaultdict(lambda: [0, 0])
+
+    users = (
+        User.objects.filter(_day_filter("date_joined", dates))
+        .annotate(day=TruncDate("date_joined")).values("day").annotate(total=Count("id"))
+        .values_list("day", "total")
+    )
+    for day, total in users:
+        daily[day]["new_users"] = total
+
+    for model in (Booking, ArchivedBooking):
+        bookings = model.objects.filter(_day_filter("created_at", dates)).annotate(day=TruncDate("created_at"))
+
+        for day, status, total in bookings.values("day", "status").annotate(total=Count("id")).values_list("day", "status", "total"):
+            statuses[(day, status)] += total
+
+        revenue = (
+            bookings.filter(status="complete", final_price__isnull=False, movers_total__isnull=False)
+            .values("day").annotate(truck_revenue=Sum("final_price"), mover_revenue=Sum("movers_total"))
+            .values_list("day", "truck_revenue", "mover_revenue")
+        )
+        for day, truck_revenue, mover_revenue in revenue:
+            daily[day]["truck_revenue"] += truck_revenue
+            daily[day]["mover_revenue"] += mover_revenue
+
+        per_truck = (
+            bookings.filter(truck__isnull=False)
+            .values("day", "truck_id")
+            .annotate(
+                total=Count("id"),
+                completed=Count("id", filter=Q(status="complete", final_price__isnull=False, movers_total__isnull=False)),
+            )
+            .values_list("day", "truck_id", "total", "completed")
+        )
+        for day, truck_id, total, completed in per_truck:
+            trucks[(day, truck_id)][0] += total
+            trucks[(day, truck_id)][1] += completed
+
+    with transaction.atomic(using=router.db_for_write(DailyRollup)):
+        DailyRollup.objects.filter(date__in=dates).delete()
+        DailyBookingStatusRollup.objects.filter(date__in=dates).delete()
+        DailyTruckRollup.objects.filter(date__in=dates).delete()
+
+        DailyRollup.objects.bulk_create([DailyRollup(date=day, **values) for day, values in daily.items()])
+        DailyBookingStatusRollup.objects.bulk_create([
+            DailyBookingStatusRollup(date=day, status=status, count=total)
+            for (day, status), total in statuses.items()
+        ])
+        DailyTruckRollup.objects.bulk_create([
+            DailyTruckRollup(date=day, truck_id=truck_id, bookings=total, completed_moves=completed)
+            for (day, truck_id), (total, completed) in trucks.items()
+        ])
+
+
+
+def first_activity_date():
+    # Earliest day any rollup can have data for, None on an empty database
+    days = [
+        User.objects.aggregate(first=Min("date_joined"))["first"],
+        Booking.objects.aggregate(first=Min("created_at"))["first"],
+        ArchivedBooking.objects.aggregate(first=Min("created_at"))["first"],
+    ]
+    days = [timezone.localdate(day) for day in days if day is not None]
+    return min(days) if days else None
+
+
+
+def rebuild_rollups_range(start, end, batch_days=31, progress=None):
+    # Rebuilds every day from start to end inclusive, batch_days per transaction
+    day = start
+    while day <= end:
+        batch_end = min(day + timedelta(days=batch_days - 1), end)
+        reconcile_rollups([day + timedelta(days=offset) for offset in range((batch_end - day).days + 1)])
+        if progress:
+            progress(day, batch_end)
+        day = batch_end + timedelta(days=1)
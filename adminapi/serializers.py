@@ -1,124 +1,79 @@
 from rest_framework import serializers
-from truck.models import Truck
-from booking.models import Booking
+from booking.models import Booking, ArchivedBooking
 from accounts.models import User , Profile
-from django.db.models import Sum, F, FloatField
-from decimal import Decimal
+from django.db import connections
+from django.urls import reverse
 import calendar
+from .models import ReportJob, GeoBucket
+from .aggregates import parse_month, month_range
+from .reports import REPORT_MAX_MONTHS
+from Trueliftmovers.db_router import read_db_alias
 
-class DashbordSerializer(serializers.Serializer):
-    total_trucks = serializers.SerializerMethodField()
-    total_customers = serializers.SerializerMethodField()
-    total_pending_booking = serializers.SerializerMethodField()
 
-    def get_total_trucks(self, obj):
-        return Truck.objects.count()
-    
-    def get_total_customers(self, obj):
-        return User.objects.filter(role="user").count()
-    
-    def get_total_pending_booking(self, obj):
-        return Booking.objects.filter(status="pending").count()
-    
 
+class DashbordSerializer(serializers.Serializer):
+    total_trucks = serializers.IntegerField()
+    total_customers = serializers.IntegerField()
+    total_pending_booking = serializers.IntegerField()
 
-class MonthlyTruckBookingSerializer(serializers.ModelSerializer):
-    total_bookings = serializers.SerializerMethodField()
 
-    class Meta:
-        model = Truck
-        fields = ["truck_number_plate", "total_bookings"]
-
-    def get_total_bookings(self, obj):
-        month = self.context.get("month")
-        year = self.context.get("year")
-
-        bookings = Booking.objects.filter(
-            truck=obj,
-            created_at__year=year,
-            created_at__month=month
-        )
-        return bookings.count()
+
+class MonthlyTruckBookingSerializer(serializers.Serializer):
+    truck_number_plate = serializers.CharField()
+    total_bookings = serializers.IntegerField()
+    monthly_bookings = serializers.ListField(child=serializers.IntegerField())
     
 
 
+
 class YearlyDashboardSerializer(serializers.Serializer):
     month = serializers.CharField()
-    total_users = serializers.SerializerMethodField()
-    total_revenue = serializers.SerializerMethodField()
-
-    def get_total_users(self, obj):
-        year = self.context.get("year")
-        month_number = obj["month_number"]
-        return User.objects.filter(
-            date_joined__year=year,
-            date_joined__month=month_number
-        ).count()
-
-    def get_total_revenue(self, obj):
-        year = self.context.get("year")
-        month_number = obj["month_number"]
-        total = Booking.objects.filter(
-            created_at__year=year,
-            created_at__month=month_number,
-            status="complete" 
-        ).aggregate(
-            total=Sum(F("final_price") + F("movers_total"), output_field=FloatField())
-        )["total"]
-        return total or Decimal("0.00")
-    
+    total_users = serializers.IntegerField()
+    total_revenue = serializers.FloatField()
+
 
 
 
 class YearlyDashboardRevenueSerializer(serializers.Serializer):
     month = serializers.CharField()
-    total_revenue = serializers.SerializerMethodField()
-    yearly_percentage = serializers.SerializerMethodField()
+    total_revenue = serializers.FloatField()
+    yearly_percentage = serializers.FloatField()
 
-    def get_total_revenue(self, obj):
-        year = self.context.get("year")
-        month_number = obj["month_number"]
 
-        total = Booking.objects.filter(
-            created_at__year=year,
-            created_at__month=month_number,
-            status="complete"
-        ).aggregate(
-            total=Sum(F("final_price") + F("movers_total"), output_field=FloatField())
-        )["total"]
 
-        return Decimal(total or 0)
 
-    def get_yearly_percentage(self, obj):
-        year = self.context.get("year")
-        month_number = obj["month_number"]
+RECENT_BOOKING_FIELDS = [
+    "id", "truck_id", "status", "pickup_time", "drop_off_address", "final_price", "movers_total", "created_at",
+]
 
-    
-        month_revenue = Booking.objects.filter(
-            created_at__year=year,
-            created_at__month=month_number,
-            status="complete"
-        ).aggregate(
-            total=Sum(F("final_price") + F("movers_total"), output_field=FloatField())
-        )["total"]
-        month_revenue = Decimal(month_revenue or 0)
 
-    
-        yearly_total_revenue = Booking.objects.filter(
-            created_at__year=year,
-            status="complete"
-        ).aggregate(
-            total=Sum(F("final_price") + F("movers_total"), output_field=FloatField())
-        )["total"]
-        yearly_total_revenue = Decimal(yearly_total_revenue or 0)
 
-        if yearly_total_revenue > 0:
-            percentage = (month_revenue / yearly_total_revenue) * Decimal("100")
-        else:
-            percentage = Decimal("0.00")
+def attach_recent_bookings(users):
+    # Sets recent_booking_data on each user from one LATERAL lookup over the active and archived
+    # bookings. Each side is a single (user, -created_at) index probe per user
+    users = list(users)
+    for user in users:
+        user.recent_booking_data = None
+    if not users:
+        return users
 
-        return round(percentage, 2)
+    columns = ", ".join(RECENT_BOOKING_FIELDS)
+    latest = f"(SELECT {columns} FROM {{table}} WHERE user_id = u.id ORDER BY created_at DESC LIMIT 1)"
+    sql = (
+        f"SELECT u.id, {', '.join(f'r.{field}' for field in RECENT_BOOKING_FIELDS)} "
+        f"FROM unnest(%s::bigint[]) AS u(id) "
+        f"CROSS JOIN LATERAL ("
+        f"{latest.format(table=Booking._meta.db_table)} UNION ALL {latest.format(table=ArchivedBooking._meta.db_table)} "
+        f"ORDER BY created_at DESC LIMIT 1"
+        f") AS r"
+    )
+    with connections[read_db_alias()].cursor() as cursor:
+        cursor.execute(sql, [[user.id for user in users]])
+        recent = {row[0]: dict(zip(RECENT_BOOKING_FIELDS, row[1:])) for row in cursor.fetchall()}
 
+    for user in users:
+        user.recent_booking_data = recent.get(user.id)
+    return users
 
 
 
@@ -140,19 +95,9 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'date_joined', 'recent_booking']
 
     def get_recent_booking(self, obj):
-        booking = obj.bookings.order_by('-created_at').first()
-        if booking:
-            return {
-                "id": booking.id,
-                "truck_id": booking.truck.id if booking.truck else None,
-                "status": booking.status,
-                "pickup_time": booking.pickup_time,
-                "drop_off_address": booking.drop_off_address,
-                "final_price": booking.final_price,
-                "movers_total": booking.movers_total,
-                "created_at":booking.created_at
-            }
-        return None
+        if not hasattr(obj, 'recent_booking_data'):
+            attach_recent_bookings([obj])
+        return obj.recent_booking_data
 
     def validate(self, attrs):
         email = attrs.get('email')
@@ -201,3 +146,87 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 
+
+
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    report_type = serializers.ChoiceField(choices=ReportJob.REPORT_TYPE_CHOICES)
+    export_format = serializers.ChoiceField(choices=ReportJob.FORMAT_CHOICES, default='json')
+    start_month = serializers.CharField(help_text="First month (YYYY-MM)")
+    end_month = serializers.CharField(help_text="Last month (YYYY-MM)")
+
+    def validate(self, attrs):
+        start_month = parse_month(attrs['start_month'], 'start_month')
+        end_month = parse_month(attrs['end_month'], 'end_month')
+
+        months = month_range(start_month, end_month, limit=REPORT_MAX_MONTHS)
+        if not months:
+            raise serializers.ValidationError({'end_month': 'End month must not be before start month.'})
+        if len(months) > REPORT_MAX_MONTHS:
+            raise serializers.ValidationError({'end_month': f'A report can cover at most {REPORT_MAX_MONTHS} months.'})
+
+        attrs['months'] = months
+        attrs['params'] = {'start_month': list(start_month), 'end_month': list(end_month)}
+        return attrs
+
+
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    # Snapshots are only served through the authenticated download endpoint
+    file = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'report_type', 'export_format', 'params', 'status', 'file',
+            'row_count', 'error', 'created_at', 'completed_at',
+        ]
+
+    def get_file(self, obj):
+        if not obj.file:
+            return None
+        url = reverse("admin-report-download", args=[obj.id])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+
+
+
+class TruckUtilisationSerializer(serializers.Serializer):
+    truck_id = serializers.IntegerField()
+    truck_number_plate = serializers.CharField()
+    bookings = serializers.IntegerField()
+    busy_hours = serializers.FloatField()
+    idle_hours = serializers.FloatField()
+    utilisation_percent = serializers.FloatField()
+    gaps = serializers.IntegerField()
+    longest_gap_hours = serializers.FloatField()
+
+
+
+
+class GeoHeatmapQuerySerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=GeoBucket.KIND_CHOICES, default='pickup')
+    min_lat = serializers.FloatField(min_value=-90, max_value=90)
+    max_lat = serializers.FloatField(min_value=-90, max_value=90)
+    min_lng = serializers.FloatField(min_value=-180, max_value=180)
+    max_lng = serializers.FloatField(min_value=-180, max_value=180)
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+    def validate(self, attrs):
+        if attrs['min_lat'] > attrs['max_lat']:
+            raise serializers.ValidationError({'min_lat': 'min_lat must not be greater than max_lat.'})
+        return attrs
+
+
+
+
+class GeoBucketSerializer(serializers.ModelSerializer):
+    lat = serializers.FloatField(source='center_lat')
+    lng = serializers.FloatField(source='center_lng')
+
+    class Meta:
+        model = GeoBucket
+        fields = ['geohash', 'lat', 'lng', 'count']
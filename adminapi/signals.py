@@ -0,0 +1,68 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import User
+from booking.models import Booking
+from truck.models import Truck
+from booking.signals import booking_status_changed, booking_truck_changed
+from .rollups import record_booking_changes, record_truck_changes, record_new_user
+from .heatmap import record_booking_locations
+from . import counters
+
+
+
+# Rollup increments run inside the caller's transaction, so they commit or roll back with the booking.
+
+@receiver(post_save, sender=User)
+def rollup_new_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_new_user(instance)
+        counters.adjust(total_customers=int(instance.role == "user"))
+
+
+
+@receiver(post_save, sender=Booking)
+def rollup_new_booking(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_booking_changes([(instance, None)])
+        record_booking_locations([instance])
+        counters.adjust(total_pending_booking=int(instance.status == "pending"))
+
+
+
+@receiver(booking_status_changed)
+def rollup_status_changes(sender, changes, **kwargs):
+    record_booking_changes(changes)
+    counters.adjust(total_pending_booking=sum(
+        (booking.status == "pending") - (previous_status == "pending") for booking, previous_status in changes
+    ))
+
+
+
+@receiver(booking_truck_changed)
+def rollup_truck_changes(sender, changes, **kwargs):
+    record_truck_changes(changes)
+
+
+
+@receiver(post_save, sender=Truck)
+def count_new_truck(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(total_trucks=1)
+
+
+
+@receiver(post_delete, sender=Truck)
+def count_deleted_truck(sender, instance, **kwargs):
+    counters.adjust(total_trucks=-1)
+
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    counters.adjust(total_customers=-int(instance.role == "user"))
+
+
+
+@receiver(post_delete, sender=Booking)
+def count_deleted_booking(sender, instance, **kwargs):
+    counters.adjust(total_pending_booking=-int(instance.status == "pending"))
@@ -0,0 +1,95 @@
+import logging
+from celery import shared_task
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from booking.models import Booking
+from notifications.utils import send_realtime_notification
+from .models import ReportJob
+from .rollups import reconcile_rollups, rebuild_rollups_range
+from .reports import REPORT_MAX_MONTHS, data_version, build_report, report_filename
+from .aggregates import month_range
+from . import counters, heatmap
+
+
+
+logger = logging.getLogger(__name__)
+
+
+
+@shared_task
+def reconcile_recent_rollups():
+    # Recent days plus the creation days of bookings touched since yesterday,
+    # which catches price edits and anything the signal handlers missed
+    today = timezone.localdate()
+    dates = {today, today - timedelta(days=1)}
+
+    since = timezone.now() - timedelta(days=1)
+    created = Booking.objects.filter(updated_at__gte=since).values_list("created_at", flat=True).iterator()
+    dates.update(timezone.localdate(created_at) for created_at in created)
+
+    reconcile_rollups(dates)
+    return f"{len(dates)} days reconciled"
+
+
+
+@shared_task
+def rebuild_rollups(start, end):
+    # Rebuilds a date range, end inclusive. The full backfill is the backfill_rollups command
+    start = date.fromisoformat(start)
+    end = date.fromisoformat(end)
+
+    rebuild_rollups_range(start, end)
+    return f"Rollups rebuilt from {start} to {end}"
+
+
+
+@shared_task
+def recount_dashboard_counters():
+    return counters.recount()
+
+
+
+@shared_task
+def generate_report(job_id):
+    # Claimed with a conditional update so a redelivered task does not run twice
+    if not ReportJob.objects.filter(id=job_id, status="pending").update(status="running", updated_at=timezone.now()):
+        return f"Report job {job_id} is not pending"
+    job = ReportJob.objects.get(id=job_id)
+
+    months = month_range(tuple(job.params["start_month"]), tuple(job.params["end_month"]), limit=REPORT_MAX_MONTHS)
+    try:
+        job.data_version = data_version(job.report_type, months)
+        content, job.row_count = build_report(job.report_type, job.export_format, months)
+        job.file.save(report_filename(job), content, save=False)
+        job.status = "ready"
+    except Exception as exc:
+        logger.exception("Report job %s failed", job.id)
+        job.status = "failed"
+        job.error = str(exc)
+
+    job.completed_at = timezone.now()
+    job.save()
+
+    if job.requested_by_id:
+        send_realtime_notification(
+            job.requested_by_id,
+            "Report ready" if job.status == "ready" else "Report failed",
+            f"Your {job.get_report_type_display().lower()} report is {'ready' if job.status == 'ready' else 'failed'}.",
+            data={
+                "report_id": job.id,
+                "status": job.status,
+                "file": reverse("admin-report-download", args=[job.id]) if job.file else None,
+            },
+            event_type=f"report_{job.status}",
+        )
+
+    return f"Report job {job.id} {job.status}"
+
+
+
+@shared_task
+def rebuild_geo_buckets():
+    # Repairs the heatmap buckets from every active and archived booking, the first backfill is
+    # the backfill_geo_buckets command
+    return f"{heatmap.rebuild_geo_buckets()} geo buckets rebuilt"
@@ -1,3 +1,349 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from booking.tests import archive, create_booking
+from booking.transitions import apply_transition
+from truck.models import Truck
+from Trueliftmovers.tests import use_fake_redis
+from . import counters, heatmap, rollups
+from .models import DailyRollup, DailyBookingStatusRollup, DailyTruckRollup, GeoBucket, ReportJob
+from .reports import params_hash
+from .tasks import generate_report
 
 # Create your tests here.
+
+
+
+class YearlyDashboardQueryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+        for day, new_users, truck_revenue, mover_revenue in [
+            (date(2024, 1, 3), 2, Decimal("100.00"), Decimal("50.00")),
+            (date(2024, 1, 20), 1, Decimal("40.00"), Decimal("10.00")),
+            (date(2024, 3, 9), 4, Decimal("300.00"), Decimal("0.00")),
+        ]:
+            DailyRollup.objects.create(date=day, new_users=new_users, truck_revenue=truck_revenue, mover_revenue=mover_revenue)
+
+    def test_yearly_dashboard_runs_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("admin-yearly-dashboard"), {"year": 2024})
+
+        self.assertEqual(response.status_code, 200)
+        months = {row["month"]: row for row in response.json()["data"]}
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months["Jan"]["total_users"], 3)
+        self.assertEqual(Decimal(str(months["Jan"]["total_revenue"])), Decimal("200.00"))
+        self.assertEqual(months["Mar"]["total_users"], 4)
+        self.assertEqual(months["Feb"]["total_users"], 0)
+
+    def test_yearly_revenue_dashboard_runs_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("admin-yearly-dashboard-revenue"), {"year": 2024})
+
+        self.assertEqual(response.status_code, 200)
+        months = {row["month"]: row for row in response.json()["data"]}
+        self.assertEqual(Decimal(str(months["Jan"]["total_revenue"])), Decimal("200.00"))
+        self.assertEqual(Decimal(str(months["Mar"]["yearly_percentage"])), Decimal("60.00"))
+
+    def test_rejects_an_invalid_year(self):
+        for name in ["admin-yearly-dashboard", "admin-yearly-dashboard-revenue"]:
+            response = self.client.get(reverse(name), {"year": "abc"})
+            self.assertEqual(response.status_code, 400, name)
+
+
+
+
+class MonthlyTruckBookingValidationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_rejects_invalid_month_and_year(self):
+        for params in [{"month": 13}, {"month": 0}, {"month": "abc"}, {"year": "20x4"}, {"year": 99999}, {"start_month": "9999-12"}]:
+            response = self.client.get(reverse("admin-monthly-truck-booking"), params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_accepts_a_valid_month(self):
+        response = self.client.get(reverse("admin-monthly-truck-booking"), {"month": 12, "year": 2024})
+        self.assertEqual(response.status_code, 200)
+
+
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReportJobTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.request = {"report_type": "revenue", "export_format": "json", "start_month": "2024-01", "end_month": "2024-03"}
+        self.digest = params_hash("revenue", "json", {"start_month": [2024, 1], "end_month": [2024, 3]})
+
+    def create_job(self, status, age_seconds):
+        job = ReportJob.objects.create(
+            report_type="revenue",
+            params={"start_month": [2024, 1], "end_month": [2024, 3]},
+            params_hash=self.digest,
+            status=status,
+        )
+        ReportJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(seconds=age_seconds))
+        return job
+
+    @mock.patch("adminapi.views.defer_apply")
+    def test_recent_pending_job_is_reused(self, defer_apply):
+        job = self.create_job("pending", 60)
+
+        response = self.client.post(reverse("admin-report-create"), self.request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["id"], job.id)
+        defer_apply.assert_not_called()
+
+    @mock.patch("adminapi.views.defer_apply")
+    def test_stale_jobs_are_failed_and_regenerated(self, defer_apply):
+        for status in ["pending", "running"]:
+            job = self.create_job(status, settings.REPORT_JOB_TIMEOUT_SECONDS + 60)
+
+            response = self.client.post(reverse("admin-report-create"), self.request)
+
+            self.assertEqual(response.status_code, 202)
+            self.assertNotEqual(response.json()["data"]["id"], job.id)
+            job.refresh_from_db()
+            self.assertEqual(job.status, "failed")
+            ReportJob.objects.exclude(id=job.id).delete()
+
+    @mock.patch("adminapi.views.defer_apply")
+    def test_job_is_failed_when_it_cannot_be_queued(self, defer_apply):
+        response = self.client.post(reverse("admin-report-create"), self.request)
+        self.assertEqual(response.status_code, 202)
+
+        defer_apply.call_args.kwargs["on_failure"](ConnectionError("Broker unavailable"))
+
+        job = ReportJob.objects.get(id=response.json()["data"]["id"])
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Broker unavailable", job.error)
+
+    @mock.patch("adminapi.tasks.send_realtime_notification")
+    def test_snapshot_is_served_only_through_the_download_view(self, send_realtime_notification):
+        job = self.create_job("pending", 0)
+        generate_report(job.id)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, "ready")
+        self.assertNotIn(f"-{job.id}.", job.file.name)
+
+        detail = self.client.get(reverse("admin-report-detail", args=[job.id])).json()["data"]
+        self.assertTrue(detail["file"].endswith(reverse("admin-report-download", args=[job.id])))
+
+        response = self.client.get(reverse("admin-report-download", args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(b"".join(response.streaming_content))["report_type"], "revenue")
+
+        customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.client.get(reverse("admin-report-download", args=[job.id])).status_code, 403)
+
+
+
+
+class TruckUtilisationValidationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_rejects_invalid_parameters(self):
+        for params in [{"truck": "abc"}, {"truck": "1.5"}, {"truck": "-3"}, {"start_date": "2024-02-30"}, {"end_date": "yesterday"}]:
+            with mock.patch("adminapi.views.truck_utilisation") as truck_utilisation:
+                response = self.client.get(reverse("admin-truck-utilisation"), params)
+            self.assertEqual(response.status_code, 400, params)
+            truck_utilisation.assert_not_called()
+
+
+
+class RollupDeltaTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.trucks = [Truck.objects.create(truck_number_plate=f"TL-000{i}") for i in range(2)]
+        self.today = timezone.localdate()
+
+    def statuses(self):
+        return dict(DailyBookingStatusRollup.objects.filter(date=self.today).exclude(count=0).values_list("status", "count"))
+
+    def trucks_rollup(self):
+        return {
+            truck_id: (bookings, completed)
+            for truck_id, bookings, completed in DailyTruckRollup.objects.filter(date=self.today)
+            .exclude(bookings=0, completed_moves=0).values_list("truck_id", "bookings", "completed_moves")
+        }
+
+    def snapshot(self):
+        daily = DailyRollup.objects.filter(date=self.today).values_list("new_users", "truck_revenue", "mover_revenue").first()
+        return self.statuses(), self.trucks_rollup(), daily
+
+    def test_status_changes_move_the_count(self):
+        booking = create_booking(self.customer, truck=self.trucks[0])
+        self.assertEqual(self.statuses(), {"pending": 1})
+        self.assertEqual(self.trucks_rollup(), {self.trucks[0].id: (1, 0)})
+
+        apply_transition(booking.id, "approve")
+        apply_transition(booking.id, "truck_paid")
+        self.assertEqual(self.statuses(), {"accepted": 1})
+
+        apply_transition(booking.id, "reject")
+        self.assertEqual(self.statuses(), {"reject": 1})
+
+    def test_completed_booking_adds_revenue_and_a_completed_move(self):
+        booking = create_booking(self.customer, truck=self.trucks[0], status="end", final_price=Decimal("250.00"), movers_total=Decimal("40.00"))
+
+        apply_transition(booking.id, "mover_paid")
+
+        self.assertEqual(self.statuses(), {"complete": 1})
+        self.assertEqual(self.trucks_rollup(), {self.trucks[0].id: (1, 1)})
+        self.assertEqual(DailyRollup.objects.get(date=self.today).truck_revenue, Decimal("250.00"))
+        self.assertEqual(DailyRollup.objects.get(date=self.today).mover_revenue, Decimal("40.00"))
+
+    def test_reassigning_the_truck_moves_the_booking(self):
+        booking = create_booking(self.customer, truck=self.trucks[0])
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with mock.patch("booking.serializers.enqueue_notification"):
+            response = client.patch(reverse("admin-booking-update", args=[booking.id]), {"truck": self.trucks[1].id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.trucks_rollup(), {self.trucks[1].id: (1, 0)})
+        self.assertEqual(self.statuses(), {"approved": 1})
+
+    def test_increments_match_a_reconcile(self):
+        bookings = [create_booking(self.customer, truck=truck) for truck in self.trucks]
+        apply_transition(bookings[0].id, "approve")
+        apply_transition(bookings[1].id, "reject")
+        incremental = self.snapshot()
+
+        rollups.reconcile_rollups([self.today])
+
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_increments_are_written_on_the_write_database(self):
+        with mock.patch.object(rollups.router, "db_for_write", wraps=rollups.router.db_for_write) as db_for_write:
+            create_booking(self.customer, truck=self.trucks[0])
+
+        db_for_write.assert_any_call(DailyBookingStatusRollup)
+        db_for_write.assert_any_call(DailyTruckRollup)
+
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.truck = Truck.objects.create(truck_number_plate="TL-0001")
+        self.booking = create_booking(self.customer)
+
+    def stored(self):
+        return {name: self.redis.get(f"{counters.COUNTER_PREFIX}{name}") for name in counters.COUNTERS}
+
+    def test_recount_stores_the_database_counts(self):
+        expected = {"total_trucks": 1, "total_customers": 1, "total_pending_booking": 1}
+
+        self.assertEqual(counters.recount(), expected)
+        self.assertEqual(self.stored(), {name: str(value) for name, value in expected.items()})
+
+        # bulk_create skips the signals, so read serves the stored counts until the next recount
+        Truck.objects.bulk_create([Truck(truck_number_plate="TL-0002")])
+        self.assertEqual(counters.read()["total_trucks"], 1)
+        self.assertEqual(counters.recount()["total_trucks"], 2)
+
+    def test_read_recounts_when_a_key_is_missing(self):
+        counters.recount()
+        self.redis.delete(f"{counters.COUNTER_PREFIX}total_trucks")
+        Truck.objects.bulk_create([Truck(truck_number_plate="TL-0002")])
+
+        self.assertEqual(counters.read()["total_trucks"], 2)
+        self.assertEqual(self.stored()["total_trucks"], "2")
+
+    def test_adjust_increments_stored_counters_after_commit(self):
+        counters.recount()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            truck = Truck.objects.create(truck_number_plate="TL-0002")
+            User.objects.create_user(email="other@example.com", username="other", password="x")
+            create_booking(self.customer)
+        self.assertEqual(self.stored(), {"total_trucks": "2", "total_customers": "2", "total_pending_booking": "2"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_transition(self.booking.id, "approve")
+            truck.delete()
+        self.assertEqual(self.stored(), {"total_trucks": "1", "total_customers": "2", "total_pending_booking": "1"})
+
+    def test_adjust_leaves_missing_counters_missing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Truck.objects.create(truck_number_plate="TL-0002")
+
+        self.assertEqual(self.stored(), dict.fromkeys(counters.COUNTERS))
+
+    def test_rolled_back_writes_do_not_adjust(self):
+        counters.recount()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Truck.objects.create(truck_number_plate="TL-0002")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.stored()["total_trucks"], "1")
+
+
+
+class GeoBucketRebuildTests(TestCase):
+    def setUp(self):
+        customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        bookings = [
+            create_booking(customer, pickup_lat=51.5007, pickup_lng=-0.1246, drop_lat=51.5081, drop_lng=-0.0759),
+            create_booking(customer, pickup_lat=51.5014, pickup_lng=-0.1419, drop_lat=48.8584, drop_lng=2.2945),
+            create_booking(customer, pickup_lat=40.6892, pickup_lng=-74.0445, drop_lat=40.7484, drop_lng=-73.9857),
+        ]
+        archive(bookings[0])
+
+    def buckets(self):
+        return set(GeoBucket.objects.values_list("kind", "precision", "geohash", "count"))
+
+    def test_rebuild_recounts_active_and_archived_bookings(self):
+        recorded = self.buckets()
+        GeoBucket.objects.update(count=0)
+        GeoBucket.objects.create(kind="drop", precision=3, geohash="zzz", center_lat=0, center_lng=0, count=5)
+
+        total = heatmap.rebuild_geo_buckets(chunk_size=1)
+
+        self.assertEqual(self.buckets(), recorded)
+        self.assertEqual(total, len(recorded))
+        london = heatmap.encode(51.5007, -0.1246, 3)
+        self.assertEqual(GeoBucket.objects.get(kind="pickup", precision=3, geohash=london).count, 2)
+        self.assertEqual(sum(GeoBucket.objects.filter(kind="drop", precision=7).values_list("count", flat=True)), 3)
+
+    def test_buckets_complete(self):
+        self.assertTrue(heatmap.buckets_complete())
+
+        GeoBucket.objects.all().delete()
+        self.assertFalse(heatmap.buckets_complete())
+
+        heatmap.rebuild_geo_buckets()
+        self.assertTrue(heatmap.buckets_complete())
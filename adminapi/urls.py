@@ -2,11 +2,11 @@ from django.urls import include, path
 from TermdAndPrivacy.views import TermsAPIView,PrivacyAPIView
 from truck.views import TruckListCreateView, TruckDetailAPIView,PriceManagementListCreateAPIView,PriceManagementDetailAPIView,MoversManagementListCreateAPIView,MoversManagementDetailAPIView
 
-from notifications.views import NotificationListAPIView
+from notifications.views import NotificationListAPIView,NotificationUnreadCountAPIView,NotificationReadAllAPIView
 
-from booking.views import BookingAdminUpdateView,BookingAgreementDetailView,BookingStartEndView
+from booking.views import BookingAdminUpdateView,BookingAgreementDetailView,BookingStartEndView,BookingExportView,BookingBulkActionView
 
-from .views import DeshboardSummaryAPIview,MonthlyTruckBookingAPIView,YearlyDashboardAPIView,YearlyDashboardRevenueAPIView,UserRetrieveUpdateDeleteAPIView, UserListAPIView
+from .views import DeshboardSummaryAPIview,MonthlyTruckBookingAPIView,YearlyDashboardAPIView,YearlyDashboardRevenueAPIView,UserRetrieveUpdateDeleteAPIView, UserListAPIView,MetricsAPIView,ReportJobCreateAPIView,ReportJobDetailAPIView,ReportJobDownloadAPIView,TruckUtilisationAPIView,GeoHeatmapAPIView
 
 from support.views import SupportListAPIView, SupportUpdateAPIView
 
@@ -27,10 +27,14 @@ urlpatterns = [
 
 
    path('notifications/', NotificationListAPIView.as_view(), name='notifications-list'),
+   path('notifications/unread-count/',NotificationUnreadCountAPIView.as_view(),name='notification-unread-count'),
+   path('notifications/read-all/',NotificationReadAllAPIView.as_view(),name='notification-read-all'),
 
 
    path("booking/update/<int:booking_id>/",BookingAdminUpdateView.as_view(),name="admin-booking-update"),
    path('bookings/start-end/<int:booking_id>/', BookingStartEndView.as_view(), name='booking-start-end'),
+   path('bookings/export/', BookingExportView.as_view(), name='booking-export'),
+   path('bookings/bulk-action/', BookingBulkActionView.as_view(), name='booking-bulk-action'),
 
 
    path('agreements/<int:booking_id>/',BookingAgreementDetailView.as_view(),name='booking-agreement-detail'),
@@ -40,6 +44,12 @@ urlpatterns = [
    path("admin/monthly-truck-booking/",MonthlyTruckBookingAPIView.as_view(),name="admin-monthly-truck-booking"),
    path("admin/yearly-dashboard/",YearlyDashboardAPIView.as_view(),name="admin-yearly-dashboard"),
    path("admin/yearly-dashboard-revenue/",YearlyDashboardRevenueAPIView.as_view(),name="admin-yearly-dashboard-revenue"),
+   path("admin/metrics/",MetricsAPIView.as_view(),name="admin-metrics"),
+   path("admin/truck-utilisation/",TruckUtilisationAPIView.as_view(),name="admin-truck-utilisation"),
+   path("admin/geo-heatmap/",GeoHeatmapAPIView.as_view(),name="admin-geo-heatmap"),
+   path("admin/reports/",ReportJobCreateAPIView.as_view(),name="admin-report-create"),
+   path("admin/reports/<int:report_id>/",ReportJobDetailAPIView.as_view(),name="admin-report-detail"),
+   path("admin/reports/<int:report_id>/download/",ReportJobDownloadAPIView.as_view(),name="admin-report-download"),
 
 
 
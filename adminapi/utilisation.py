@@ -0,0 +1,165 @@
+import logging
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+from booking.models import Booking, ArchivedBooking
+from Trueliftmovers.db_router import read_db_alias
+
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "utilisation:day:"
+
+# Per truck and day: bookings are clipped to the day, and the running MAX of the
+# previous end times merges overlapping bookings so busy time is never counted twice.
+# A booking is counted on the day it started.
+DAY_UTILISATION_SQL = """
+WITH days AS (
+    SELECT day_start, day_end FROM unnest(%(day_starts)s::timestamptz[], %(day_ends)s::timestamptz[]) AS d(day_start, day_end)
+),
+windows AS (
+    SELECT truck_id, start_time, COALESCE(end_time, %(now)s) AS end_time
+    FROM {booking_table}
+    WHERE truck_id IS NOT NULL AND start_time IS NOT NULL AND start_time < %(range_end)s
+      AND COALESCE(end_time, %(now)s) > %(range_start)s
+    UNION ALL
+    SELECT truck_id, start_time, COALESCE(end_time, %(now)s) AS end_time
+    FROM {archive_table}
+    WHERE truck_id IS NOT NULL AND start_time IS NOT NULL AND start_time < %(range_end)s
+      AND COALESCE(end_time, %(now)s) > %(range_start)s
+),
+clipped AS (
+    SELECT w.truck_id, d.day_start, w.start_time,
+           GREATEST(w.start_time, d.day_start) AS busy_start,
+           LEAST(w.end_time, d.day_end) AS busy_end
+    FROM windows w
+    JOIN days d ON w.start_time < d.day_end AND w.end_time > d.day_start
+),
+ordered AS (
+    SELECT truck_id, day_start, start_time, busy_start, busy_end,
+           MAX(busy_end) OVER (
+               PARTITION BY truck_id, day_start ORDER BY busy_start, busy_end
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) AS previous_end
+    FROM clipped
+)
+SELECT truck_id, day_start,
+       COUNT(*) FILTER (WHERE start_time >= day_start) AS bookings,
+       SUM(GREATEST(EXTRACT(EPOCH FROM busy_end - GREATEST(busy_start, COALESCE(previous_end, busy_start))), 0)) AS busy_seconds,
+       COUNT(*) FILTER (WHERE busy_start > previous_end) AS gaps,
+       COALESCE(MAX(EXTRACT(EPOCH FROM busy_start - previous_end)) FILTER (WHERE busy_start > previous_end), 0) AS longest_gap_seconds,
+       MIN(busy_start) AS first_start,
+       MAX(busy_end) AS last_end
+FROM ordered
+GROUP BY truck_id, day_start
+"""
+
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+
+def compute_days(days, now):
+    # {day: {truck_id: stats}} for the given days, one query for all of them
+    if not days:
+        return {}
+
+    bounds = [day_bounds(day) for day in days]
+    params = {
+        "day_starts": [start for start, _ in bounds],
+        "day_ends": [min(end, now) for _, end in bounds],
+        "range_start": bounds[0][0],
+        "range_end": max(min(end, now) for _, end in bounds),
+        "now": now,
+    }
+    sql = DAY_UTILISATION_SQL.format(
+        booking_table=Booking._meta.db_table,
+        archive_table=ArchivedBooking._meta.db_table,
+    )
+
+    results = {day: {} for day in days}
+    day_by_start = {start: day for day, (start, _) in zip(days, bounds)}
+    with connections[read_db_alias()].cursor() as cursor:
+        cursor.execute(sql, params)
+        for truck_id, day_start, bookings, busy_seconds, gaps, longest_gap, first_start, last_end in cursor.fetchall():
+            results[day_by_start[day_start]][truck_id] = {
+                "bookings": bookings,
+                "busy_seconds": float(busy_seconds),
+                "gaps": gaps,
+                "longest_gap_seconds": float(longest_gap),
+                "first_start": first_start,
+                "last_end": last_end,
+            }
+    return results
+
+
+
+def _cached_days(days):
+    try:
+        cached = cache.get_many([f"{CACHE_PREFIX}{day.isoformat()}" for day in days])
+    except Exception:
+        logger.warning("Could not read utilisation cache")
+        return {}
+    return {day: cached[f"{CACHE_PREFIX}{day.isoformat()}"] for day in days if f"{CACHE_PREFIX}{day.isoformat()}" in cached}
+
+
+
+def _cache_days(results):
+    try:
+        cache.set_many(
+            {f"{CACHE_PREFIX}{day.isoformat()}": stats for day, stats in results.items()},
+            settings.UTILISATION_CACHE_TIMEOUT,
+        )
+    except Exception:
+        logger.warning("Could not store utilisation cache")
+
+
+
+def daily_utilisation(days, now):
+    # Closed days come from the cache, only missing days and today are queried
+    today = timezone.localdate(now)
+    closed = [day for day in days if day < today]
+    results = _cached_days(closed)
+
+    missing = [day for day in days if day not in results]
+    computed = compute_days(missing, now)
+    _cache_days({day: stats for day, stats in computed.items() if day < today})
+
+    results.update(computed)
+    return results
+
+
+
+def truck_utilisation(start_day, end_day, now):
+    days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+    per_day = daily_utilisation(days, now)
+
+    total_seconds = sum(
+        (min(end, now) - start).total_seconds() for start, end in (day_bounds(day) for day in days)
+    )
+
+    trucks = {}
+    for day in days:
+        for truck_id, stats in per_day[day].items():
+            truck = trucks.setdefault(truck_id, {
+                "bookings": 0, "busy_seconds": 0.0, "gaps": 0, "longest_gap_seconds": 0.0, "last_end": None,
+            })
+            # Idle time between the last booking of an earlier day and the first of this one
+            if truck["last_end"] and stats["first_start"] > truck["last_end"]:
+                gap = (stats["first_start"] - truck["last_end"]).total_seconds()
+                truck["gaps"] += 1
+                truck["longest_gap_seconds"] = max(truck["longest_gap_seconds"], gap)
+
+            truck["bookings"] += stats["bookings"]
+            truck["busy_seconds"] += stats["busy_seconds"]
+            truck["gaps"] += stats["gaps"]
+            truck["longest_gap_seconds"] = max(truck["longest_gap_seconds"], stats["longest_gap_seconds"])
+            truck["last_end"] = max(truck["last_end"], stats["last_end"]) if truck["last_end"] else stats["last_end"]
+
+    return trucks, total_seconds
@@ -2,16 +2,42 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from .serializers import DashbordSerializer,MonthlyTruckBookingSerializer,YearlyDashboardSerializer,YearlyDashboardRevenueSerializer,UserSerializer
+from .serializers import DashbordSerializer,MonthlyTruckBookingSerializer,YearlyDashboardSerializer,YearlyDashboardRevenueSerializer,UserSerializer,attach_recent_bookings,ReportJobCreateSerializer,ReportJobSerializer,TruckUtilisationSerializer,GeoHeatmapQuerySerializer,GeoBucketSerializer
+from .heatmap import zoom_precision
+from django.db.models import Q
+from .utilisation import truck_utilisation
+from .models import ReportJob, GeoBucket
+from .reports import params_hash, data_version, fail_stale_jobs, fail_undispatched_job
+from .tasks import generate_report
 from accounts.response import success_response
+from Trueliftmovers.db_router import replica_reads
+from Trueliftmovers.dispatch import defer_apply
 from drf_yasg.utils import swagger_auto_schema
 from truck.models import Truck
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser,FormParser
 from django.utils import timezone
 import calendar
+from functools import partial
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404
 from accounts.models import User
+from accounts.permissions import IsAdminRole
+from Trueliftmovers import metrics
+from . import counters
+from .aggregates import monthly_revenue, monthly_new_users, monthly_truck_bookings, parse_int, parse_day, parse_month, month_range, MAX_REPORT_MONTHS, MIN_YEAR, MAX_YEAR
+from decimal import Decimal
+from datetime import datetime, timedelta
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from Trueliftmovers.search import ranked_search
+
+
+
+MAX_UTILISATION_DAYS = 366
+
+MAX_HEATMAP_BUCKETS = 2000
+
 # Create your views here.
 
 class DeshboardSummaryAPIview(APIView):
@@ -22,8 +48,9 @@ class DeshboardSummaryAPIview(APIView):
         responses={200: DashbordSerializer},
         tags=["Dashboard"]
     )
+    @replica_reads
     def get(self, request):
-        serializer = DashbordSerializer(instance={})
+        serializer = DashbordSerializer(counters.read())
         return success_response(
             message="Dashboard summary fetched successfully",
             data=serializer.data,
@@ -37,7 +64,10 @@ class MonthlyTruckBookingAPIView(APIView):
 
     @swagger_auto_schema(
         operation_summary="Admin Monthly Truck Booking Report",
-        operation_description="Admin-only endpoint to get total bookings per truck for a specific month and year.",
+        operation_description=(
+            "Admin-only endpoint to get total bookings per truck for a specific month and year, "
+            "or a truck x month matrix when start_month/end_month are given."
+        ),
         manual_parameters=[
             openapi.Parameter(
                 "month",
@@ -53,32 +83,63 @@ class MonthlyTruckBookingAPIView(APIView):
                 type=openapi.TYPE_INTEGER,
                 required=False
             ),
+            openapi.Parameter(
+                "start_month",
+                openapi.IN_QUERY,
+                description="First month of a range (YYYY-MM), overrides month/year",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                "end_month",
+                openapi.IN_QUERY,
+                description="Last month of a range (YYYY-MM), defaults to start_month",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
         ],
         responses={200: MonthlyTruckBookingSerializer(many=True)},tags=["Dashboard"]
 
     )
+    @replica_reads
     def get(self, request):
         now = timezone.now()
 
-        month = request.query_params.get("month", now.month)
-        year = request.query_params.get("year", now.year)
+        month = parse_int(request.query_params.get("month", now.month), "month", 1, 12)
+        year = parse_int(request.query_params.get("year", now.year), "year", MIN_YEAR, MAX_YEAR)
 
-        trucks = Truck.objects.all()
+        start_month = parse_month(request.query_params.get("start_month"), "start_month") or (year, month)
+        end_month = parse_month(request.query_params.get("end_month"), "end_month") or start_month
 
-        serializer = MonthlyTruckBookingSerializer(
-            trucks,
-            many=True,
-            context={
-                "month": int(month),
-                "year": int(year),
-            }
-        )
+        months = month_range(start_month, end_month)
+        if not months:
+            raise ValidationError({"end_month": "End month must not be before start month."})
+        if len(months) > MAX_REPORT_MONTHS:
+            raise ValidationError({"end_month": f"A report can cover at most {MAX_REPORT_MONTHS} months."})
+
+        start = timezone.make_aware(datetime(*months[0], 1))
+        next_year, next_month = months[-1][0] + months[-1][1] // 12, months[-1][1] % 12 + 1
+        end = timezone.make_aware(datetime(next_year, next_month, 1))
+
+        counts = monthly_truck_bookings(start, end)
+
+        rows = []
+        for truck_id, truck_number_plate in Truck.objects.order_by("id").values_list("id", "truck_number_plate"):
+            monthly_bookings = [counts.get((truck_id, key), 0) for key in months]
+            rows.append({
+                "truck_number_plate": truck_number_plate,
+                "total_bookings": sum(monthly_bookings),
+                "monthly_bookings": monthly_bookings,
+            })
+
+        serializer = MonthlyTruckBookingSerializer(rows, many=True)
 
         return success_response(
             message="Monthly truck booking report fetched successfully",
             data={
                 "data":serializer.data,
-                "month":int(month)
+                "month":months[0][1],
+                "months":[f"{y}-{m:02d}" for y, m in months],
             },
             status_code=status.HTTP_200_OK
         )
@@ -103,14 +164,21 @@ class YearlyDashboardAPIView(APIView):
         responses={200: YearlyDashboardSerializer(many=True)},
         tags=["Dashboard"]
     )
+    @replica_reads
     def get(self, request):
 
         now = timezone.now()
-        year = int(request.query_params.get("year", now.year))
+        year = parse_int(request.query_params.get("year", now.year), "year", MIN_YEAR, MAX_YEAR)
 
-        months = [{"month": calendar.month_abbr[i], "month_number": i} for i in range(1, 13)]
+        users = monthly_new_users(year)
+        revenue = monthly_revenue(year)
 
-        serializer = YearlyDashboardSerializer(months, many=True, context={"year": year})
+        months = [
+            {"month": calendar.month_abbr[i], "total_users": users[i], "total_revenue": revenue[i]}
+            for i in range(1, 13)
+        ]
+
+        serializer = YearlyDashboardSerializer(months, many=True)
 
         return success_response(
             message="Yearly dashboard report fetched successfully",
@@ -139,14 +207,27 @@ class YearlyDashboardRevenueAPIView(APIView):
         responses={200: YearlyDashboardRevenueSerializer(many=True)},
         tags=["Dashboard"]
     )
+    @replica_reads
     def get(self, request):
         now = timezone.now()
-        year = int(request.query_params.get("year", now.year))
+        year = parse_int(request.query_params.get("year", now.year), "year", MIN_YEAR, MAX_YEAR)
+
+        revenue = monthly_revenue(year)
+        yearly_total_revenue = sum(revenue.values())
 
-        # Prepare months for serializer
-        months = [{"month": calendar.month_abbr[i], "month_number": i} for i in range(1, 13)]
+        months = []
+        for i in range(1, 13):
+            if yearly_total_revenue > 0:
+                percentage = (revenue[i] / yearly_total_revenue) * Decimal("100")
+            else:
+                percentage = Decimal("0.00")
+            months.append({
+                "month": calendar.month_abbr[i],
+                "total_revenue": revenue[i],
+                "yearly_percentage": round(percentage, 2),
+            })
 
-        serializer = YearlyDashboardRevenueSerializer(months, many=True, context={"year": year})
+        serializer = YearlyDashboardRevenueSerializer(months, many=True)
 
         return success_response(
             message="Yearly dashboard revenue report fetched successfully",
@@ -156,21 +237,73 @@ class YearlyDashboardRevenueAPIView(APIView):
 
 
 
+USER_SEARCH_FIELDS = ['email', 'profile__full_name', 'profile__phone']
+
+
+
+class UserListPagination(CursorPagination):
+    ordering = ("-date_joined", "-id")
+    page_size = 20
+
+
+
 class UserListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
         operation_summary="List all users",
-        operation_description="Admin-only: Get a list of all users with their most recent booking",
+        operation_description=(
+            "Admin-only: Get a cursor-paginated list of users with their most recent booking. "
+            "With `search`, users are matched on email, full name and phone, best matches first, "
+            "and paginated by `page` instead."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Pagination cursor taken from the next/previous link",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                "search",
+                openapi.IN_QUERY,
+                description="Search by email, full name or phone",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                "page",
+                openapi.IN_QUERY,
+                description="Page number, used with search",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+        ],
         responses={200: UserSerializer(many=True)},
         tags=["Users Management"]
     )
+    @replica_reads
     def get(self, request):
-        users = User.objects.filter(role='user').order_by('-date_joined')
-        serializer = UserSerializer(users, many=True)
+        users = User.objects.filter(role='user').select_related('profile')
+
+        # Ranked results have no stable keyset, so searches are paginated by page number
+        search_query = request.query_params.get("search")
+        if search_query:
+            users = ranked_search(users, USER_SEARCH_FIELDS, search_query, '-date_joined', '-id')
+            paginator = PageNumberPagination()
+            paginator.page_size = UserListPagination.page_size
+        else:
+            paginator = UserListPagination()
+        page = attach_recent_bookings(paginator.paginate_queryset(users, request))
+        serializer = UserSerializer(page, many=True)
         return success_response(
             message="Users fetched successfully",
-            data=serializer.data
+            data={
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data
+            }
         )
     
 
@@ -185,7 +318,7 @@ class UserRetrieveUpdateDeleteAPIView(APIView):
         tags=["Users Management"]
     )
     def get(self, request, user_id):
-        user = get_object_or_404(User, id=user_id,role='user')
+        user = get_object_or_404(User.objects.select_related('profile'), id=user_id,role='user')
         serializer = UserSerializer(user)
         return success_response(
             message="User fetched successfully",
@@ -221,5 +354,235 @@ class UserRetrieveUpdateDeleteAPIView(APIView):
         return success_response(
             message="User deleted successfully"
         )
-    
 
+
+
+class MetricsAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Operational metrics",
+        operation_description="Admin-only: counters and latencies recorded by the API and workers (e.g. booking transitions).",
+        responses={200: "Metrics fetched successfully"},
+        tags=["Dashboard"]
+    )
+    def get(self, request):
+        return success_response(
+            message="Metrics fetched successfully",
+            data=metrics.snapshot(),
+            status_code=status.HTTP_200_OK
+        )
+
+
+
+
+class ReportJobCreateAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Request a report",
+        operation_description=(
+            "Admin-only: enqueue a report built from the daily rollups. Identical parameters reuse the last "
+            "snapshot while the underlying rollups are unchanged. A `report_ready` (or `report_failed`) event "
+            "is pushed over the notification websocket when the job finishes."
+        ),
+        request_body=ReportJobCreateSerializer,
+        responses={202: ReportJobSerializer, 200: ReportJobSerializer},
+        tags=["Reports"]
+    )
+    def post(self, request):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        report_type = serializer.validated_data["report_type"]
+        export_format = serializer.validated_data["export_format"]
+        params = serializer.validated_data["params"]
+        digest = params_hash(report_type, export_format, params)
+
+        jobs = ReportJob.objects.filter(params_hash=digest).order_by("-created_at")
+        fail_stale_jobs(jobs)
+        job = jobs.filter(status__in=["pending", "running"]).first()
+        if job is None:
+            job = jobs.filter(
+                status="ready",
+                data_version=data_version(report_type, serializer.validated_data["months"]),
+            ).first()
+        if job:
+            return success_response(
+                message="Report snapshot reused",
+                data=ReportJobSerializer(job, context={"request": request}).data,
+                status_code=status.HTTP_200_OK
+            )
+
+        job = ReportJob.objects.create(
+            requested_by=request.user,
+            report_type=report_type,
+            export_format=export_format,
+            params=params,
+            params_hash=digest,
+        )
+        defer_apply(generate_report, (job.id,), on_failure=partial(fail_undispatched_job, job.id))
+
+        return success_response(
+            message="Report queued",
+            data=ReportJobSerializer(job, context={"request": request}).data,
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+
+
+
+class ReportJobDetailAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Report status",
+        operation_description="Admin-only: status of a report job and the snapshot file once it is ready.",
+        responses={200: ReportJobSerializer},
+        tags=["Reports"]
+    )
+    def get(self, request, report_id):
+        fail_stale_jobs(ReportJob.objects.filter(id=report_id))
+        job = get_object_or_404(ReportJob, id=report_id)
+        return success_response(
+            message="Report fetched successfully",
+            data=ReportJobSerializer(job, context={"request": request}).data,
+            status_code=status.HTTP_200_OK
+        )
+
+
+
+
+class ReportJobDownloadAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Download report",
+        operation_description="Admin-only: download the snapshot file of a ready report job.",
+        responses={200: "Report file", 404: "Report or file not found"},
+        tags=["Reports"]
+    )
+    def get(self, request, report_id):
+        job = get_object_or_404(ReportJob, id=report_id, status="ready")
+        if not job.file:
+            raise Http404("Report file not found")
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=f"{job.report_type}-{job.id}.{job.export_format}",
+        )
+
+
+
+
+class TruckUtilisationAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Truck utilisation",
+        operation_description=(
+            "Admin-only: busy hours, idle gaps and utilisation per truck between start_date and end_date "
+            "(inclusive, at most 366 days), computed from booking start/end times. Closed days are cached, "
+            "only the current day is recomputed."
+        ),
+        manual_parameters=[
+            openapi.Parameter("start_date", openapi.IN_QUERY, description="First day (YYYY-MM-DD), defaults to 30 days ago", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter("end_date", openapi.IN_QUERY, description="Last day (YYYY-MM-DD), defaults to today", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter("truck", openapi.IN_QUERY, description="Only this truck id", type=openapi.TYPE_INTEGER, required=False),
+        ],
+        responses={200: TruckUtilisationSerializer(many=True)},
+        tags=["Dashboard"]
+    )
+    @replica_reads
+    def get(self, request):
+        now = timezone.now()
+        today = timezone.localdate(now)
+
+        end_date = parse_day(request.query_params.get("end_date"), "end_date") or today
+        start_date = parse_day(request.query_params.get("start_date"), "start_date") or end_date - timedelta(days=29)
+        end_date = min(end_date, today)
+        if start_date > end_date:
+            raise ValidationError({"start_date": "Start date must be on or before end date (and not in the future)."})
+        if (end_date - start_date).days >= MAX_UTILISATION_DAYS:
+            raise ValidationError({"end_date": f"A utilisation report can cover at most {MAX_UTILISATION_DAYS} days."})
+
+        trucks = Truck.objects.order_by("id")
+        truck_id = request.query_params.get("truck")
+        if truck_id:
+            trucks = trucks.filter(id=parse_int(truck_id, "truck", 1))
+
+        stats, total_seconds = truck_utilisation(start_date, end_date, now)
+
+        rows = []
+        for truck_id, truck_number_plate in trucks.values_list("id", "truck_number_plate"):
+            truck = stats.get(truck_id, {"bookings": 0, "busy_seconds": 0, "gaps": 0, "longest_gap_seconds": 0})
+            rows.append({
+                "truck_id": truck_id,
+                "truck_number_plate": truck_number_plate,
+                "bookings": truck["bookings"],
+                "busy_hours": round(truck["busy_seconds"] / 3600, 2),
+                "idle_hours": round((total_seconds - truck["busy_seconds"]) / 3600, 2),
+                "utilisation_percent": round(truck["busy_seconds"] / total_seconds * 100, 2) if total_seconds else 0,
+                "gaps": truck["gaps"],
+                "longest_gap_hours": round(truck["longest_gap_seconds"] / 3600, 2),
+            })
+
+        serializer = TruckUtilisationSerializer(rows, many=True)
+        return success_response(
+            message="Truck utilisation fetched successfully",
+            data={
+                "start_date": start_date,
+                "end_date": end_date,
+                "total_hours": round(total_seconds / 3600, 2),
+                "results": serializer.data,
+            },
+            status_code=status.HTTP_200_OK
+        )
+
+
+
+
+class GeoHeatmapAPIView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Booking location heatmap",
+        operation_description=(
+            "Admin-only: pickup or drop-off booking counts per geohash bucket inside a bounding box. "
+            "The zoom level picks the bucket precision. When min_lng > max_lng the box crosses the antimeridian."
+        ),
+        query_serializer=GeoHeatmapQuerySerializer,
+        responses={200: GeoBucketSerializer(many=True)},
+        tags=["Dashboard"]
+    )
+    @replica_reads
+    def get(self, request):
+        query = GeoHeatmapQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        precision = zoom_precision(params["zoom"])
+
+        if params["min_lng"] <= params["max_lng"]:
+            lng_filter = Q(center_lng__gte=params["min_lng"], center_lng__lte=params["max_lng"])
+        else:
+            lng_filter = Q(center_lng__gte=params["min_lng"]) | Q(center_lng__lte=params["max_lng"])
+
+        buckets = (
+            GeoBucket.objects.filter(
+                lng_filter,
+                kind=params["kind"],
+                precision=precision,
+                center_lat__gte=params["min_lat"],
+                center_lat__lte=params["max_lat"],
+            )
+            .order_by("-count")[:MAX_HEATMAP_BUCKETS]
+        )
+
+        return success_response(
+            message="Heatmap fetched successfully",
+            data={
+                "kind": params["kind"],
+                "precision": precision,
+                "buckets": GeoBucketSerializer(buckets, many=True).data,
+            },
+            status_code=status.HTTP_200_OK
+        )
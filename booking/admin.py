@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking,BookingAgreement
+from .models import Booking,BookingAgreement,ArchivedBooking
 
 # Register your models here.
 
@@ -46,4 +46,13 @@ class BookingAdmin(admin.ModelAdmin):
 @admin.register(BookingAgreement)
 class BookingAgreementAdmin(admin.ModelAdmin):
     list_display = ('id', 'booking', 'created_at', 'updated_at')
-    search_fields = ('booking__id',)
\ No newline at end of file
+    search_fields = ('booking__id',)
+
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(admin.ModelAdmin):
+    list_display = ('id','user','truck','pickup_address','drop_off_address','final_price','movers_total','status','created_at','archived_at',)
+    list_filter = ('status','archived_at',)
+    search_fields = ('id','user__email','pickup_address','drop_off_address',)
+    ordering = ('-created_at',)
@@ -8,4 +8,11 @@ STATUS_CHOICES = (
     ('end', 'End'),
     ('complete', 'Complete'),
     ('reject', 'Reject'),
-)
\ No newline at end of file
+)
+
+
+BULK_ACTION_CHOICES = (
+    ('approve', 'Approve'),
+    ('reject', 'Reject'),
+    ('assign_truck', 'Assign Truck'),
+)
@@ -0,0 +1,69 @@
+import csv
+import json
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+
+EXPORT_FIELDS = [
+    'id',
+    'user__email',
+    'truck__truck_number_plate',
+    'status',
+    'pickup_time',
+    'pickup_address',
+    'pickup_lat',
+    'pickup_lng',
+    'drop_off_address',
+    'drop_lat',
+    'drop_lng',
+    'initial_price',
+    'final_price',
+    'movers_total',
+    'truck_payment_status',
+    'mover_payment_status',
+    'start_time',
+    'end_time',
+    'distance_meter',
+    'duration_second',
+    'created_at',
+]
+
+EXPORT_HEADERS = [field.replace('__', '_') for field in EXPORT_FIELDS]
+
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+
+async def iter_export_chunks(queryset):
+    # queryset yields EXPORT_FIELDS tuples. Rows come from a server-side cursor, fetched one chunk per thread hop
+    chunk_size = settings.BOOKING_EXPORT_CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+    fetch_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)), thread_sensitive=True)
+
+    while True:
+        chunk = await fetch_chunk()
+        if not chunk:
+            break
+        yield chunk
+
+
+
+async def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+
+    async for chunk in iter_export_chunks(queryset):
+        yield "".join(writer.writerow(row) for row in chunk)
+
+
+
+async def stream_ndjson(queryset):
+    async for chunk in iter_export_chunks(queryset):
+        yield "".join(json.dumps(dict(zip(EXPORT_HEADERS, row)), cls=DjangoJSONEncoder) + "\n" for row in chunk)
@@ -0,0 +1,90 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Q, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from Trueliftmovers.search import ranked_search
+from .models import Booking, ArchivedBooking
+
+
+
+BOOKING_SEARCH_FIELDS = ['pickup_address', 'drop_off_address']
+
+
+
+def booking_filter_q(params):
+    q_filter = Q()
+
+    date_str = params.get('date')
+    status_filter = params.get('status')
+    truck_payment_filter = params.get('truck_payment_status')
+    mover_payment_filter = params.get('mover_payment_status')
+    start_date = parse_date(params.get('start_date') or '')
+    end_date = parse_date(params.get('end_date') or '')
+
+    if date_str:
+        filter_date = parse_date(date_str)
+        if filter_date:
+            q_filter &= Q(created_at__date=filter_date)
+
+    # Range bounds are built as datetimes so the created_at index can be used
+    if start_date:
+        q_filter &= Q(created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)))
+    if end_date:
+        q_filter &= Q(created_at__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)))
+
+    if status_filter:
+        q_filter &= Q(status=status_filter)
+    if truck_payment_filter is not None:
+        truck_payment_bool = truck_payment_filter.lower() == 'true'
+        q_filter &= Q(truck_payment_status=truck_payment_bool)
+    if mover_payment_filter is not None:
+        mover_payment_bool = mover_payment_filter.lower() == 'true'
+        q_filter &= Q(mover_payment_status=mover_payment_bool)
+
+    return q_filter
+
+
+
+def booking_rows(params, search_query=None, using=None):
+    # (id, created_at, archived) rows of the active and archived bookings matching the filters,
+    # as one UNION so both tables are paginated together
+    q_filter = booking_filter_q(params)
+    fields = ["id", "created_at", "archived"]
+    ordering = ["-created_at", "-id"]
+    if search_query:
+        fields.append("search_rank")
+        ordering.insert(0, "-search_rank")
+
+    rows = []
+    for model, archived in ((Booking, False), (ArchivedBooking, True)):
+        queryset = model.objects.using(using).filter(q_filter)
+        if search_query:
+            queryset = ranked_search(queryset, BOOKING_SEARCH_FIELDS, search_query).order_by()
+        rows.append(queryset.annotate(archived=Value(archived)).values(*fields))
+
+    return rows[0].union(rows[1], all=True).order_by(*ordering)
+
+
+
+def load_booking_rows(rows, using=None):
+    # Rows from booking_rows -> booking instances in the same order, one query per table
+    ids = {False: [], True: []}
+    for row in rows:
+        ids[bool(row["archived"])].append(row["id"])
+
+    bookings = {}
+    for model, archived in ((Booking, False), (ArchivedBooking, True)):
+        if ids[archived]:
+            queryset = (
+                model.objects.using(using)
+                .filter(id__in=ids[archived])
+                .select_related("user__profile", "truck")
+                .prefetch_related("payments")
+            )
+            bookings.update({(archived, booking.id): booking for booking in queryset})
+
+    return [
+        bookings[(bool(row["archived"]), row["id"])]
+        for row in rows
+        if (bool(row["archived"]), row["id"]) in bookings
+    ]
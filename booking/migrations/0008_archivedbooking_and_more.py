@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:19
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_booking_drop_elevator_stair_and_more'),
+        ('truck', '0005_truck_imei_truck_last_location_update_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('preference_track', models.JSONField(blank=True, null=True)),
+                ('movers', models.JSONField(blank=True, null=True)),
+                ('pickup_time', models.DateTimeField()),
+                ('pickup_address', models.TextField()),
+                ('pickup_lat', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('pickup_lng', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('pickup_elevator_stair', models.CharField(blank=True, max_length=100, null=True)),
+                ('drop_off_address', models.TextField()),
+                ('drop_lat', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('drop_lng', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('drop_elevator_stair', models.CharField(blank=True, max_length=100, null=True)),
+                ('movable_items', models.TextField(blank=True, null=True)),
+                ('initial_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('final_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('movers_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('accepted', 'Accepted'), ('start', 'Start'), ('end_request', 'End Request'), ('end', 'End'), ('complete', 'Complete'), ('reject', 'Reject')], max_length=20)),
+                ('truck_payment_status', models.BooleanField(default=False)),
+                ('mover_payment_status', models.BooleanField(default=False)),
+                ('overview_polyline', models.TextField(blank=True, null=True)),
+                ('distance_meter', models.PositiveIntegerField(blank=True, null=True)),
+                ('duration_second', models.PositiveIntegerField(blank=True, null=True)),
+                ('admin_note', models.TextField(blank=True, null=True)),
+                ('payments', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('agreement', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at'], name='booking_boo_user_id_4f3fce_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='truck',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to='truck.truck'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', '-created_at'], name='booking_arc_user_id_785ca1_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:27
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('booking', '0008_archivedbooking_and_more'),
+        ('truck', '0006_truck_truck_plate_trgm_truck_truck_driver_trgm_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('pickup_address'), name='gin_trgm_ops'), name='booking_pickup_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('drop_off_address'), name='gin_trgm_ops'), name='booking_drop_trgm'),
+        ),
+    ]
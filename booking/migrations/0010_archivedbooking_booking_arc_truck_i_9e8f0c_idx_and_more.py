@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:35
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('booking', '0009_booking_booking_pickup_trgm_and_more'),
+        ('truck', '0006_truck_truck_plate_trgm_truck_truck_driver_trgm_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='archivedbooking',
+            index=models.Index(fields=['truck', 'start_time'], name='booking_arc_truck_i_9e8f0c_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['truck', 'start_time'], name='booking_boo_truck_i_fae79e_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:04
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_archivedbooking_booking_arc_truck_i_9e8f0c_idx_and_more'),
+        ('payment', '0002_alter_payment_booking_archivedpayment'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='archivedbooking',
+            name='payments',
+        ),
+    ]
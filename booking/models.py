@@ -2,6 +2,7 @@ from django.db import models
 from truck.models import Truck
 from accounts.models import User
 from .constants import STATUS_CHOICES
+from Trueliftmovers.search import trigram_index
 from django.utils import timezone
 from decimal import Decimal
 
@@ -58,15 +59,32 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),
+            models.Index(fields=["truck", "start_time"]),
+            trigram_index("pickup_address", "booking_pickup_trgm"),
+            trigram_index("drop_off_address", "booking_drop_trgm"),
+        ]
+
     def save(self, *args, **kwargs):
+        derived_fields = []
+
         # Start booking
         if self.status == 'start' and self.start_time is None:
             self.start_time = timezone.now()
+            derived_fields.append('start_time')
 
         # End booking
         if self.status == 'end' and self.end_time is None:
             self.end_time = timezone.now()
             self.calculate_movers_total()
+            derived_fields.extend(['end_time', 'movers_total'])
+
+        # Column-targeted saves still have to write the derived columns and the auto_now timestamp
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | set(derived_fields) | {'updated_at'}
 
         super().save(*args, **kwargs)
     def calculate_movers_total(self):
@@ -96,8 +114,55 @@ class BookingAgreement(models.Model):
         return f"Booking Agreement {self.id}"
 
 
-    
 
+class ArchivedBooking(models.Model):
+    # Finished bookings moved out of the booking table, keeping their original id
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User,on_delete=models.SET_NULL,null=True,related_name='archived_bookings')
+    truck = models.ForeignKey(Truck,on_delete=models.SET_NULL,null=True,blank=True,related_name='archived_bookings')
+    preference_track = models.JSONField(null=True,blank=True)
+    movers = models.JSONField(null=True,blank=True)
 
+    pickup_time = models.DateTimeField()
+    pickup_address = models.TextField()
+    pickup_lat = models.DecimalField(max_digits=9, decimal_places=6)
+    pickup_lng = models.DecimalField(max_digits=9, decimal_places=6)
+    pickup_elevator_stair = models.CharField(max_length=100, null=True, blank=True)
 
+    drop_off_address = models.TextField()
+    drop_lat = models.DecimalField(max_digits=9, decimal_places=6)
+    drop_lng = models.DecimalField(max_digits=9, decimal_places=6)
+    drop_elevator_stair = models.CharField(max_length=100, null=True, blank=True)
 
+    movable_items = models.TextField(null=True, blank=True)
+    initial_price = models.DecimalField(max_digits=10, decimal_places=2)
+    final_price = models.DecimalField(max_digits=10,decimal_places=2,null=True,blank=True)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    movers_total = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    status = models.CharField(max_length=20,choices=STATUS_CHOICES)
+
+    truck_payment_status = models.BooleanField(default=False)
+    mover_payment_status = models.BooleanField(default=False)
+
+    overview_polyline = models.TextField(null=True,blank=True)
+    distance_meter = models.PositiveIntegerField(null=True,blank=True)
+    duration_second = models.PositiveIntegerField(null=True,blank=True)
+
+    admin_note = models.TextField(null=True, blank=True)
+
+    # Snapshot of the agreement, deleted together with the booking. Payments move to payment.ArchivedPayment
+    agreement = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),
+            models.Index(fields=["truck", "start_time"]),
+        ]
+
+    def __str__(self):
+        return f"Archived Booking #{self.id}"
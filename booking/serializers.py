@@ -1,15 +1,21 @@
 from rest_framework import serializers
 from truck.models import PriceManagement,MoversManagements,Truck
-from .models  import Booking,BookingAgreement
+from .models  import Booking,BookingAgreement,ArchivedBooking
 from datetime import datetime
 from django.utils import timezone
 from .direaction import getdiractioninfo
 from decimal import Decimal
 from django.shortcuts import get_object_or_404
-from .tasks import send_booking_email
-from notifications.tasks import create_notification_task
+from .tasks import queue_booking_email
+from notifications.queue import enqueue_notification, enqueue_notifications
 from accounts.models import User, Profile
 from payment.models import Payment
+from .transitions import apply_transition, TRANSITIONS
+from .signals import booking_status_changed, booking_truck_changed
+from .constants import BULK_ACTION_CHOICES
+from django.db import transaction
+from Trueliftmovers import metrics
+from Trueliftmovers.utils import set_changed_fields
 
 
 
@@ -155,30 +161,32 @@ class BookingCreateSerializer(serializers.ModelSerializer):
             "movable_items": validated_data.get('movable_items', "")
         } 
         
-        booking = Booking.objects.create(**result)
-
-
-        create_notification_task.delay(
-            user_id=request.user.id,
-            title="New Booking Created",
-            body=f"A new booking has been submitted.",
-            data={
-                "booking_id": booking.id,
-                "user_id": booking.user.id if booking.user else None,
-                "initial_price": float(booking.initial_price),
-                "status": booking.status,
-                "pickup_time": booking.pickup_time.isoformat() if booking.pickup_time else None,
-                "pickup_address": booking.pickup_address,
-                "drop_off_address": booking.drop_off_address,
-                "distance_meter": booking.distance_meter,
-                "duration_second": booking.duration_second,
-                "created_at": booking.created_at.isoformat() if booking.created_at else None,
-            },
-            broadcast_user=False,
-            broadcast_admin=True
-        )
+        with transaction.atomic():
+            booking = Booking.objects.create(**result)
+
+
+            enqueue_notification(
+                user_id=request.user.id,
+                notification_type="booking",
+                title="New Booking Created",
+                body=f"A new booking has been submitted.",
+                data={
+                    "booking_id": booking.id,
+                    "user_id": booking.user.id if booking.user else None,
+                    "initial_price": float(booking.initial_price),
+                    "status": booking.status,
+                    "pickup_time": booking.pickup_time.isoformat() if booking.pickup_time else None,
+                    "pickup_address": booking.pickup_address,
+                    "drop_off_address": booking.drop_off_address,
+                    "distance_meter": booking.distance_meter,
+                    "duration_second": booking.duration_second,
+                    "created_at": booking.created_at.isoformat() if booking.created_at else None,
+                },
+                broadcast_user=False,
+                broadcast_admin=True
+            )
 
-        send_booking_email.delay(booking.id)
+            queue_booking_email(booking)
 
         return booking
 
@@ -229,6 +237,14 @@ class BookingGetSerializer(serializers.ModelSerializer):
 
 
 
+class ArchivedBookingGetSerializer(BookingGetSerializer):
+    class Meta(BookingGetSerializer.Meta):
+        model = ArchivedBooking
+        fields = BookingGetSerializer.Meta.fields + ["archived_at"]
+
+
+
+
 class BookingAdminUpdateSerializer(serializers.ModelSerializer):
     pickup_time = serializers.DateTimeField(required=False)
 
@@ -256,18 +272,23 @@ class BookingAdminUpdateSerializer(serializers.ModelSerializer):
     
 
     def update(self, instance, validated_data):
-        instance.truck = validated_data.get("truck", instance.truck)
-        instance.admin_note = validated_data.get("admin_note", instance.admin_note)
-        instance.final_price = validated_data.get("final_price", instance.final_price)
-        instance.pickup_time = validated_data.get("pickup_time", instance.pickup_time)
+        previous_truck_id = instance.truck_id
+        changed_fields = set_changed_fields(instance, {
+            field: validated_data[field]
+            for field in ["truck", "admin_note", "final_price", "pickup_time"]
+            if field in validated_data
+        })
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
+        if "truck" in changed_fields:
+            booking_truck_changed.send(sender=Booking, changes=[(instance, previous_truck_id)])
 
         if instance.truck and instance.status == "pending":
-            instance.status = "approved"
+            instance = apply_transition(instance.id, "approve") or instance
 
-        instance.save()
-
-        create_notification_task.delay(
+        enqueue_notification(
             user_id=instance.user.id,
+            notification_type="booking",
             title="Booking approved",
             body="Your booking has been approved by admin.",
             data={
@@ -308,11 +329,13 @@ class BookingRejectSerializer(serializers.ModelSerializer):
     
 
     def update(self, instance, validated_data):
-        instance.status = 'reject'
-        instance.save()
+        instance = apply_transition(instance.id, "reject")
+        if instance is None:
+            raise serializers.ValidationError("Booking status changed, it can no longer be rejected.")
 
-        create_notification_task.delay(
+        enqueue_notification(
             user_id=instance.user.id,
+            notification_type="booking",
             title="Booking Rejected",
             body="booking has been rejected",
             data={
@@ -383,8 +406,11 @@ class BookingstartendSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):  
         new_status = validated_data.get('status')
-        instance.status = new_status
-        instance.save()
+        instance = apply_transition(instance.id, new_status)
+        if instance is None:
+            raise serializers.ValidationError({
+                "status": f"Booking cannot be moved to '{new_status}' from its current status."
+            })
 
 
         data = {
@@ -409,8 +435,9 @@ class BookingstartendSerializer(serializers.ModelSerializer):
             title = "Booking Started" if new_status == 'start' else "Booking Ended"
             body = f"Your booking #{instance.id} has {'started' if new_status == 'start' else 'ended'}."
 
-            create_notification_task.delay(
+            enqueue_notification(
                 user_id=instance.user.id,
+                notification_type="booking",
                 title=title,
                 body=body,
                 data=data,
@@ -442,8 +469,11 @@ class BookingEndRequesttendSerializer(serializers.ModelSerializer):
     
 
     def update(self, instance, validated_data):
-        instance.status = 'end_request'
-        instance.save()
+        instance = apply_transition(instance.id, "end_request")
+        if instance is None:
+            raise serializers.ValidationError({
+                "status": "Cannot request end for a booking that hasn't started"
+            })
         title = "Booking End Request"
         body = f"User has requested to end Booking #{instance.id}."
         data = {
@@ -452,8 +482,9 @@ class BookingEndRequesttendSerializer(serializers.ModelSerializer):
             "user_id": instance.user.id if instance.user else None
         }
         
-        create_notification_task.delay(
+        enqueue_notification(
             user_id=instance.user.id if instance.user else None,  # optional: for reference
+            notification_type="booking",
             title=title,
             body=body,
             data=data,
@@ -461,4 +492,105 @@ class BookingEndRequesttendSerializer(serializers.ModelSerializer):
             broadcast_user=False
         )
         return instance
-    
+
+
+
+class BookingBulkActionSerializer(serializers.Serializer):
+    booking_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=500)
+    action = serializers.ChoiceField(choices=BULK_ACTION_CHOICES)
+    truck = serializers.PrimaryKeyRelatedField(queryset=Truck.objects.all(), required=False, allow_null=True)
+
+    ALLOWED_STATUSES = {
+        "approve": TRANSITIONS["approve"]["source"],
+        "reject": TRANSITIONS["reject"]["source"],
+        "assign_truck": ("pending", "approved", "accepted"),
+    }
+
+    def validate(self, attrs):
+        if attrs["action"] == "assign_truck" and not attrs.get("truck"):
+            raise serializers.ValidationError({"truck": "Truck is required to assign bookings."})
+
+        attrs["booking_ids"] = list(dict.fromkeys(attrs["booking_ids"]))
+        return attrs
+
+
+    def save(self, **kwargs):
+        action = self.validated_data["action"]
+        booking_ids = self.validated_data["booking_ids"]
+        truck = self.validated_data.get("truck")
+        now = timezone.now()
+
+        with metrics.timed(f"booking.bulk.{action}"), transaction.atomic():
+            bookings = list(Booking.objects.select_for_update(of=("self",)).select_related("truck").filter(id__in=booking_ids))
+
+            missing = set(booking_ids) - {booking.id for booking in bookings}
+            if missing:
+                raise serializers.ValidationError({
+                    "booking_ids": f"Bookings not found: {', '.join(str(i) for i in sorted(missing))}."
+                })
+
+            invalid = [booking for booking in bookings if booking.status not in self.ALLOWED_STATUSES[action]]
+            if invalid:
+                raise serializers.ValidationError({
+                    "booking_ids": "; ".join(f"Booking #{booking.id} has status '{booking.status}'" for booking in invalid)
+                })
+
+            if action == "approve" and not truck:
+                unassigned = [booking.id for booking in bookings if not booking.truck_id]
+                if unassigned:
+                    raise serializers.ValidationError({
+                        "truck": f"Assign a truck before approving bookings: {', '.join(str(i) for i in unassigned)}."
+                    })
+
+            previous = {booking.id: (booking.status, booking.truck_id) for booking in bookings}
+            for booking in bookings:
+                if truck:
+                    booking.truck = truck
+                if action == "reject":
+                    booking.status = "reject"
+                elif booking.status == "pending":
+                    booking.status = "approved"
+                booking.updated_at = now
+
+            update_fields = ["status", "updated_at"] + (["truck"] if truck else [])
+            Booking.objects.bulk_update(bookings, update_fields)
+
+            booking_status_changed.send(sender=Booking, changes=[
+                (booking, previous[booking.id][0]) for booking in bookings
+            ])
+            if truck:
+                booking_truck_changed.send(sender=Booking, changes=[
+                    (booking, previous[booking.id][1]) for booking in bookings
+                ])
+
+        notifications = [self.build_notification(booking, action) for booking in bookings if booking.user_id]
+        if notifications:
+            enqueue_notifications(notifications)
+
+        return bookings
+
+
+    def build_notification(self, booking, action):
+        # Admin actions notify the customer, like BookingAdminUpdateSerializer. The single reject
+        # path is the customer cancelling, which is why that one notifies the admins instead
+        if action == "reject":
+            title, body = "Booking Rejected", "Your booking has been rejected by admin."
+        else:
+            title, body = "Booking approved", "Your booking has been approved by admin."
+
+        return {
+            "user_id": booking.user_id,
+            "title": title,
+            "body": body,
+            "data": {
+                "booking_id": booking.id,
+                "status": booking.status,
+                "truck": str(booking.truck) if booking.truck_id else None,
+                "final_price": float(booking.final_price) if booking.final_price else None,
+                "pickup_time": booking.pickup_time.isoformat() if booking.pickup_time else None,
+                "admin_note": booking.admin_note,
+            },
+            "broadcast_user": True,
+            "broadcast_admin": False,
+            "notification_type": "booking",
+        }
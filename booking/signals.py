@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+
+
+# Sent with changes=[(booking, previous_status), ...] when statuses change through
+# booking.transitions or bulk updates, which bypass Model.save().
+booking_status_changed = Signal()
+
+# Sent with changes=[(booking, previous_truck_id), ...] when trucks are (re)assigned.
+booking_truck_changed = Signal()
@@ -1,20 +1,18 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.conf import settings
-from .models import Booking
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from datetime import timedelta
+from notifications.outbox import queue_email
+from payment.models import Payment, ArchivedPayment
+from .models import Booking, ArchivedBooking
 
 
 
-@shared_task
-def send_booking_email(booking_id):
-    try:
-        booking = Booking.objects.select_related("user").get(id=booking_id)
-
-        # ------------------------
-        # USER EMAIL
-        # ------------------------
-        subject = "Booking Created Successfully"
-        message = f"""
+def queue_booking_email(booking):
+    subject = "Booking Created Successfully"
+    message = f"""
 Hello {booking.user.profile.full_name},
 
 Your booking has been created successfully.
@@ -26,14 +24,68 @@ Initial Price: {booking.initial_price}
 Thank you.
         """
 
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[booking.user.email],
-        )
+    return queue_email(
+        subject=subject,
+        body=message,
+        recipients=[booking.user.email],
+        from_email=settings.EMAIL_HOST_USER,
+        dedupe_key=f"booking-created:{booking.id}",
+    )
+
 
+
+@shared_task
+def send_booking_email(booking_id):
+    # Kept for messages already queued, producers call queue_booking_email
+    try:
+        booking = Booking.objects.select_related("user__profile").get(id=booking_id)
+        queue_booking_email(booking)
         return f"Booking notification processed {booking.id}"
 
     except Booking.DoesNotExist:
         return "Booking not found"
+
+
+
+ARCHIVED_STATUSES = ["complete", "reject"]
+
+
+@shared_task
+def archive_finished_bookings():
+    cutoff = timezone.now() - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS)
+    booking_fields = [field.attname for field in Booking._meta.concrete_fields]
+    payment_fields = [field.attname for field in Payment._meta.concrete_fields]
+    archived = 0
+
+    for _ in range(settings.BOOKING_ARCHIVE_MAX_BATCHES):
+        with transaction.atomic():
+            bookings = list(
+                Booking.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(status__in=ARCHIVED_STATUSES, updated_at__lt=cutoff)
+                .select_related("agreement")
+                .prefetch_related(Prefetch("payments", queryset=Payment.objects.select_for_update()))
+                .order_by("id")[:settings.BOOKING_ARCHIVE_BATCH_SIZE]
+            )
+            if not bookings:
+                break
+
+            ArchivedBooking.objects.bulk_create([
+                ArchivedBooking(
+                    **{name: getattr(booking, name) for name in booking_fields},
+                    agreement=booking.agreement.agreements if hasattr(booking, "agreement") else None,
+                )
+                for booking in bookings
+            ])
+
+            # Payments are moved to their own archive table before the bookings that protect them go
+            payments = [payment for booking in bookings for payment in booking.payments.all()]
+            ArchivedPayment.objects.bulk_create([
+                ArchivedPayment(**{name: getattr(payment, name) for name in payment_fields})
+                for payment in payments
+            ])
+            Payment.objects.filter(id__in=[payment.id for payment in payments]).delete()
+            Booking.objects.filter(id__in=[booking.id for booking in bookings]).delete()
+
+        archived += len(bookings)
+
+    return f"{archived} bookings archived"
@@ -1,3 +1,430 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection
+from django.db.models import ProtectedError
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from adminapi.models import DailyBookingStatusRollup
+from truck.models import Truck
+from payment.models import Payment
+from .constants import STATUS_CHOICES
+from .models import Booking, ArchivedBooking, BookingAgreement
+from .signals import booking_status_changed
+from .tasks import archive_finished_bookings
+from .transitions import apply_transition, TRANSITIONS
 
 # Create your tests here.
+
+
+
+def updated_columns(queries, table):
+    # The SET column list of every UPDATE issued against the table
+    columns = []
+    for query in queries:
+        sql = query["sql"]
+        if sql.startswith(f'UPDATE "{table}" SET '):
+            assignments = sql.split(" SET ", 1)[1].split(" WHERE ", 1)[0]
+            columns.append(set(re.findall(r'"(\w+)" = ', assignments)))
+    return columns
+
+
+
+def create_booking(user, **kwargs):
+    values = {
+        "user": user,
+        "pickup_time": timezone.now(),
+        "pickup_address": "12 Pickup Street",
+        "pickup_lat": 1,
+        "pickup_lng": 1,
+        "drop_off_address": "34 Drop Street",
+        "drop_lat": 2,
+        "drop_lng": 2,
+        "initial_price": 100,
+        "overview_polyline": "a" * 500,
+        "preference_track": {"price": 100},
+    }
+    values.update(kwargs)
+    return Booking.objects.create(**values)
+
+
+
+
+class BookingAdminUpdateColumnsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.booking = create_booking(self.customer, status="approved", admin_note="old note")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse("admin-booking-update", args=[self.booking.id])
+
+    def test_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {"admin_note": "new note", "final_price": "120.00"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            updated_columns(queries.captured_queries, Booking._meta.db_table),
+            [{"admin_note", "final_price", "updated_at"}],
+        )
+
+    def test_skips_the_write_when_nothing_changed(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {"admin_note": "old note"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(updated_columns(queries.captured_queries, Booking._meta.db_table), [])
+
+    def test_derived_columns_are_written_with_targeted_saves(self):
+        self.booking.status = "end"
+        self.booking.start_time = timezone.now()
+        with CaptureQueriesContext(connection) as queries:
+            self.booking.save(update_fields=["status"])
+
+        self.assertEqual(
+            updated_columns(queries.captured_queries, Booking._meta.db_table),
+            [{"status", "end_time", "movers_total", "updated_at"}],
+        )
+
+
+
+class TransitionAtomicityTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.booking = create_booking(self.customer)
+
+    def test_failing_receiver_rolls_the_transition_back(self):
+        def fail(sender, changes, **kwargs):
+            raise RuntimeError("Receiver failed")
+
+        booking_status_changed.connect(fail)
+        try:
+            with self.assertRaises(RuntimeError):
+                apply_transition(self.booking.id, "approve")
+        finally:
+            booking_status_changed.disconnect(fail)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "pending")
+        self.assertFalse(DailyBookingStatusRollup.objects.filter(status="approved").exists())
+        self.assertEqual(DailyBookingStatusRollup.objects.get(status="pending").count, 1)
+
+
+
+@mock.patch("booking.transitions.metrics")
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.started = timezone.now() - timedelta(hours=2)
+
+    def booking_in(self, status, **fields):
+        # Set with an UPDATE so save() does not fill in the derived columns
+        booking = create_booking(self.customer)
+        Booking.objects.filter(id=booking.id).update(status=status, **{"start_time": self.started, **fields})
+        return booking
+
+    def test_every_transition_accepts_only_its_source_statuses(self, metrics):
+        for name, transition in TRANSITIONS.items():
+            for status, _ in STATUS_CHOICES:
+                with self.subTest(transition=name, status=status):
+                    metrics.reset_mock()
+                    booking = self.booking_in(status)
+
+                    result = apply_transition(booking.id, name)
+
+                    booking.refresh_from_db()
+                    if status in transition["source"]:
+                        self.assertIsNotNone(result)
+                        self.assertEqual(result.previous_status, status)
+                        self.assertEqual(booking.status, transition["target"] or result.status)
+                        metrics.incr.assert_not_called()
+                    else:
+                        self.assertIsNone(result)
+                        self.assertEqual(booking.status, status)
+                        metrics.incr.assert_called_once_with(f"booking.transition.{name}.conflict")
+
+    def test_start_keeps_an_existing_start_time(self, metrics):
+        booking = self.booking_in("approved")
+        self.assertEqual(apply_transition(booking.id, "start").start_time, self.started)
+
+        booking = self.booking_in("approved", start_time=None)
+        before = timezone.now()
+        self.assertGreaterEqual(apply_transition(booking.id, "start").start_time, before - timedelta(seconds=5))
+
+    def test_start_requires_no_end_time(self, metrics):
+        booking = self.booking_in("approved", end_time=timezone.now())
+        self.assertIsNone(apply_transition(booking.id, "start"))
+
+    def test_end_keeps_an_existing_end_time_and_computes_movers_total(self, metrics):
+        ended = self.started + timedelta(minutes=90)
+        booking = self.booking_in("start", end_time=ended, movers={"hour_rate": "30"})
+
+        result = apply_transition(booking.id, "end")
+
+        self.assertEqual(result.end_time, ended)
+        self.assertEqual(result.movers_total, Decimal("45.00"))
+
+    def test_end_without_movers_keeps_movers_total(self, metrics):
+        booking = self.booking_in("end_request", movers=None, movers_total=Decimal("12.50"))
+
+        result = apply_transition(booking.id, "end")
+
+        self.assertIsNotNone(result.end_time)
+        self.assertEqual(result.movers_total, Decimal("12.50"))
+
+    def test_end_requires_a_start_time(self, metrics):
+        booking = self.booking_in("start", start_time=None)
+        self.assertIsNone(apply_transition(booking.id, "end"))
+
+    def test_truck_paid_accepts_only_unstarted_bookings(self, metrics):
+        expected = {"pending": "accepted", "approved": "accepted", "accepted": "accepted", "start": "start", "end_request": "end_request", "end": "end"}
+        for status, target in expected.items():
+            with self.subTest(status=status):
+                booking = self.booking_in(status)
+
+                result = apply_transition(booking.id, "truck_paid")
+
+                self.assertEqual(result.status, target)
+                self.assertTrue(result.truck_payment_status)
+
+    def test_mover_paid_completes_the_booking(self, metrics):
+        booking = self.booking_in("end")
+
+        result = apply_transition(booking.id, "mover_paid")
+
+        self.assertEqual(result.status, "complete")
+        self.assertTrue(result.mover_payment_status)
+
+
+
+def archive(*bookings):
+    # Ages the bookings past the archive cutoff and runs the archive task
+    old = timezone.now() - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS + 1)
+    Booking.objects.filter(id__in=[booking.id for booking in bookings]).update(status="complete", updated_at=old)
+    archive_finished_bookings()
+
+
+
+class ArchiveFinishedBookingsTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+
+    def test_moves_finished_bookings_with_their_payments(self):
+        booking = create_booking(self.customer, final_price=100, movers_total=20)
+        BookingAgreement.objects.create(booking=booking, agreements="Signed")
+        payments = [
+            Payment.objects.create(booking=booking, type_payment="truck", amount=100, status="succeeded", is_paid=True),
+            Payment.objects.create(booking=booking, type_payment="mover", amount=20, status="succeeded", is_paid=True),
+        ]
+        pending = create_booking(self.customer)
+
+        archive(booking)
+
+        self.assertFalse(Booking.objects.filter(id=booking.id).exists())
+        self.assertFalse(Payment.objects.filter(booking_id=booking.id).exists())
+        archived = ArchivedBooking.objects.get(id=booking.id)
+        self.assertEqual((archived.status, archived.final_price, archived.agreement), ("complete", 100, "Signed"))
+        self.assertEqual(
+            sorted(archived.payments.values_list("id", "type_payment", "amount")),
+            sorted((payment.id, payment.type_payment, payment.amount) for payment in payments),
+        )
+        self.assertTrue(Booking.objects.filter(id=pending.id).exists())
+
+    def test_keeps_recently_finished_bookings(self):
+        booking = create_booking(self.customer, status="complete")
+
+        archive_finished_bookings()
+
+        self.assertTrue(Booking.objects.filter(id=booking.id).exists())
+        self.assertFalse(ArchivedBooking.objects.exists())
+
+    def test_bookings_with_payments_cannot_be_deleted_directly(self):
+        booking = create_booking(self.customer)
+        Payment.objects.create(booking=booking, type_payment="truck", amount=100)
+
+        with self.assertRaises(ProtectedError):
+            booking.delete()
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+
+
+
+class BookingHistoryPagingTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        bookings = [create_booking(self.customer) for _ in range(25)]
+        # Every other booking is archived, and ties on created_at leave the order to the id
+        archive(*bookings[::2])
+        created_at = timezone.now() - timedelta(days=1)
+        Booking.objects.update(created_at=created_at)
+        ArchivedBooking.objects.update(created_at=created_at)
+        self.ids = [booking.id for booking in bookings]
+        self.client = APIClient()
+
+    def walk(self, url, params=None):
+        ids = []
+        while url:
+            data = self.client.get(url, params).json()["data"]
+            ids.extend(booking["id"] for booking in data["results"])
+            url, params = data["next"], None
+        return ids
+
+    def test_history_pages_through_active_then_archived_bookings(self):
+        self.client.force_authenticate(self.customer)
+
+        ids = self.walk(reverse("booking-history"))
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(ids), sorted(self.ids))
+        active = set(Booking.objects.values_list("id", flat=True))
+        self.assertEqual(set(ids[:len(active)]), active)
+
+    def test_admin_list_pages_across_both_tables_in_order(self):
+        self.client.force_authenticate(self.admin)
+
+        ids = self.walk(reverse("booking-list-create"))
+
+        self.assertEqual(ids, sorted(self.ids, reverse=True))
+
+    def test_admin_list_filters_both_tables(self):
+        self.client.force_authenticate(self.admin)
+
+        ids = self.walk(reverse("booking-list-create"), {"status": "complete"})
+
+        self.assertEqual(ids, sorted(self.ids[::2], reverse=True))
+
+
+
+@mock.patch("booking.serializers.enqueue_notifications")
+class BookingBulkActionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.truck = Truck.objects.create(truck_number_plate="TL-0001")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse("booking-bulk-action")
+
+    def post(self, **payload):
+        return self.client.post(self.url, payload, format="json")
+
+    def statuses(self, bookings):
+        return [Booking.objects.values_list("status", "truck_id").get(id=booking.id) for booking in bookings]
+
+    def test_approve_assigns_the_truck_and_notifies_the_customers(self, enqueue_notifications):
+        bookings = [create_booking(self.customer), create_booking(self.customer)]
+
+        response = self.post(action="approve", booking_ids=[booking.id for booking in bookings], truck=self.truck.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(bookings), [("approved", self.truck.id)] * 2)
+        notifications, = enqueue_notifications.call_args.args
+        self.assertEqual([notification["user_id"] for notification in notifications], [self.customer.id] * 2)
+        self.assertTrue(all(notification["broadcast_user"] and not notification["broadcast_admin"] for notification in notifications))
+
+    def test_approve_needs_a_truck(self, enqueue_notifications):
+        booking = create_booking(self.customer)
+
+        response = self.post(action="approve", booking_ids=[booking.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses([booking]), [("pending", None)])
+        enqueue_notifications.assert_not_called()
+
+    def test_reject(self, enqueue_notifications):
+        bookings = [create_booking(self.customer), create_booking(self.customer, status="accepted")]
+
+        response = self.post(action="reject", booking_ids=[booking.id for booking in bookings])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(bookings), [("reject", None)] * 2)
+        notifications, = enqueue_notifications.call_args.args
+        self.assertEqual({notification["title"] for notification in notifications}, {"Booking Rejected"})
+
+    def test_assign_truck_keeps_the_status(self, enqueue_notifications):
+        bookings = [create_booking(self.customer), create_booking(self.customer, status="accepted")]
+
+        response = self.post(action="assign_truck", booking_ids=[booking.id for booking in bookings], truck=self.truck.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(bookings), [("approved", self.truck.id), ("accepted", self.truck.id)])
+
+    def test_assign_truck_requires_a_truck(self, enqueue_notifications):
+        booking = create_booking(self.customer)
+
+        response = self.post(action="assign_truck", booking_ids=[booking.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"]["message"], "Truck is required to assign bookings.")
+
+    def test_missing_ids_change_nothing(self, enqueue_notifications):
+        booking = create_booking(self.customer)
+
+        response = self.post(action="reject", booking_ids=[booking.id, booking.id + 1000])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(booking.id + 1000), str(response.json()))
+        self.assertEqual(self.statuses([booking]), [("pending", None)])
+        enqueue_notifications.assert_not_called()
+
+    def test_invalid_status_changes_nothing(self, enqueue_notifications):
+        bookings = [create_booking(self.customer), create_booking(self.customer, status="start")]
+
+        response = self.post(action="reject", booking_ids=[booking.id for booking in bookings])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"Booking #{bookings[1].id} has status 'start'", str(response.json()))
+        self.assertEqual([status for status, _ in self.statuses(bookings)], ["pending", "start"])
+        enqueue_notifications.assert_not_called()
+
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+
+class BookingExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.bookings = [create_booking(self.customer, final_price=100 + i) for i in range(5)]
+        archive(*self.bookings[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse("booking-export"), params)
+        self.assertEqual(response.status_code, 200)
+        return async_to_sync(collect)(response.streaming_content).decode()
+
+    @override_settings(BOOKING_EXPORT_CHUNK_SIZE=2)
+    def test_csv_streams_active_and_archived_bookings_in_chunks(self):
+        rows = list(csv.DictReader(io.StringIO(self.export())))
+
+        self.assertEqual([int(row["id"]) for row in rows], [booking.id for booking in reversed(self.bookings)])
+        self.assertEqual({row["status"] for row in rows[-2:]}, {"complete"})
+        self.assertEqual(rows[-1]["user_email"], "customer@example.com")
+        self.assertEqual(rows[-1]["final_price"], "100.00")
+
+    def test_filters_apply_to_the_archive(self):
+        rows = list(csv.DictReader(io.StringIO(self.export(status="complete"))))
+
+        self.assertEqual(sorted(int(row["id"]) for row in rows), sorted(booking.id for booking in self.bookings[:2]))
+
+    def test_ndjson(self):
+        lines = [json.loads(line) for line in self.export(export_type="ndjson").splitlines()]
+
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0]["id"], self.bookings[-1].id)
@@ -0,0 +1,106 @@
+from django.db import router, transaction
+from Trueliftmovers import metrics
+from .models import Booking
+from .signals import booking_status_changed
+
+
+
+# Each transition is applied as one conditional UPDATE ... RETURNING statement.
+# "source" lists the statuses the booking may be in, "assignments" and
+# "conditions" are extra SQL fragments evaluated against the locked row "b".
+TRANSITIONS = {
+    "approve": {
+        "source": ("pending",),
+        "target": "approved",
+    },
+    "reject": {
+        "source": ("pending", "approved", "accepted"),
+        "target": "reject",
+    },
+    "start": {
+        "source": ("approved", "accepted"),
+        "target": "start",
+        "assignments": [
+            "start_time = COALESCE(b.start_time, NOW())",
+        ],
+        "conditions": [
+            "b.end_time IS NULL",
+        ],
+    },
+    "end_request": {
+        "source": ("start",),
+        "target": "end_request",
+    },
+    "end": {
+        "source": ("start", "end_request"),
+        "target": "end",
+        "assignments": [
+            "end_time = COALESCE(b.end_time, NOW())",
+            "movers_total = CASE WHEN b.movers IS NULL THEN b.movers_total ELSE ROUND("
+            "EXTRACT(EPOCH FROM (COALESCE(b.end_time, NOW()) - b.start_time))::numeric / 3600"
+            " * COALESCE((b.movers->>'hour_rate')::numeric, 0), 2) END",
+        ],
+        "conditions": [
+            "b.start_time IS NOT NULL",
+        ],
+    },
+    "truck_paid": {
+        "source": ("pending", "approved", "accepted", "start", "end_request", "end"),
+        "target": None,
+        "assignments": [
+            "status = CASE WHEN b.status IN ('pending', 'approved') THEN 'accepted' ELSE b.status END",
+            "truck_payment_status = TRUE",
+        ],
+    },
+    "mover_paid": {
+        "source": ("accepted", "start", "end_request", "end"),
+        "target": "complete",
+        "assignments": [
+            "mover_payment_status = TRUE",
+        ],
+    },
+}
+
+
+
+def build_transition_sql(name):
+    transition = TRANSITIONS[name]
+    table = Booking._meta.db_table
+
+    assignments = ["updated_at = NOW()"]
+    params = []
+    if transition["target"]:
+        assignments.append("status = %s")
+        params.append(transition["target"])
+    assignments.extend(transition.get("assignments", []))
+
+    conditions = ["b.id = previous.id", "b.status = ANY(%s)"]
+    conditions.extend(transition.get("conditions", []))
+
+    sql = (
+        f"UPDATE {table} AS b SET {', '.join(assignments)} "
+        f"FROM (SELECT id, status FROM {table} WHERE id = %s FOR UPDATE) AS previous "
+        f"WHERE {' AND '.join(conditions)} "
+        f"RETURNING b.*, previous.status AS previous_status"
+    )
+    return sql, params
+
+
+
+def apply_transition(booking_id, name):
+    sql, params = build_transition_sql(name)
+    params = params + [booking_id, list(TRANSITIONS[name]["source"])]
+    using = router.db_for_write(Booking)
+
+    # The rollup receivers write in the same transaction, so a failing one rolls the transition back
+    with transaction.atomic(using=using):
+        with metrics.timed(f"booking.transition.{name}"):
+            rows = Booking.objects.raw(sql, params).using(using)
+            booking = next(iter(rows), None)
+
+        if booking is not None:
+            booking_status_changed.send(sender=Booking, changes=[(booking, booking.previous_status)])
+
+    if booking is None:
+        metrics.incr(f"booking.transition.{name}.conflict")
+    return booking
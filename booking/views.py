@@ -2,20 +2,23 @@ from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.shortcuts import get_object_or_404
 
-from .models import Booking,BookingAgreement
-from .serializers import BookingCreateSerializer,BookingGetSerializer,BookingAdminUpdateSerializer,BookingRejectSerializer,BookingAgreementSerializer,BookingstartendSerializer,BookingEndRequesttendSerializer
+from .models import Booking,BookingAgreement,ArchivedBooking
+from .serializers import BookingCreateSerializer,BookingGetSerializer,BookingAdminUpdateSerializer,BookingRejectSerializer,BookingAgreementSerializer,BookingstartendSerializer,BookingEndRequesttendSerializer,BookingBulkActionSerializer,ArchivedBookingGetSerializer
 from accounts.response import success_response
+from Trueliftmovers.db_router import replica_reads, read_db_alias
 from rest_framework.parsers import MultiPartParser,FormParser
 from accounts.permissions import IsAdminRole,IsUserRole
-from django.utils.dateparse import parse_date
-from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.http import StreamingHttpResponse
+from .filters import booking_filter_q, booking_rows, load_booking_rows
+from .exports import stream_csv, stream_ndjson, EXPORT_FIELDS
 
 
 # Create your views here.
@@ -38,6 +41,20 @@ class BookingListCreateView(APIView):
                 type=openapi.TYPE_STRING,
                 required=False
             ),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Bookings created on or after this date (YYYY-MM-DD)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Bookings created on or before this date (YYYY-MM-DD)",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
             openapi.Parameter(
                 'status',
                 openapi.IN_QUERY,
@@ -59,6 +76,13 @@ class BookingListCreateView(APIView):
                 type=openapi.TYPE_BOOLEAN,
                 required=False
             ),
+            openapi.Parameter(
+                'search',
+                openapi.IN_QUERY,
+                description="Admin only: search pickup and drop-off addresses, best matches first",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
             openapi.Parameter(
                 'page',
                 openapi.IN_QUERY,
@@ -70,43 +94,30 @@ class BookingListCreateView(APIView):
         responses={200: BookingGetSerializer(many=True)},
         tags=["Booking"]
     )
+    @replica_reads
     def get(self, request):
-        date_str = request.query_params.get('date', None)
-        status_filter = request.query_params.get('status')
-        truck_payment_filter = request.query_params.get('truck_payment_status')
-        mover_payment_filter = request.query_params.get('mover_payment_status')
+        paginator = PageNumberPagination()
+        paginator.page_size = 10
 
         if request.user.role == "admin":
-            bookings = Booking.objects.all().order_by("-created_at")
-            
-            q_filter = Q()
-            if date_str:
-                filter_date = parse_date(date_str)
-                if filter_date:
-                    q_filter &= Q(created_at__date=filter_date)
-            if status_filter:
-                q_filter &= Q(status=status_filter)
-            if truck_payment_filter is not None:
-                truck_payment_bool = truck_payment_filter.lower() == 'true'
-                q_filter &= Q(truck_payment_status=truck_payment_bool)
-            if mover_payment_filter is not None:
-                mover_payment_bool = mover_payment_filter.lower() == 'true'
-                q_filter &= Q(mover_payment_status=mover_payment_bool)
-            
-            bookings = bookings.filter(q_filter)
+            # Archived bookings are listed, searched and counted together with the active ones
+            rows = booking_rows(request.query_params, request.query_params.get("search"))
+            paginated_bookings = load_booking_rows(paginator.paginate_queryset(rows, request))
+            results = [
+                (ArchivedBookingGetSerializer if isinstance(booking, ArchivedBooking) else BookingGetSerializer)(booking).data
+                for booking in paginated_bookings
+            ]
         else:
-            ten_days_ago = timezone.now() - timedelta(days=10)
-            bookings = Booking.objects.filter(user=request.user,pickup_time__gte=ten_days_ago).order_by("-created_at")
+            # Finished bookings are moved to the archive, older history is served by BookingHistoryView
+            bookings = Booking.objects.filter(user=request.user).order_by("-created_at")
+            paginated_bookings = paginator.paginate_queryset(bookings, request)
+            results = BookingGetSerializer(paginated_bookings, many=True).data
 
-        paginator = PageNumberPagination()
-        paginator.page_size = 10
-        paginated_bookings = paginator.paginate_queryset(bookings, request)
-        serializer = BookingGetSerializer(paginated_bookings, many=True)
         paginated_data = {
             "count": paginator.page.paginator.count,
             "next": paginator.get_next_link(),
             "previous": paginator.get_previous_link(),
-            "results": serializer.data
+            "results": results
         }
         return success_response(
             message="Booking list retrieved successfully",
@@ -150,12 +161,15 @@ class BookingRetrieveAPIView(APIView):
         tags=["Booking"]
     )
     def get(self, request, booking_id):
-        if request.user.role == "admin":
-            booking = get_object_or_404(Booking, id=booking_id)
-        else:
-            booking = get_object_or_404(Booking, id=booking_id, user=request.user)
+        lookup = {"id": booking_id}
+        if request.user.role != "admin":
+            lookup["user"] = request.user
 
-        serializer = BookingGetSerializer(booking)
+        booking = Booking.objects.filter(**lookup).first()
+        if booking:
+            serializer = BookingGetSerializer(booking)
+        else:
+            serializer = ArchivedBookingGetSerializer(get_object_or_404(ArchivedBooking, **lookup))
         return success_response(
             message="Booking fetched successfully",
             data=serializer.data
@@ -164,6 +178,75 @@ class BookingRetrieveAPIView(APIView):
 
 
 
+class BookingHistoryPagination(CursorPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 10
+
+
+
+class BookingHistoryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Get booking history",
+        operation_description=(
+            "Full booking history of the logged-in user, newest first, with cursor pagination.\n\n"
+            "Active bookings are returned first. When they are exhausted the `next` link switches to "
+            "`source=archive` and continues with archived (completed or rejected) bookings."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'source',
+                openapi.IN_QUERY,
+                description="Which table to read (active/archive), defaults to active",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Pagination cursor taken from the next/previous link",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+        ],
+        responses={200: BookingGetSerializer(many=True)},
+        tags=["Booking"]
+    )
+    @replica_reads
+    def get(self, request):
+        source = request.query_params.get("source", "active")
+        paginator = BookingHistoryPagination()
+
+        if source == "archive":
+            bookings = ArchivedBooking.objects.filter(user=request.user).select_related("user__profile", "truck")
+            page = paginator.paginate_queryset(bookings, request)
+            serializer = ArchivedBookingGetSerializer(page, many=True)
+            next_link = paginator.get_next_link()
+        else:
+            bookings = Booking.objects.filter(user=request.user).select_related("user__profile", "truck").prefetch_related("payments")
+            page = paginator.paginate_queryset(bookings, request)
+            serializer = BookingGetSerializer(page, many=True)
+            next_link = paginator.get_next_link()
+
+            # The archive is only read once the active bookings are exhausted
+            if next_link is None and ArchivedBooking.objects.filter(user=request.user).exists():
+                url = remove_query_param(request.build_absolute_uri(), paginator.cursor_query_param)
+                next_link = replace_query_param(url, "source", "archive")
+
+        return success_response(
+            message="Booking history retrieved successfully",
+            data={
+                "source": "archive" if source == "archive" else "active",
+                "next": next_link,
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data
+            }
+        )
+
+
+
+
 class BookingAdminUpdateView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]  
@@ -369,3 +452,82 @@ class BookingEndRequestView(APIView):
             f"Booking #{booking.id} end request sent successfully.",
             data=response_serializer.data
         )
+
+
+
+class BookingExportView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Export bookings",
+        operation_description="Admin-only: stream all bookings, archived ones included, matching the booking list filters as CSV or NDJSON.",
+        manual_parameters=[
+            openapi.Parameter(
+                'export_type',
+                openapi.IN_QUERY,
+                description="Export format (csv/ndjson), defaults to csv",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter('date', openapi.IN_QUERY, description="Filter bookings by specific date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Bookings created on or after this date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Bookings created on or before this date (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+            openapi.Parameter('status', openapi.IN_QUERY, description="Filter by booking status", type=openapi.TYPE_STRING),
+            openapi.Parameter('truck_payment_status', openapi.IN_QUERY, description="Filter by truck payment status (true/false)", type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('mover_payment_status', openapi.IN_QUERY, description="Filter by mover payment status (true/false)", type=openapi.TYPE_BOOLEAN),
+        ],
+        responses={200: "Streamed CSV or NDJSON file"},
+        tags=["Booking"]
+    )
+    @replica_reads
+    def get(self, request):
+        export_type = request.query_params.get('export_type', 'csv')
+        if export_type not in ['csv', 'ndjson']:
+            raise ValidationError({"export_type": "Export type must be either 'csv' or 'ndjson'."})
+
+        # The body is streamed after this method returns, so the alias is bound to the queryset here
+        alias = read_db_alias()
+        q_filter = booking_filter_q(request.query_params)
+        bookings = (
+            Booking.objects.using(alias).filter(q_filter).values_list(*EXPORT_FIELDS)
+            .union(ArchivedBooking.objects.using(alias).filter(q_filter).values_list(*EXPORT_FIELDS), all=True)
+            .order_by("-created_at")
+        )
+        filename = f"bookings-{timezone.now():%Y%m%d%H%M%S}.{export_type}"
+
+        if export_type == 'csv':
+            response = StreamingHttpResponse(stream_csv(bookings), content_type="text/csv")
+        else:
+            response = StreamingHttpResponse(stream_ndjson(bookings), content_type="application/x-ndjson")
+
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+
+class BookingBulkActionView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_summary="Bulk booking action",
+        operation_description="Admin-only: approve, reject or assign a truck to many bookings in one transaction. All bookings are validated first; if any is missing or in the wrong status nothing is changed.",
+        request_body=BookingBulkActionSerializer,
+        responses={
+            200: "Bookings updated successfully",
+            400: "Validation Error"
+        },
+        tags=["Booking"]
+    )
+    def post(self, request):
+        serializer = BookingBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save()
+
+        return success_response(
+            message=f"{len(bookings)} bookings updated successfully",
+            data={
+                "action": serializer.validated_data["action"],
+                "bookings": [{"id": booking.id, "status": booking.status, "truck": booking.truck_id} for booking in bookings],
+            },
+            status_code=status.HTTP_200_OK
+        )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, EmailOutbox
 
 # Register your models here.
 
@@ -9,3 +9,11 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('read', 'created_at')
     search_fields = ('user__username', 'title', 'body')
     ordering = ('-created_at',)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'send_after', 'sent_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'dedupe_key')
+    ordering = ('-created_at',)
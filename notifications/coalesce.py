@@ -0,0 +1,111 @@
+import json
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from Trueliftmovers.redis_client import get_redis
+from Trueliftmovers.dispatch import defer_apply
+
+
+
+PENDING_KEY = "notifications:coalesce:pending"
+COUNTS_KEY = "notifications:coalesce:counts"
+DUE_KEY = "notifications:coalesce:due"
+FLUSH_SCHEDULED_KEY = "notifications:coalesce:flush-scheduled"
+
+# The first record of a key opens its window and is sent right away, the records that follow
+# are held until the window closes and only the latest of them is sent
+ADD = """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[3], ARGV[1]) == 1 then
+    return 1
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HINCRBY', KEYS[3], ARGV[1], 1)
+return 0
+"""
+
+# Closes every window that is due, returns how many it closed followed by the latest held
+# record of each window that has one and how many records it merged
+POP_DUE = """
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local result = {#keys}
+for _, key in ipairs(keys) do
+    local record = redis.call('HGET', KEYS[2], key)
+    if record then
+        table.insert(result, record)
+        table.insert(result, redis.call('HGET', KEYS[3], key))
+    end
+    redis.call('HDEL', KEYS[2], key)
+    redis.call('HDEL', KEYS[3], key)
+    redis.call('ZREM', KEYS[1], key)
+end
+return result
+"""
+
+
+
+def window_key(record):
+    # One window per booking, recipient and audience
+    return "{}:{}:{}:{}".format(
+        record["data"]["booking_id"],
+        record["user_id"],
+        int(bool(record.get("broadcast_user"))),
+        int(bool(record.get("broadcast_admin"))),
+    )
+
+
+
+def coalescable(record):
+    return (
+        settings.NOTIFICATION_COALESCE_SECONDS > 0
+        and record.get("notification_type") in settings.NOTIFICATION_COALESCE_TYPES
+        and bool((record.get("data") or {}).get("booking_id"))
+    )
+
+
+
+def add(records):
+    # Returns the records that open a window, to be sent now. The window closes a fixed time
+    # after its first record so a steady stream of events still goes out
+    due = time.time() + settings.NOTIFICATION_COALESCE_SECONDS
+    pipeline = get_redis().pipeline(transaction=True)
+    for record in records:
+        pipeline.eval(ADD, 3, DUE_KEY, PENDING_KEY, COUNTS_KEY, window_key(record), json.dumps(record, cls=DjangoJSONEncoder), due)
+    opened = pipeline.execute()
+    schedule_flush(settings.NOTIFICATION_COALESCE_SECONDS)
+    return [record for record, first in zip(records, opened) if first]
+
+
+
+def schedule_flush(countdown):
+    from .tasks import flush_coalesced_notifications
+
+    if get_redis().set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=int(countdown) + settings.NOTIFICATION_FLUSH_LOCK_SECONDS):
+        defer_apply(flush_coalesced_notifications, countdown=countdown, on_failure=_unschedule_flush)
+
+
+
+def _unschedule_flush(error):
+    # The flush never reached the broker, the next window added schedules another one
+    get_redis().delete(FLUSH_SCHEDULED_KEY)
+
+
+
+def pop_due(size):
+    # (windows closed, merged records to send)
+    values = get_redis().eval(POP_DUE, 3, DUE_KEY, PENDING_KEY, COUNTS_KEY, time.time(), size)
+    records = []
+    for raw, count in zip(values[1::2], values[2::2]):
+        record = json.loads(raw)
+        record["data"] = {**(record.get("data") or {}), "coalesced_count": int(count)}
+        records.append(record)
+    return values[0], records
+
+
+
+def release_flush():
+    # Windows added while this flush held the marker are picked up by the next one
+    client = get_redis()
+    client.delete(FLUSH_SCHEDULED_KEY)
+    earliest = client.zrange(DUE_KEY, 0, 0, withscores=True)
+    if earliest:
+        schedule_flush(max(earliest[0][1] - time.time(), 0))
@@ -0,0 +1,15 @@
+
+NOTIFICATION_TYPE_CHOICES = (
+    ('general', 'General'),
+    ('booking', 'Booking'),
+    ('payment', 'Payment'),
+    ('support', 'Support'),
+)
+
+
+EMAIL_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('sending', 'Sending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:39
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0003_alter_notification_user_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['admin_notification', '-created_at', '-id'], name='notificatio_admin_n_d39bd2_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['user', 'user_notification', '-created_at', '-id'], name='notificatio_user_id_c0b5b8_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:41
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0004_notification_notificatio_admin_n_d39bd2_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False), ('user_notification', True)), fields=['user'], name='notification_unread_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('admin_notification', True), ('read', False)), fields=['id'], name='notification_unread_admin_idx'),
+        ),
+    ]
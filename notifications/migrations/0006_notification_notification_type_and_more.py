@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:45
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0005_notification_notification_unread_user_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('general', 'General'), ('booking', 'Booking'), ('payment', 'Payment'), ('support', 'Support')], default='general', max_length=20),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', True)), fields=['notification_type', 'created_at'], name='notification_purge_idx'),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import Q
 from accounts.models import User
+from django.utils import timezone
+from .constants import NOTIFICATION_TYPE_CHOICES, EMAIL_STATUS_CHOICES
 
 # Create your models here.
 
@@ -11,9 +14,46 @@ class Notification(models.Model):
     read = models.BooleanField(default=False)
     admin_notification = models.BooleanField(default=False,blank=True, null=True)
     user_notification = models.BooleanField(default=False,blank=True, null=True)
+    notification_type = models.CharField(max_length=20,choices=NOTIFICATION_TYPE_CHOICES,default='general')
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["admin_notification", "-created_at", "-id"]),
+            models.Index(fields=["user", "user_notification", "-created_at", "-id"]),
+            models.Index(fields=["user"], condition=Q(read=False, user_notification=True), name="notification_unread_user_idx"),
+            models.Index(fields=["id"], condition=Q(read=False, admin_notification=True), name="notification_unread_admin_idx"),
+            models.Index(fields=["notification_type", "created_at"], condition=Q(read=True), name="notification_purge_idx"),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username}: {self.title}"
+
+
+
+class EmailOutbox(models.Model):
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, null=True)
+    recipients = models.JSONField(default=list)
+    # Producers pass a key per logical email so a retried request does not send it twice
+    dedupe_key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+
+    status = models.CharField(max_length=20, choices=EMAIL_STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    send_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "send_after"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
@@ -0,0 +1,163 @@
+import logging
+import smtplib
+import time
+from datetime import timedelta
+import redis
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from Trueliftmovers import metrics
+from Trueliftmovers.redis_client import get_redis
+from Trueliftmovers.dispatch import defer_apply
+from .models import EmailOutbox
+
+
+
+logger = logging.getLogger(__name__)
+
+SENDER_LOCK_KEY = "notifications:email-outbox:sending"
+
+
+
+def queue_email(subject, body, recipients, from_email=None, dedupe_key=None, send_after=None):
+    # Written in the caller's transaction, the sender only runs once it has committed
+    values = {
+        "subject": subject,
+        "body": body,
+        "recipients": list(recipients),
+        "from_email": from_email,
+        "send_after": send_after or timezone.now(),
+    }
+    if dedupe_key:
+        email, created = EmailOutbox.objects.get_or_create(dedupe_key=dedupe_key, defaults=values)
+    else:
+        email, created = EmailOutbox.objects.create(**values), True
+
+    if created:
+        from .tasks import send_outbox_emails
+
+        # One sender run per request however many emails it queued
+        defer_apply(send_outbox_emails, once=True)
+    return email
+
+
+
+def acquire_sender():
+    # One sender at a time keeps the rate limit global, without Redis the row locks still
+    # keep concurrent senders apart
+    try:
+        return bool(get_redis().set(SENDER_LOCK_KEY, 1, nx=True, ex=settings.EMAIL_OUTBOX_LOCK_SECONDS))
+    except redis.RedisError:
+        logger.warning("Email outbox lock unavailable, sending without it")
+        return True
+
+
+
+def release_sender():
+    try:
+        get_redis().delete(SENDER_LOCK_KEY)
+    except redis.RedisError:
+        pass
+
+
+
+def claim_batch(size):
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.EMAIL_OUTBOX_LOCK_SECONDS)
+    with transaction.atomic():
+        # Rows left in sending by a worker that died are picked up again
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(Q(status="pending", send_after__lte=now) | Q(status="sending", updated_at__lt=stale))
+            .order_by("send_after", "id")[:size]
+        )
+        EmailOutbox.objects.filter(id__in=[email.id for email in emails]).update(status="sending", updated_at=now)
+    return emails
+
+
+
+def has_due_emails():
+    return EmailOutbox.objects.filter(status="pending", send_after__lte=timezone.now()).exists()
+
+
+
+def is_permanent(error):
+    # 5xx replies will not change on a retry, bad credentials are a setup problem and are retried
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS or is_permanent(error):
+        email.status = "failed"
+    else:
+        email.status = "pending"
+        email.send_after = timezone.now() + timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (email.attempts - 1))
+    email.save(update_fields=["attempts", "last_error", "status", "send_after", "updated_at"])
+    metrics.incr("email.failed")
+
+
+
+def send_batch(emails, connection):
+    # Every message goes over the same open SMTP connection, paced to the configured rate
+    interval = 1 / settings.EMAIL_OUTBOX_RATE_PER_SECOND if settings.EMAIL_OUTBOX_RATE_PER_SECOND else 0
+    next_send = time.monotonic()
+    sent = 0
+
+    for email in emails:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_send = max(next_send, time.monotonic()) + interval
+
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=email.recipients,
+            connection=connection,
+        )
+        started = time.perf_counter()
+        try:
+            # No-op while the connection is open, reconnects after a failure
+            connection.open()
+            connection.send_messages([message])
+        except (smtplib.SMTPException, OSError) as error:
+            logger.warning("Could not send outbox email %s: %s", email.id, error)
+            _record_failure(email, error)
+            # A dropped connection is reopened for the rest of the batch, after a rejection
+            # the server is still there and the connection is reused
+            if not isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                connection.close()
+            continue
+
+        EmailOutbox.objects.filter(id=email.id).update(status="sent", sent_at=timezone.now(), last_error=None, updated_at=timezone.now())
+        metrics.observe("email.send", time.perf_counter() - started)
+        sent += 1
+    return sent
+
+
+
+def drain(max_batches=None, batch_size=None):
+    max_batches = max_batches or settings.EMAIL_OUTBOX_MAX_BATCHES
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    sent = 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        for _ in range(max_batches):
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            sent += send_batch(emails, connection)
+    finally:
+        connection.close()
+    return sent
@@ -0,0 +1,138 @@
+import json
+import logging
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from Trueliftmovers.redis_client import get_redis
+from Trueliftmovers.dispatch import defer, defer_apply
+from . import coalesce
+
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "notifications:queue"
+PROCESSING_KEY = "notifications:queue:processing"
+FLUSH_SCHEDULED_KEY = "notifications:flush-scheduled"
+
+# Moves a batch from the head of the queue to the processing list, where it stays until
+# the flush has delivered it
+CLAIM_BATCH = """
+local records = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #records > 0 then
+    redis.call('LTRIM', KEYS[1], #records, -1)
+    redis.call('RPUSH', KEYS[2], unpack(records))
+end
+return records
+"""
+
+# Puts an undelivered batch back at the head of the queue in its original order
+REQUEUE_BATCH = """
+local records = redis.call('LRANGE', KEYS[2], 0, -1)
+for index = #records, 1, -1 do
+    redis.call('LPUSH', KEYS[1], records[index])
+end
+redis.call('DEL', KEYS[2])
+return #records
+"""
+
+
+
+def notification_record(user_id, title, body, data=None, broadcast_admin=False, broadcast_user=False, notification_type="general"):
+    return {
+        "user_id": user_id,
+        "title": title,
+        "body": body,
+        "data": data or {},
+        "broadcast_admin": broadcast_admin,
+        "broadcast_user": broadcast_user,
+        "notification_type": notification_type,
+    }
+
+
+
+def schedule_flush(countdown=None):
+    from .tasks import flush_notification_queue
+
+    # One pending flush at a time, records pushed meanwhile ride along with it
+    if countdown is None:
+        countdown = settings.NOTIFICATION_FLUSH_DELAY
+    if get_redis().set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=int(countdown) + settings.NOTIFICATION_FLUSH_LOCK_SECONDS):
+        defer_apply(flush_notification_queue, countdown=countdown, on_failure=_unschedule_flush)
+
+
+
+def _unschedule_flush(error):
+    # The flush never reached the broker, the next push schedules another one
+    try:
+        get_redis().delete(FLUSH_SCHEDULED_KEY)
+    except redis.RedisError:
+        logger.warning("Could not clear the notification flush marker")
+
+
+
+def _send_directly(records):
+    from .tasks import create_notifications_task
+
+    logger.warning("Notification queue unavailable, sending %s notifications directly", len(records))
+    defer(create_notifications_task, records)
+
+
+
+def _push(records):
+    # Bursts of booking events are merged in their coalescing window, everything else is queued
+    windowed = [record for record in records if coalesce.coalescable(record)]
+    queued = [record for record in records if not coalesce.coalescable(record)]
+
+    if windowed:
+        try:
+            # Events opening a window are queued now, the ones after them wait in the window
+            queued.extend(coalesce.add(windowed))
+        except redis.RedisError:
+            _send_directly(windowed)
+
+    if queued:
+        try:
+            get_redis().rpush(QUEUE_KEY, *[json.dumps(record, cls=DjangoJSONEncoder) for record in queued])
+            schedule_flush()
+        except redis.RedisError:
+            _send_directly(queued)
+
+
+
+def enqueue_notifications(records):
+    # Pushed after commit so rolled back writes never notify anyone
+    if records:
+        transaction.on_commit(lambda: _push(records))
+
+
+
+def enqueue_notification(user_id, title, body, data=None, broadcast_admin=False, broadcast_user=False, notification_type="general"):
+    enqueue_notifications([notification_record(user_id, title, body, data, broadcast_admin, broadcast_user, notification_type)])
+
+
+
+def pop_batch(size):
+    records = get_redis().eval(CLAIM_BATCH, 2, QUEUE_KEY, PROCESSING_KEY, size)
+    return [json.loads(record) for record in records]
+
+
+
+def ack_batch():
+    get_redis().delete(PROCESSING_KEY)
+
+
+
+def requeue_batch():
+    return get_redis().eval(REQUEUE_BATCH, 2, QUEUE_KEY, PROCESSING_KEY)
+
+
+
+def release_flush(countdown=None):
+    # A producer may have pushed after the last pop while the flush was still marked
+    # as scheduled, so look at the queue again once the marker is gone
+    client = get_redis()
+    client.delete(FLUSH_SCHEDULED_KEY)
+    if client.llen(QUEUE_KEY):
+        schedule_flush(countdown)
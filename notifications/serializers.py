@@ -20,3 +20,15 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id','user','title','body','data','read','created_at']
+
+
+
+class NotificationSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id','title','body','data','read','created_at']
+
+
+
+class NotificationReadAllSerializer(serializers.Serializer):
+    up_to_id = serializers.IntegerField(required=False, min_value=1)
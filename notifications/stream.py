@@ -0,0 +1,147 @@
+import json
+import logging
+import re
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from Trueliftmovers.redis_client import get_redis, get_async_redis
+
+
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "notifications:stream:"
+ADMIN_GROUP = "admin_notifications"
+USER_GROUP_PREFIX = "user_"
+
+# Counters are re-sent on connect, replaying them would only show stale values
+UNSTREAMED_EVENTS = {"unread_count"}
+
+STREAM_ID_RE = re.compile(r"^\d+(-\d+)?$")
+
+# Appends an event and keeps the stream's history in a hash next to it: origin is the first id
+# the hash has seen and floor the highest id dropped since, by trimming or by the stream
+# expiring. The hash outlives the stream so an expired stream's last id becomes the new floor.
+RECORD_EVENT = """
+local id = redis.call('XADD', KEYS[1], '*', 'payload', ARGV[1])
+if redis.call('XLEN', KEYS[1]) == 1 then
+    local last = redis.call('HGET', KEYS[2], 'last')
+    if last then
+        redis.call('HSET', KEYS[2], 'floor', last)
+    end
+end
+redis.call('HSETNX', KEYS[2], 'origin', id)
+
+local excess = redis.call('XLEN', KEYS[1]) - tonumber(ARGV[2])
+if excess > 0 then
+    local trimmed = redis.call('XRANGE', KEYS[1], '-', '+', 'COUNT', excess)
+    redis.call('XTRIM', KEYS[1], 'MAXLEN', ARGV[2])
+    redis.call('HSET', KEYS[2], 'floor', trimmed[#trimmed][1])
+end
+
+redis.call('HSET', KEYS[2], 'last', id)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return id
+"""
+
+
+
+def stream_key(group):
+    if group == ADMIN_GROUP:
+        return f"{STREAM_PREFIX}admin"
+    return f"{STREAM_PREFIX}user:{group[len(USER_GROUP_PREFIX):]}"
+
+
+
+def history_key(key):
+    return f"{key}:history"
+
+
+
+def user_stream_keys(user):
+    keys = [stream_key(f"{USER_GROUP_PREFIX}{user.id}")]
+    if getattr(user, "role", None) == "admin":
+        keys.append(stream_key(ADMIN_GROUP))
+    return keys
+
+
+
+def parse_stream_id(stream_id):
+    milliseconds, _, sequence = stream_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+
+def record(messages):
+    # Appends each event to its group's bounded stream and returns the messages with the
+    # stream id stamped on a copy of the payload, so clients can resume from it
+    streamed = [
+        index for index, (group, payload) in enumerate(messages)
+        if payload["data"].get("event_type") not in UNSTREAMED_EVENTS
+        and (group == ADMIN_GROUP or group.startswith(USER_GROUP_PREFIX))
+    ]
+    if not streamed:
+        return messages
+
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for index in streamed:
+            group, payload = messages[index]
+            key = stream_key(group)
+            pipeline.eval(
+                RECORD_EVENT, 2, key, history_key(key),
+                json.dumps(payload["data"], cls=DjangoJSONEncoder),
+                settings.NOTIFICATION_STREAM_MAXLEN,
+                settings.NOTIFICATION_STREAM_TTL,
+                2 * settings.NOTIFICATION_STREAM_TTL,
+            )
+        results = pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not record %s notification events in their streams", len(streamed))
+        return messages
+
+    messages = list(messages)
+    for index, stream_id in zip(streamed, results):
+        group, payload = messages[index]
+        messages[index] = (group, {**payload, "data": {**payload["data"], "stream_id": stream_id}})
+    return messages
+
+
+
+def continuous(history, last):
+    # Nothing after last was dropped if the recorded history reaches back to it
+    origin, floor = history
+    if origin is None or parse_stream_id(origin) > last:
+        return False
+    return floor is None or parse_stream_id(floor) <= last
+
+
+
+async def replay(user, last_id):
+    # Events after last_id from the user's streams, oldest first, and whether some of the
+    # events after the client's position may have been trimmed or expired away
+    if not last_id or not STREAM_ID_RE.match(last_id):
+        return [], False
+
+    client = get_async_redis()
+    last = parse_stream_id(last_id)
+    events = []
+    truncated = False
+
+    for key in user_stream_keys(user):
+        pipeline = client.pipeline(transaction=False)
+        pipeline.hmget(history_key(key), "origin", "floor")
+        pipeline.xrange(key, count=1)
+        pipeline.xrange(key, min=f"({last_id}", max="+")
+        history, first, entries = await pipeline.execute()
+
+        if first and parse_stream_id(first[0][0]) > last and not continuous(history, last):
+            truncated = True
+        events.extend(
+            (parse_stream_id(stream_id), {**json.loads(fields["payload"]), "stream_id": stream_id})
+            for stream_id, fields in entries
+        )
+
+    events.sort(key=lambda event: event[0])
+    return [event for _, event in events], truncated
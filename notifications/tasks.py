@@ -1,30 +1,171 @@
+import time
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
 from notifications.models import Notification
 from accounts.models import User
-from .utils import send_realtime_notification
+from Trueliftmovers import metrics
+from .utils import notification_messages, send_group_messages
+from . import coalesce, outbox, unread
+from .queue import notification_record, pop_batch, ack_batch, requeue_batch, release_flush
+
+
+def deliver_notifications(notifications):
+    # One existence query for all recipients, one INSERT, one channel-layer bridge
+    user_ids = {item["user_id"] for item in notifications}
+    existing_user_ids = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    notifications = [item for item in notifications if item["user_id"] in existing_user_ids]
+
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=item["user_id"],
+            title=item["title"],
+            body=item["body"],
+            data=item.get("data") or {},
+            admin_notification=item.get("broadcast_admin", False),
+            user_notification=item.get("broadcast_user", False),
+            notification_type=item.get("notification_type", "general")
+        )
+        for item in notifications
+    ])
+
+    counts = unread.adjust(unread.created_deltas(notifications))
+    send_group_messages(notification_messages(notifications) + unread.unread_messages(counts))
+    return notifications
+
 
 @shared_task
 def create_notification_task(user_id, title, body, data=None,broadcast_admin=False,broadcast_user=False):
+    # Kept for messages already queued, producers use notifications.queue.enqueue_notification
+    delivered = deliver_notifications([notification_record(user_id, title, body, data, broadcast_admin, broadcast_user)])
+    if not delivered:
+        return "User not found"
+    return f"Notification created and pushed for user {user_id}"
+
+
+
+@shared_task
+def create_notifications_task(notifications):
+    notifications = deliver_notifications(notifications)
+    return f"{len(notifications)} notifications created and pushed"
+
+
+
+@shared_task
+def flush_notification_queue():
+    delivered = 0
+    retry = None
+    try:
+        # A batch left behind by a flush that died while delivering it goes out first
+        requeue_batch()
+        for _ in range(settings.NOTIFICATION_FLUSH_MAX_BATCHES):
+            batch = pop_batch(settings.NOTIFICATION_BATCH_SIZE)
+            if not batch:
+                break
+
+            started = time.perf_counter()
+            try:
+                delivered += len(deliver_notifications(batch))
+            except Exception:
+                # Kept in the queue and retried later instead of being lost
+                requeue_batch()
+                retry = settings.NOTIFICATION_FLUSH_RETRY_SECONDS
+                raise
+            ack_batch()
+            metrics.observe("notifications.flush", time.perf_counter() - started, count=len(batch))
+    finally:
+        release_flush(retry)
+
+    return f"{delivered} notifications created and pushed"
+
+
+
+@shared_task
+def flush_coalesced_notifications():
+    delivered = 0
     try:
-        user = User.objects.get(id=user_id)
-        
-        notification = Notification.objects.create(
-            user=user,
-            title=title,
-            body=body,
-            data=data or {},
-            admin_notification=broadcast_admin,
-            user_notification=broadcast_user
+        for _ in range(settings.NOTIFICATION_FLUSH_MAX_BATCHES):
+            closed, batch = coalesce.pop_due(settings.NOTIFICATION_BATCH_SIZE)
+            if not closed:
+                break
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            delivered += len(deliver_notifications(batch))
+            metrics.observe("notifications.flush", time.perf_counter() - started, count=len(batch))
+            metrics.incr("notifications.coalesced", sum(record["data"]["coalesced_count"] - 1 for record in batch))
+    finally:
+        coalesce.release_flush()
+
+    return f"{delivered} coalesced notifications created and pushed"
+
+
+
+@shared_task
+def reconcile_unread_counters():
+    return f"{unread.reconcile()} unread counters reconciled"
+
+
+
+def record_table_size():
+    connection = connections["default"]
+    if connection.vendor != "postgresql":
+        return
+
+    # Planner estimate, an exact COUNT(*) would scan the whole table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint, pg_total_relation_size(oid) FROM pg_class WHERE oid = %s::regclass",
+            [Notification._meta.db_table],
         )
-        if broadcast_user:
-            user_id = user_id
-        else:
-            user_id=None
+        rows, size = cursor.fetchone()
+    metrics.gauge("notifications.table_rows", max(rows, 0))
+    metrics.gauge("notifications.table_bytes", size)
 
-        send_realtime_notification(user_id, title, body, data,event_type="notification",broadcast_admin=broadcast_admin)
 
-        return f"Notification created and pushed for user {user_id}"
 
-    except User.DoesNotExist:
-        return "User not found"
+@shared_task
+def purge_old_notifications():
+    # Read notifications past their type's retention are deleted in small batches,
+    # each its own short statement, so no long locks are held on the table
+    now = timezone.now()
+    purged = 0
+
+    for notification_type, days in settings.NOTIFICATION_RETENTION_DAYS.items():
+        cutoff = now - timedelta(days=days)
+        for _ in range(settings.NOTIFICATION_PURGE_MAX_BATCHES):
+            started = time.perf_counter()
+            ids = list(
+                Notification.objects.filter(notification_type=notification_type, read=True, created_at__lt=cutoff)
+                .order_by("created_at")
+                .values_list("id", flat=True)[:settings.NOTIFICATION_PURGE_BATCH_SIZE]
+            )
+            if not ids:
+                break
+
+            deleted, _ = Notification.objects.filter(id__in=ids, read=True).delete()
+            purged += deleted
+            metrics.observe("notifications.purge", time.perf_counter() - started, count=deleted)
+
+    record_table_size()
+    return f"{purged} notifications purged"
+
+
+
+@shared_task
+def send_outbox_emails():
+    if not outbox.acquire_sender():
+        return "Email outbox is already being sent"
+
+    try:
+        sent = outbox.drain()
+    finally:
+        outbox.release_sender()
 
+    # Emails queued while this sender held the lock
+    if outbox.has_due_emails():
+        send_outbox_emails.apply_async(countdown=1)
+    return f"{sent} emails sent"
@@ -1,3 +1,327 @@
-from django.test import TestCase
+import json
+import smtplib
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.db import DatabaseError
+from django.core.mail.backends import locmem
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from Trueliftmovers.tests import use_fake_redis
+from . import coalesce, outbox, queue, stream
+from .models import Notification, EmailOutbox
+from .tasks import flush_notification_queue, flush_coalesced_notifications
+from .unread import mark_notifications_read
+from .utils import notification_payload
 
 # Create your tests here.
+
+
+
+class ReadableNotificationsTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+        # Admin inbox rows are stored against the customer the event was about
+        self.admin_row = Notification.objects.create(user=self.customer, title="New booking", body="x", admin_notification=True)
+        self.own_row = Notification.objects.create(user=self.customer, title="Booking confirmed", body="x", user_notification=True)
+
+    def test_read_all_leaves_the_admin_inbox_alone(self):
+        response = self.client.post(reverse("notification-read-all"), {}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["updated"], 1)
+        self.admin_row.refresh_from_db()
+        self.own_row.refresh_from_db()
+        self.assertFalse(self.admin_row.read)
+        self.assertTrue(self.own_row.read)
+
+    def test_admin_inbox_row_cannot_be_marked_read_by_its_user(self):
+        response = self.client.patch(reverse("notification-read", args=[self.admin_row.id]))
+
+        self.assertEqual(response.status_code, 404)
+        self.admin_row.refresh_from_db()
+        self.assertFalse(self.admin_row.read)
+
+    def test_websocket_acks_leave_the_admin_inbox_alone(self):
+        # The consumer acks through mark_notifications_read with explicit ids
+        updated = mark_notifications_read(self.customer, ids=[self.admin_row.id, self.own_row.id])
+
+        self.assertEqual(updated, 1)
+        self.admin_row.refresh_from_db()
+        self.assertFalse(self.admin_row.read)
+
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_RATE_PER_SECOND=0,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_RETRY_SECONDS=60,
+)
+class EmailOutboxTests(TestCase):
+    def queue(self, count):
+        return [outbox.queue_email(f"Subject {i}", "Body", [f"user{i}@example.com"]) for i in range(count)]
+
+    def test_a_batch_is_sent_over_one_connection(self):
+        self.queue(3)
+
+        send_messages = locmem.EmailBackend.send_messages
+        with mock.patch.object(locmem.EmailBackend, "send_messages", autospec=True, side_effect=send_messages) as sends:
+            sent = outbox.drain()
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len({id(call.args[0]) for call in sends.call_args_list}), 1)
+        self.assertEqual(EmailOutbox.objects.filter(status="sent").count(), 3)
+
+    def test_dedupe_key_queues_an_email_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = outbox.queue_email("Welcome", "Body", ["user@example.com"], dedupe_key="welcome:1")
+            second = outbox.queue_email("Welcome", "Body", ["user@example.com"], dedupe_key="welcome:1")
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_failures_back_off_exponentially(self):
+        email, = self.queue(1)
+        error = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=error):
+            started = timezone.now()
+            outbox.drain()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("pending", 1))
+            self.assertGreaterEqual(email.send_after, started + timedelta(seconds=60))
+
+            EmailOutbox.objects.filter(id=email.id).update(send_after=timezone.now())
+            started = timezone.now()
+            outbox.drain()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("pending", 2))
+            self.assertGreaterEqual(email.send_after, started + timedelta(seconds=120))
+            self.assertLess(email.send_after, started + timedelta(seconds=180))
+
+    def test_email_fails_after_the_last_attempt(self):
+        email, = self.queue(1)
+        error = smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=error):
+            for _ in range(3):
+                EmailOutbox.objects.filter(id=email.id).update(send_after=timezone.now())
+                outbox.drain()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("failed", 3))
+        EmailOutbox.objects.filter(id=email.id).update(send_after=timezone.now())
+        self.assertEqual(outbox.drain(), 0)
+
+    def test_permanent_rejection_fails_without_retrying(self):
+        email, = self.queue(1)
+        error = smtplib.SMTPRecipientsRefused({"user0@example.com": (550, b"No such user")})
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=error):
+            outbox.drain()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("failed", 1))
+
+    def test_temporary_rejection_is_retried(self):
+        email, = self.queue(1)
+        error = smtplib.SMTPRecipientsRefused({"user0@example.com": (450, b"Mailbox busy")})
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=error):
+            outbox.drain()
+
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+
+
+
+@mock.patch("Trueliftmovers.dispatch.current_app")
+class FlushSchedulingTests(TestCase):
+    def assert_marker_cleared(self, module, schedule):
+        with mock.patch.object(module, "get_redis") as get_redis:
+            get_redis.return_value.set.return_value = True
+            with self.assertRaises(ConnectionError):
+                with self.captureOnCommitCallbacks(execute=True):
+                    schedule()
+
+        get_redis.return_value.delete.assert_called_once_with(module.FLUSH_SCHEDULED_KEY)
+
+    def test_queue_flush_marker_is_cleared_when_dispatch_fails(self, current_app):
+        current_app.producer_or_acquire.side_effect = ConnectionError("Broker unavailable")
+        self.assert_marker_cleared(queue, queue.schedule_flush)
+
+    def test_coalesce_flush_marker_is_cleared_when_dispatch_fails(self, current_app):
+        current_app.producer_or_acquire.side_effect = ConnectionError("Broker unavailable")
+        self.assert_marker_cleared(coalesce, lambda: coalesce.schedule_flush(5))
+
+
+
+@mock.patch("notifications.queue.defer_apply")
+class NotificationQueueFlushTests(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+
+    def push(self, *titles):
+        records = [queue.notification_record(self.customer.id, title, "Body", broadcast_user=True) for title in titles]
+        self.redis.rpush(queue.QUEUE_KEY, *[json.dumps(record) for record in records])
+
+    def queued_titles(self):
+        return [json.loads(record)["title"] for record in self.redis.lrange(queue.QUEUE_KEY, 0, -1)]
+
+    def test_failed_delivery_keeps_the_batch_queued(self, defer_apply):
+        self.push("first", "second")
+
+        with mock.patch("notifications.tasks.deliver_notifications", side_effect=DatabaseError("Database unavailable")):
+            with self.assertRaises(DatabaseError):
+                flush_notification_queue()
+
+        self.assertEqual(self.queued_titles(), ["first", "second"])
+        self.assertFalse(self.redis.exists(queue.PROCESSING_KEY))
+        self.assertEqual(defer_apply.call_args.kwargs["countdown"], settings.NOTIFICATION_FLUSH_RETRY_SECONDS)
+
+        flush_notification_queue()
+
+        self.assertEqual(self.queued_titles(), [])
+        self.assertEqual(sorted(Notification.objects.values_list("title", flat=True)), ["first", "second"])
+
+    def test_batch_left_by_a_dead_flush_is_delivered_first(self, defer_apply):
+        self.push("stranded")
+        queue.pop_batch(10)
+        self.push("later")
+
+        flush_notification_queue()
+
+        self.assertEqual(list(Notification.objects.order_by("id").values_list("title", flat=True)), ["stranded", "later"])
+        self.assertFalse(self.redis.exists(queue.PROCESSING_KEY))
+
+
+
+@mock.patch("notifications.queue.defer_apply")
+@mock.patch("notifications.coalesce.defer_apply")
+class CoalesceTests(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+
+    def event(self, title, booking_id=1):
+        return queue.notification_record(
+            self.customer.id, title, "Body", data={"booking_id": booking_id}, broadcast_user=True, notification_type="booking",
+        )
+
+    def queued_titles(self):
+        return [json.loads(record)["title"] for record in self.redis.lrange(queue.QUEUE_KEY, 0, -1)]
+
+    def close_windows(self):
+        self.redis.zadd(coalesce.DUE_KEY, {key: 0 for key in self.redis.zrange(coalesce.DUE_KEY, 0, -1)})
+        flush_coalesced_notifications()
+
+    def test_first_event_of_a_window_is_sent_right_away(self, coalesce_defer, queue_defer):
+        queue._push([self.event("Booking approved")])
+
+        self.assertEqual(self.queued_titles(), ["Booking approved"])
+        self.assertFalse(self.redis.exists(coalesce.PENDING_KEY))
+
+        self.close_windows()
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(self.redis.exists(coalesce.DUE_KEY))
+
+    def test_burst_is_merged_into_the_latest_event(self, coalesce_defer, queue_defer):
+        queue._push([self.event("Booking approved"), self.event("Truck assigned")])
+        queue._push([self.event("Booking paid"), self.event("Other booking", booking_id=2)])
+
+        self.assertEqual(self.queued_titles(), ["Booking approved", "Other booking"])
+
+        self.close_windows()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.title, "Booking paid")
+        self.assertEqual(notification.data["coalesced_count"], 2)
+        self.assertFalse(self.redis.exists(coalesce.DUE_KEY, coalesce.PENDING_KEY, coalesce.COUNTS_KEY))
+
+        queue._push([self.event("Booking started")])
+        self.assertEqual(self.queued_titles()[-1], "Booking started")
+
+    def test_windows_stay_open_until_due(self, coalesce_defer, queue_defer):
+        queue._push([self.event("Booking approved"), self.event("Truck assigned")])
+
+        flush_coalesced_notifications()
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertGreater(coalesce_defer.call_args.kwargs["countdown"], 0)
+        self.assertTrue(self.redis.hexists(coalesce.PENDING_KEY, coalesce.window_key(self.event("x"))))
+
+
+
+@override_settings(NOTIFICATION_STREAM_MAXLEN=3)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.redis = use_fake_redis(self)
+        self.user = User.objects.create_user(email="user@example.com", username="user", password="x")
+        self.admin = User.objects.create_user(email="admin@example.com", username="admin", password="x", role="admin")
+
+    def record(self, *titles, group=None):
+        group = group or f"user_{self.user.id}"
+        messages = stream.record([(group, notification_payload(title, "body")) for title in titles])
+        return [payload["data"]["stream_id"] for _, payload in messages]
+
+    def replay(self, user, last_id):
+        events, truncated = async_to_sync(stream.replay)(user, last_id)
+        return [event["title"] for event in events], truncated
+
+    def test_record_stamps_stream_ids_but_not_counters(self):
+        messages = stream.record([
+            (f"user_{self.user.id}", notification_payload("one", "body")),
+            (f"user_{self.user.id}", {"type": "send_notification", "data": {"event_type": "unread_count", "count": 1}}),
+        ])
+
+        self.assertIn("stream_id", messages[0][1]["data"])
+        self.assertNotIn("stream_id", messages[1][1]["data"])
+        self.assertEqual(self.redis.xlen(stream.stream_key(f"user_{self.user.id}")), 1)
+
+    def test_replay_returns_the_events_after_the_last_id(self):
+        ids = self.record("one", "two", "three")
+
+        self.assertEqual(self.replay(self.user, ids[0]), (["two", "three"], False))
+        self.assertEqual(self.replay(self.user, ids[-1]), ([], False))
+
+    def test_replay_reports_trimmed_events_as_truncated(self):
+        ids = self.record("one", "two", "three", "four", "five")
+
+        self.assertEqual(self.redis.xlen(stream.stream_key(f"user_{self.user.id}")), 3)
+        self.assertEqual(self.replay(self.user, ids[0]), (["three", "four", "five"], True))
+        # "two" was the last trimmed event, a client that saw it has missed nothing
+        self.assertEqual(self.replay(self.user, ids[1]), (["three", "four", "five"], False))
+
+    def test_replay_reports_an_expired_stream_as_truncated(self):
+        ids = self.record("one", "two")
+        self.redis.delete(stream.stream_key(f"user_{self.user.id}"))
+        ids += self.record("three")
+
+        self.assertEqual(self.replay(self.user, ids[0]), (["three"], True))
+        self.assertEqual(self.replay(self.user, ids[1]), (["three"], False))
+
+    def test_admins_replay_both_streams_in_order(self):
+        self.record("welcome", group=f"user_{self.admin.id}")
+        first = self.record("broadcast", group="admin_notifications")
+        self.record("mine", group=f"user_{self.admin.id}")
+        self.record("admins", group="admin_notifications")
+        self.record("theirs")
+
+        self.assertEqual(self.replay(self.admin, first[0]), (["mine", "admins"], False))
+
+    def test_invalid_last_id_replays_nothing(self):
+        self.record("one")
+
+        self.assertEqual(self.replay(self.user, "not-an-id"), ([], False))
@@ -0,0 +1,216 @@
+import logging
+from collections import Counter
+import redis
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from Trueliftmovers.redis_client import get_redis
+from .models import Notification
+from .utils import send_group_messages
+
+
+
+logger = logging.getLogger(__name__)
+
+UNREAD_PREFIX = "notifications:unread:"
+ADMIN_KEY = f"{UNREAD_PREFIX}admin"
+ADMIN_AUDIENCE = "admin"
+RECONCILE_CHUNK_SIZE = 1000
+
+# Only adjust counters that exist, a missing key is rebuilt from Postgres on the next read
+INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+
+def user_key(user_id):
+    return f"{UNREAD_PREFIX}user:{user_id}"
+
+
+
+def audience_key(audience):
+    return ADMIN_KEY if audience == ADMIN_AUDIENCE else user_key(audience)
+
+
+
+def audience_for(user):
+    return ADMIN_AUDIENCE if user.role == "admin" else user.id
+
+
+
+def unread_payload(count):
+    return {
+        "type": "send_notification",
+        "data": {
+            "event_type": "unread_count",
+            "unread_count": count,
+        }
+    }
+
+
+
+def unread_messages(counts):
+    return [
+        ("admin_notifications" if audience == ADMIN_AUDIENCE else f"user_{audience}", unread_payload(count))
+        for audience, count in counts.items()
+    ]
+
+
+
+def count_unread(audiences):
+    # One grouped query for all users, one for the admin inbox
+    unread = Notification.objects.filter(read=False)
+    user_ids = [audience for audience in audiences if audience != ADMIN_AUDIENCE]
+
+    counts = {audience: 0 for audience in audiences}
+    if user_ids:
+        rows = unread.filter(user_id__in=user_ids, user_notification=True).values("user_id").annotate(total=Count("id"))
+        counts.update({row["user_id"]: row["total"] for row in rows})
+    if ADMIN_AUDIENCE in counts:
+        counts[ADMIN_AUDIENCE] = unread.filter(admin_notification=True).count()
+    return counts
+
+
+
+def get_counts(audiences):
+    audiences = list(dict.fromkeys(audiences))
+    try:
+        client = get_redis()
+        values = client.mget([audience_key(audience) for audience in audiences])
+    except redis.RedisError:
+        logger.warning("Could not read unread notification counters")
+        return count_unread(audiences)
+
+    counts = {audience: max(int(value), 0) for audience, value in zip(audiences, values) if value is not None}
+    missing = [audience for audience in audiences if audience not in counts]
+    if missing:
+        recounted = count_unread(missing)
+        counts.update(recounted)
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for audience, count in recounted.items():
+                # NX so a counter stored meanwhile, which already saw these rows, is kept
+                pipeline.set(audience_key(audience), count, nx=True, ex=settings.NOTIFICATION_UNREAD_TTL)
+            pipeline.execute()
+        except redis.RedisError:
+            logger.warning("Could not store unread notification counters")
+    return counts
+
+
+
+def get_count(user):
+    audience = audience_for(user)
+    return get_counts([audience])[audience]
+
+
+
+def adjust(deltas):
+    # {audience: delta} -> {audience: new count} for every adjusted audience
+    deltas = {audience: amount for audience, amount in deltas.items() if amount}
+    if not deltas:
+        return {}
+
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for audience, amount in deltas.items():
+            pipeline.eval(INCR_IF_EXISTS, 1, audience_key(audience), amount)
+        values = pipeline.execute()
+    except redis.RedisError:
+        logger.warning("Could not update unread notification counters %s", deltas)
+        values = [None] * len(deltas)
+
+    counts = {audience: max(int(value), 0) for audience, value in zip(deltas, values) if value is not None}
+    missing = [audience for audience in deltas if audience not in counts]
+    if missing:
+        counts.update(get_counts(missing))
+    return counts
+
+
+
+def created_deltas(notifications):
+    deltas = Counter()
+    for item in notifications:
+        if item.get("broadcast_user"):
+            deltas[item["user_id"]] += 1
+        if item.get("broadcast_admin"):
+            deltas[ADMIN_AUDIENCE] += 1
+    return deltas
+
+
+
+def read_deltas(rows):
+    # rows of (user_id, user_notification, admin_notification) that were flipped to read
+    deltas = Counter()
+    for user_id, user_notification, admin_notification in rows:
+        if user_notification:
+            deltas[user_id] -= 1
+        if admin_notification:
+            deltas[ADMIN_AUDIENCE] -= 1
+    return deltas
+
+
+
+def readable_notifications(user):
+    # The same rows NotificationListAPIView shows, admin inbox rows addressed to a customer
+    # are not theirs to mark read
+    own = Q(user=user, user_notification=True)
+    if user.role == "admin":
+        return Notification.objects.filter(Q(admin_notification=True) | own)
+    return Notification.objects.filter(own)
+
+
+
+def mark_notifications_read(user, ids=None, up_to_id=None):
+    # Marks the user's unread notifications read in one UPDATE, all of them unless ids or
+    # up_to_id narrow it down, and returns how many were flipped
+    notifications = readable_notifications(user).filter(read=False)
+
+    if ids is not None or up_to_id is not None:
+        selection = Q()
+        if ids:
+            selection |= Q(id__in=ids)
+        if up_to_id:
+            selection |= Q(id__lte=up_to_id)
+        if not selection:
+            return 0
+        notifications = notifications.filter(selection)
+
+    connection = connections["default"]
+    quote = connection.ops.quote_name
+    subquery, params = notifications.values("id").query.sql_with_params()
+    # read is checked on the updated row as well, so concurrent calls never flip a row twice
+    sql = (
+        f"UPDATE {quote(Notification._meta.db_table)} SET {quote('read')} = %s, {quote('updated_at')} = %s "
+        f"WHERE {quote('read')} = %s AND {quote('id')} IN ({subquery}) "
+        f"RETURNING {quote('user_id')}, {quote('user_notification')}, {quote('admin_notification')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [True, timezone.now(), False, *params])
+        rows = cursor.fetchall()
+
+    if rows:
+        deltas = read_deltas(rows)
+        transaction.on_commit(lambda: send_group_messages(unread_messages(adjust(deltas))))
+    return len(rows)
+
+
+
+def reconcile():
+    # Stored counters are overwritten with the Postgres counts, absent ones stay lazy
+    client = get_redis()
+    audiences = [ADMIN_AUDIENCE] + [
+        int(key.rsplit(":", 1)[1]) for key in client.scan_iter(match=f"{UNREAD_PREFIX}user:*", count=1000)
+    ]
+
+    for start in range(0, len(audiences), RECONCILE_CHUNK_SIZE):
+        counts = count_unread(audiences[start:start + RECONCILE_CHUNK_SIZE])
+        pipeline = client.pipeline(transaction=False)
+        for audience, count in counts.items():
+            pipeline.set(audience_key(audience), count, ex=settings.NOTIFICATION_UNREAD_TTL)
+        pipeline.execute()
+    return len(audiences)
@@ -1,10 +1,9 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from Channel.publisher import publish_many
+from . import stream
 
-def send_realtime_notification(user_id, title, body, data=None,event_type="notification",broadcast_admin=False):
-    channel_layer = get_channel_layer()
 
-    payload = {
+def notification_payload(title, body, data=None, event_type="notification"):
+    return {
             "type": "send_notification",
             "data": {
                 "event_type": event_type,
@@ -15,12 +14,40 @@ def send_realtime_notification(user_id, title, body, data=None,event_type="notif
             }
         }
 
+
+def send_realtime_notification(user_id, title, body, data=None,event_type="notification",broadcast_admin=False):
+    payload = notification_payload(title, body, data, event_type)
+
+    messages = []
     if user_id:
-        async_to_sync(channel_layer.group_send)(
-            f"user_{user_id}", payload
-        )
+        messages.append((f"user_{user_id}", payload))
 
     if broadcast_admin:
-        async_to_sync(channel_layer.group_send)(
-            "admin_notifications", payload
-        )
\ No newline at end of file
+        messages.append(("admin_notifications", payload))
+
+    send_group_messages(messages)
+
+
+
+def send_group_messages(messages):
+    # Handed to the process-wide publisher loop in one go, the caller does not wait for the sends
+    if messages:
+        publish_many(stream.record(messages))
+    return len(messages)
+
+
+
+def notification_messages(items):
+    messages = []
+    for item in items:
+        payload = notification_payload(item["title"], item["body"], item.get("data"), item.get("event_type", "notification"))
+        if item.get("broadcast_user"):
+            messages.append((f"user_{item['user_id']}", payload))
+        if item.get("broadcast_admin"):
+            messages.append(("admin_notifications", payload))
+    return messages
+
+
+
+def send_realtime_notifications(items):
+    return send_group_messages(notification_messages(items))
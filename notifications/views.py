@@ -7,7 +7,9 @@ from accounts.response import success_response
 from django.shortcuts import get_object_or_404
 
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, NotificationSummarySerializer, NotificationReadAllSerializer
+from rest_framework.pagination import CursorPagination
+from . import unread
 
 
 #swagger 
@@ -17,16 +19,48 @@ from drf_yasg import openapi
 # Create your views here.
 
 
+class NotificationListPagination(CursorPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+
 class NotificationListAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
         operation_summary="Get notifications",
         operation_description=(
-            "Retrieve notifications for the authenticated user.\n\n"
-            "- **Admin** (`role=admin`) receives **all notifications**\n"
-            "- **Normal users** receive **only their own notifications**"
+            "Retrieve a cursor-paginated list of notifications for the authenticated user, newest first.\n\n"
+            "- **Admin** (`role=admin`) receives **all admin notifications**\n"
+            "- **Normal users** receive **only their own notifications**\n"
+            "- Pass `include_user=false` to leave out the embedded user object"
         ),
+        manual_parameters=[
+            openapi.Parameter(
+                "cursor",
+                openapi.IN_QUERY,
+                description="Pagination cursor taken from the next/previous link",
+                type=openapi.TYPE_STRING,
+                required=False
+            ),
+            openapi.Parameter(
+                "page_size",
+                openapi.IN_QUERY,
+                description="Notifications per page (default 20, max 100)",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            ),
+            openapi.Parameter(
+                "include_user",
+                openapi.IN_QUERY,
+                description="Embed the notification user (default true)",
+                type=openapi.TYPE_BOOLEAN,
+                required=False
+            ),
+        ],
         responses={
             200: openapi.Response(
                 description="Notifications fetched successfully",
@@ -36,19 +70,26 @@ class NotificationListAPIView(APIView):
                         "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
                         "message": openapi.Schema(type=openapi.TYPE_STRING),
                         "data": openapi.Schema(
-                            type=openapi.TYPE_ARRAY,
-                            items=openapi.Items(
-                                type=openapi.TYPE_OBJECT,
-                                properties={
-                                    "id": openapi.Schema(type=openapi.TYPE_INTEGER),
-                                    "user": openapi.Schema(type=openapi.TYPE_INTEGER),
-                                    "title": openapi.Schema(type=openapi.TYPE_STRING),
-                                    "body": openapi.Schema(type=openapi.TYPE_STRING),
-                                    "data": openapi.Schema(type=openapi.TYPE_OBJECT),
-                                    "read": openapi.Schema(type=openapi.TYPE_BOOLEAN),
-                                    "created_at": openapi.Schema(type=openapi.TYPE_STRING, format="date-time"),
-                                }
-                            )
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "next": openapi.Schema(type=openapi.TYPE_STRING),
+                                "previous": openapi.Schema(type=openapi.TYPE_STRING),
+                                "results": openapi.Schema(
+                                    type=openapi.TYPE_ARRAY,
+                                    items=openapi.Items(
+                                        type=openapi.TYPE_OBJECT,
+                                        properties={
+                                            "id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                                            "user": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                            "title": openapi.Schema(type=openapi.TYPE_STRING),
+                                            "body": openapi.Schema(type=openapi.TYPE_STRING),
+                                            "data": openapi.Schema(type=openapi.TYPE_OBJECT),
+                                            "read": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                                            "created_at": openapi.Schema(type=openapi.TYPE_STRING, format="date-time"),
+                                        }
+                                    )
+                                )
+                            }
                         )
                     }
                 )
@@ -57,18 +98,31 @@ class NotificationListAPIView(APIView):
         },
         tags=["Notifications"]
     )
-
+    # Stays on the primary, read flags change right before clients refetch the list
     def get(self, request):
         user = request.user
         if user.role == "admin":
-            notifications = Notification.objects.filter(admin_notification=True).order_by("-created_at")
+            notifications = Notification.objects.filter(admin_notification=True)
         else:
-            notifications = Notification.objects.filter(user=user,user_notification=True).order_by("-created_at")
+            notifications = Notification.objects.filter(user=user,user_notification=True)
 
-        serializer = NotificationSerializer(notifications, many=True)
+        include_user = request.query_params.get("include_user", "true").lower() not in ("false", "0")
+        if include_user:
+            notifications = notifications.select_related("user__profile")
+            serializer_class = NotificationSerializer
+        else:
+            serializer_class = NotificationSummarySerializer
+
+        paginator = NotificationListPagination()
+        page = paginator.paginate_queryset(notifications, request)
+        serializer = serializer_class(page, many=True)
         return success_response(
             message="Notifications fetched successfully",
-            data=serializer.data,
+            data={
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+                "results": serializer.data
+            },
             status_code=status.HTTP_200_OK
         )
     
@@ -111,21 +165,104 @@ class NotificationReadUpdateAPIView(APIView):
 
     def patch(self, request, notification_id):
         user = request.user
-        notification = get_object_or_404(
-            Notification,
-            id=notification_id,
-            user=user
-        )
-        notification.read = True
-        notification.save(update_fields=["read", "updated_at"])
+        if not unread.mark_notifications_read(user, ids=[notification_id]):
+            # Nothing flipped: either already read or not the user's notification
+            get_object_or_404(unread.readable_notifications(user), id=notification_id)
+
         return success_response(
             message="Notification marked as read",
             data={
-                "id": notification.id,
-                "read": notification.read
+                "id": notification_id,
+                "read": True
             },
             status_code=status.HTTP_200_OK
         )
 
 
 
+class NotificationReadAllAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Mark notifications as read in bulk",
+        operation_description=(
+            "Marks the authenticated user's unread notifications as **read** in a single update.\n\n"
+            "- Without a body every unread notification is marked read\n"
+            "- With `up_to_id` only notifications with an id up to and including it are marked read\n"
+            "- **Admin** (`role=admin`) marks the admin notifications"
+        ),
+        request_body=NotificationReadAllSerializer,
+        responses={
+            200: openapi.Response(
+                description="Notifications marked as read",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        "message": openapi.Schema(type=openapi.TYPE_STRING),
+                        "data": openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "updated": openapi.Schema(type=openapi.TYPE_INTEGER),
+                            }
+                        )
+                    }
+                )
+            ),
+            400: "Bad Request",
+            401: "Unauthorized"
+        },
+        tags=["Notifications"]
+    )
+    def post(self, request):
+        serializer = NotificationReadAllSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        updated = unread.mark_notifications_read(request.user, up_to_id=serializer.validated_data.get("up_to_id"))
+        return success_response(
+            message="Notifications marked as read",
+            data={"updated": updated},
+            status_code=status.HTTP_200_OK
+        )
+
+
+
+class NotificationUnreadCountAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Get unread notification count",
+        operation_description=(
+            "Returns the number of unread notifications for the badge.\n\n"
+            "- **Admin** (`role=admin`) gets the unread count of **all admin notifications**\n"
+            "- **Normal users** get the unread count of **their own notifications**\n"
+            "- Updates are also pushed over the notifications websocket as `unread_count` events"
+        ),
+        responses={
+            200: openapi.Response(
+                description="Unread count fetched successfully",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "success": openapi.Schema(type=openapi.TYPE_BOOLEAN),
+                        "message": openapi.Schema(type=openapi.TYPE_STRING),
+                        "data": openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                "unread_count": openapi.Schema(type=openapi.TYPE_INTEGER),
+                            }
+                        )
+                    }
+                )
+            ),
+            401: "Unauthorized"
+        },
+        tags=["Notifications"]
+    )
+    # A missing counter is recounted and stored, so the count must come from the primary
+    def get(self, request):
+        return success_response(
+            message="Unread count fetched successfully",
+            data={"unread_count": unread.get_count(request.user)},
+            status_code=status.HTTP_200_OK
+        )
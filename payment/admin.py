@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, ArchivedPayment
 
 
 
@@ -36,3 +36,12 @@ class PaymentAdmin(admin.ModelAdmin):
             )
         }),
     )
+
+
+
+@admin.register(ArchivedPayment)
+class ArchivedPaymentAdmin(admin.ModelAdmin):
+    list_display = ('id','booking','type_payment','amount','currency','status','is_paid','paid_at','created_at','archived_at')
+    list_filter = ('type_payment','status','is_paid','archived_at')
+    search_fields = ('id','booking__id','stripe_payment_intent_id','stripe_payment_method_id')
+    ordering = ('-created_at',)
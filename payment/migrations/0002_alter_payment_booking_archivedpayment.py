@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+
+def copy_payment_snapshots(apps, schema_editor):
+    # Archived bookings kept their payments as a JSON list, each entry becomes an ArchivedPayment row
+    ArchivedBooking = apps.get_model('booking', 'ArchivedBooking')
+    ArchivedPayment = apps.get_model('payment', 'ArchivedPayment')
+    fields = [field.attname for field in ArchivedPayment._meta.concrete_fields if field.name not in ('booking', 'archived_at')]
+
+    rows = ArchivedBooking.objects.exclude(payments=[]).values_list('id', 'payments', 'archived_at')
+    payments = [
+        ArchivedPayment(
+            booking_id=booking_id,
+            archived_at=archived_at,
+            **{name: snapshot.get(name) for name in fields if name in snapshot},
+        )
+        for booking_id, snapshots, archived_at in rows.iterator()
+        for snapshot in snapshots or []
+    ]
+    ArchivedPayment.objects.bulk_create(payments, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_archivedbooking_booking_arc_truck_i_9e8f0c_idx_and_more'),
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='booking.booking'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type_payment', models.CharField(choices=[('truck', 'Truck Payment'), ('mover', 'Mover Payment')], max_length=20)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('stripe_payment_method_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(default='usd', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('canceled', 'Canceled')], default='pending', max_length=20)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='booking.archivedbooking')),
+            ],
+        ),
+        migrations.RunPython(copy_payment_snapshots, migrations.RunPython.noop),
+    ]
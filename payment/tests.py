@@ -1,3 +1,57 @@
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from booking.models import Booking
+from booking.tests import create_booking, updated_columns
+from .models import Payment
 
 # Create your tests here.
+
+
+
+class PaymentUpdateColumnsTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", username="customer", password="x")
+        self.booking = create_booking(self.customer, status="approved", final_price=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    @mock.patch("payment.views.stripe.checkout.Session.create")
+    def test_checkout_session_writes_only_the_intent(self, create_session):
+        create_session.return_value = mock.Mock(payment_intent="pi_test", url="https://checkout.test/session")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("create-checkout-session"),
+                {"booking_id": self.booking.id, "type_payment": "truck"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            updated_columns(queries.captured_queries, Payment._meta.db_table),
+            [{"stripe_payment_intent_id", "updated_at"}],
+        )
+
+    @mock.patch("payment.views.enqueue_notification")
+    @mock.patch("payment.views.apply_transition", side_effect=lambda booking_id, name: Booking.objects.get(id=booking_id))
+    @mock.patch("payment.views.stripe.PaymentIntent.retrieve")
+    @mock.patch("payment.views.stripe.checkout.Session.retrieve")
+    def test_payment_success_writes_only_payment_columns(self, retrieve_session, retrieve_intent, *mocks):
+        payment = Payment.objects.create(booking=self.booking, type_payment="truck", amount=100)
+        retrieve_session.return_value = mock.Mock(
+            payment_status="paid", payment_intent="pi_test", metadata={"payment_id": payment.id}
+        )
+        retrieve_intent.return_value = mock.Mock(id="pi_test", payment_method="pm_test")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("payment-success"), {"session_id": "cs_test"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            updated_columns(queries.captured_queries, Payment._meta.db_table),
+            [{"status", "is_paid", "paid_at", "stripe_payment_intent_id", "stripe_payment_method_id", "updated_at"}],
+        )
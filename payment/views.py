@@ -1,3 +1,4 @@
+import logging
 from django.shortcuts import render
 from django.conf import settings
 from django.utils import timezone
@@ -10,11 +11,14 @@ from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.response import Response
 from .serializers import CheckoutSessionSerializer,PaymentSuccessSerializer,PaymentDetailSerializer
-from notifications.tasks import create_notification_task
+from notifications.queue import enqueue_notification
+from booking.transitions import apply_transition
 from rest_framework.parsers import MultiPartParser,FormParser
 
 stripe.api_key=settings.STRIPE_SECRET_KEY
 
+logger = logging.getLogger(__name__)
+
 
 def custom_error_response(error_type, message, status_code=status.HTTP_400_BAD_REQUEST):
     return {
@@ -88,7 +92,7 @@ class CreateCheckoutSessionView(APIView):
                 )
 
                 payment.stripe_payment_intent_id = session.payment_intent
-                payment.save()
+                payment.save(update_fields=['stripe_payment_intent_id', 'updated_at'])
 
             return success_response(f"{payment_type.capitalize()} payment session created", data={'checkout_url': session.url})
         
@@ -162,21 +166,33 @@ class PaymentSuccessView(APIView):
                 payment.stripe_payment_intent_id = payment_intent.id
                 payment.stripe_payment_method_id = payment_intent.payment_method
 
-                payment.save()
-
-                booking = payment.booking
-
-                if payment.type_payment == 'truck':
-                    booking.truck_payment_status = True
-                    booking.status = "accepted"
-                else:
-                    booking.mover_payment_status = True
-                    booking.status = "complete"
-
-                booking.save()
-
-            create_notification_task.delay(
+                payment.save(update_fields=[
+                    'status',
+                    'is_paid',
+                    'paid_at',
+                    'stripe_payment_intent_id',
+                    'stripe_payment_method_id',
+                    'updated_at',
+                ])
+
+                transition = "truck_paid" if payment.type_payment == 'truck' else "mover_paid"
+                booking = apply_transition(payment.booking_id, transition)
+
+                if booking is None:
+                    # The booking is in no status this payment moves it from, the payment flag is still recorded
+                    flag = "truck_payment_status" if payment.type_payment == 'truck' else "mover_payment_status"
+                    logger.warning(
+                        "Booking %s could not apply %s from its status, only %s is set",
+                        payment.booking_id, transition, flag,
+                    )
+                    Booking.objects.filter(id=payment.booking_id, **{flag: False}).update(
+                        **{flag: True, "updated_at": timezone.now()}
+                    )
+                    booking = Booking.objects.get(id=payment.booking_id)
+
+            enqueue_notification(
                 user_id=booking.user.id,
+                notification_type="payment",
                 title="Payment Successful",
                 body=f"Your {payment.type_payment} payment was completed successfully.",
                 data={
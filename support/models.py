@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import User
+from Trueliftmovers.search import trigram_index
 
 # Create your models here.
 
@@ -12,6 +13,12 @@ class Support(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            trigram_index("title", "support_title_trgm"),
+            trigram_index("text", "support_text_trgm"),
+        ]
+
     def __str__(self):
         return f"Support Request: {self.title} by {self.user.username}"
     
@@ -1,7 +1,8 @@
 from rest_framework import serializers
 from .models import Support
-from .tasks import send_support_notification
-from notifications.tasks import create_notification_task
+from .tasks import queue_support_email
+from django.db import transaction
+from notifications.queue import enqueue_notification
 
 
 
@@ -18,32 +19,34 @@ class SupportSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         user = self.context['request'].user
-        support = Support.objects.create(
-            user=user,
-            title=self.validated_data['title'],
-            text=self.validated_data['text'],
-            resolved=self.validated_data.get('resolved', False)
-        )
-
-        create_notification_task.delay(
-        user_id=user.id,
-        title="Support Request Submitted",
-        body=f"Your support request '{support.title}' has been received.",
-        data={
-            "id": support.id,
-            "user": support.user.id,
-            "full_name": support.user.profile.full_name,
-            "image": support.user.profile.image.url if support.user.profile.image else None,
-            "title": support.title,
-            "text": support.text,
-            "resolved": support.resolved,
-            "created_at": str(support.created_at),
-        },
-        broadcast_user=False,
-        broadcast_admin=True
-        )
-
-        send_support_notification.delay(support.id,user.email)
+        with transaction.atomic():
+            support = Support.objects.create(
+                user=user,
+                title=self.validated_data['title'],
+                text=self.validated_data['text'],
+                resolved=self.validated_data.get('resolved', False)
+            )
+
+            enqueue_notification(
+            user_id=user.id,
+            notification_type="support",
+            title="Support Request Submitted",
+            body=f"Your support request '{support.title}' has been received.",
+            data={
+                "id": support.id,
+                "user": support.user.id,
+                "full_name": support.user.profile.full_name,
+                "image": support.user.profile.image.url if support.user.profile.image else None,
+                "title": support.title,
+                "text": support.text,
+                "resolved": support.resolved,
+                "created_at": str(support.created_at),
+            },
+            broadcast_user=False,
+            broadcast_admin=True
+            )
+
+            queue_support_email(support, user.email)
 
         return support
     
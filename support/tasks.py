@@ -1,23 +1,28 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.conf import settings
+from notifications.outbox import queue_email
 from .models import Support
 
 
 
+def queue_support_email(support, email):
+    return queue_email(
+        subject=f"New Support Request: {support.title}",
+        body=f"User {support.user.profile.full_name} submitted a support request.\n\nText: {support.text}",
+        recipients=[email],
+        from_email=settings.EMAIL_HOST_USER,
+        dedupe_key=f"support-created:{support.id}:{email}",
+    )
+
+
+
 @shared_task
 def send_support_notification(support_id,email):
+    # Kept for messages already queued, producers call queue_support_email
     try:
-        support = Support.objects.get(id=support_id)
-        subject = f"New Support Request: {support.title}"
-        message = f"User {support.user.profile.full_name} submitted a support request.\n\nText: {support.text}"
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[email],
-        )
-        return f"Notification sent for support {support.id}"
+        support = Support.objects.select_related("user__profile").get(id=support_id)
+        queue_support_email(support, email)
+        return f"Notification queued for support {support.id}"
     except Support.DoesNotExist:
         return "Support request not found"
     
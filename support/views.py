@@ -4,11 +4,13 @@ from rest_framework import status
 from rest_framework.response import Response
 from .serializers import SupportSerializer,SupportUpdateSerializer
 from accounts.response import success_response
+from Trueliftmovers.db_router import replica_reads
 from accounts.permissions import IsUserRole
 from rest_framework.parsers import MultiPartParser, FormParser
 from .models import Support
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
+from Trueliftmovers.search import ranked_search
 
 
 #swagger
@@ -72,10 +74,17 @@ class SupportListAPIView(APIView):
         type=openapi.TYPE_INTEGER,
         required=False
     )
+    search_param = openapi.Parameter(
+        "search",
+        openapi.IN_QUERY,
+        description="Search title and text, best matches first",
+        type=openapi.TYPE_STRING,
+        required=False
+    )
 
     @swagger_auto_schema(
         operation_description="Get paginated support requests of the logged-in user",
-        manual_parameters=[page_param],
+        manual_parameters=[page_param, search_param],
         responses={
             200: openapi.Response(
                 description="Paginated list of support requests",
@@ -112,8 +121,14 @@ class SupportListAPIView(APIView):
         },
         tags=["Support"],
     )
+    @replica_reads
     def get(self, request):
         supports = Support.objects.all().order_by("-created_at")
+
+        search_query = request.query_params.get("search")
+        if search_query:
+            supports = ranked_search(supports, ["title", "text"], search_query, "-created_at")
+
         paginator = PageNumberPagination()
         paginator.page_size = 10 
         paginated_qs = paginator.paginate_queryset(supports, request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:27
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('truck', '0005_truck_imei_truck_last_location_update_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='truck',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('truck_number_plate'), name='gin_trgm_ops'), name='truck_plate_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='truck',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('driver_name'), name='gin_trgm_ops'), name='truck_driver_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='truck',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('driver_phone_number'), name='gin_trgm_ops'), name='truck_phone_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='truck',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('license_number'), name='gin_trgm_ops'), name='truck_license_trgm'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from .constants import STATUS_CHOICES,TRUCK_TYPE_CHOICES
+from Trueliftmovers.search import trigram_index
 # Create your models here.
 
 
@@ -34,6 +35,10 @@ class Truck(models.Model):
         indexes = [
             models.Index(fields=["imei"]),
             models.Index(fields=["status"]),
+            trigram_index("truck_number_plate", "truck_plate_trgm"),
+            trigram_index("driver_name", "truck_driver_trgm"),
+            trigram_index("driver_phone_number", "truck_phone_trgm"),
+            trigram_index("license_number", "truck_license_trgm"),
         ]
 
     def __str__(self):
@@ -1,14 +1,12 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import Truck
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from Channel.publisher import publish
 
 @receiver(post_save, sender=Truck)
 def send_truck_update(sender, instance, created, **kwargs):
     if not created:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
+        publish(
             "truck_updates",
             {
                 "type": "truck_update",
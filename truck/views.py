@@ -5,6 +5,8 @@ from accounts.permissions import IsAdminRole
 from rest_framework.parsers import MultiPartParser,FormParser
 from rest_framework import status,permissions
 from accounts.response import success_response
+from Trueliftmovers.db_router import replica_reads
+from Trueliftmovers.dispatch import defer
 from .serializers import TruckSerializer,PriceManagementsSerializer,MoversManagemnetSerializer
 from .models import Truck,PriceManagement,MoversManagements
 from django.conf import settings
@@ -15,7 +17,10 @@ from rest_framework.response import Response
 #swagger
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.db.models import Q
+from Trueliftmovers.search import ranked_search
+
+
+TRUCK_SEARCH_FIELDS = ['truck_number_plate', 'driver_name', 'driver_phone_number', 'license_number']
 
 
 # Create your views here.
@@ -34,17 +39,13 @@ class TruckListCreateView(APIView):
         responses={200: TruckSerializer(many=True)},
         tags=['Trucks']
     )
+    @replica_reads
     def get(self, request):
         trucks = Truck.objects.all()
 
         search_query = request.query_params.get('search')
         if search_query:
-            trucks = trucks.filter(
-                Q(truck_number_plate__icontains=search_query) |
-                Q(driver_name__icontains=search_query) |
-                Q(driver_phone_number__icontains=search_query) |
-                Q(license_number__icontains=search_query)
-            )
+            trucks = ranked_search(trucks, TRUCK_SEARCH_FIELDS, search_query, 'id')
 
         status_filter = request.query_params.get('status')
         if status_filter:
@@ -386,7 +387,7 @@ class BouncieWebhookView(APIView):
         payload = request.data
         print("==========",payload)
 
-        process_bouncie_event.delay(payload)
+        defer(process_bouncie_event, payload)
 
         return Response({"status": "ok"})
 
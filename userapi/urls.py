@@ -1,7 +1,7 @@
 from django.urls import include, path
 from support.views import SupportAPIView
-from notifications.views import NotificationListAPIView,NotificationReadUpdateAPIView
-from booking.views import BookingListCreateView,RejectBookingView,CreateBookingAgreementView,BookingAgreementDetailView,BookingEndRequestView,BookingRetrieveAPIView
+from notifications.views import NotificationListAPIView,NotificationReadUpdateAPIView,NotificationUnreadCountAPIView,NotificationReadAllAPIView
+from booking.views import BookingListCreateView,RejectBookingView,CreateBookingAgreementView,BookingAgreementDetailView,BookingEndRequestView,BookingRetrieveAPIView,BookingHistoryView
 
 from payment.views import CreateCheckoutSessionView, PaymentSuccessView
 
@@ -12,9 +12,12 @@ urlpatterns = [
 
    path('notifications/', NotificationListAPIView.as_view(), name='notifications-list'),
    path('notifications/read/<int:notification_id>/',NotificationReadUpdateAPIView.as_view(),name='notification-read'),
+   path('notifications/read-all/',NotificationReadAllAPIView.as_view(),name='notification-read-all'),
+   path('notifications/unread-count/',NotificationUnreadCountAPIView.as_view(),name='notification-unread-count'),
 
 
    path("bookings/", BookingListCreateView.as_view(), name="booking-list-create"),
+   path("bookings/history/", BookingHistoryView.as_view(), name="booking-history"),
    path('bookings/reject/<int:booking_id>/',RejectBookingView.as_view(),name='booking-reject'),
    path("bookings/end-request/<int:booking_id>/",BookingEndRequestView.as_view(),name="booking-end-request"),
    path('bookings/<int:booking_id>/', BookingRetrieveAPIView.as_view(), name='booking-retrieve'),